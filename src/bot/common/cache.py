@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+
+@dataclass
+class CacheStats:
+  """Hit/miss counters for a cache along with the time spent serving each"""
+  hits: int = 0
+  misses: int = 0
+  hit_seconds: float = 0.0
+  miss_seconds: float = 0.0
+
+  def record_hit(self, seconds: float) -> None:
+    """Records a lookup that was served from the cache"""
+    self.hits += 1
+    self.hit_seconds += seconds
+
+  def record_miss(self, seconds: float) -> None:
+    """Records a lookup that had to be computed/fetched"""
+    self.misses += 1
+    self.miss_seconds += seconds
+
+  @property
+  def hit_rate(self) -> float:
+    """Fraction of lookups served from the cache"""
+    total = self.hits + self.misses
+    return self.hits / total if total else 0.0
+
+  @property
+  def time_saved(self) -> float:
+    """Estimated seconds saved by the cache, assuming each hit would have cost
+    as much as an average miss"""
+    if not self.misses:
+      return 0.0
+    return self.hits * (self.miss_seconds / self.misses) - self.hit_seconds
+
+
+class LRUCache:
+  """Thread-safe, bounded mapping that evicts the least recently used entry when full.
+  A maxsize of 0 disables the cache."""
+
+  def __init__(self, maxsize: int):
+    self.maxsize = maxsize
+    self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+    self.lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  def get(self, key: Hashable, default: Optional[Any] = None) -> Optional[Any]:
+    """Returns the value for key and marks it as recently used"""
+    with self.lock:
+      if key not in self.entries:
+        return default
+      self.entries.move_to_end(key)
+      return self.entries[key]
+
+  def put(self, key: Hashable, value: Any) -> None:
+    """Adds or replaces an entry, evicting the least recently used entry if necessary"""
+    if self.maxsize <= 0:
+      return
+    with self.lock:
+      self.entries[key] = value
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.maxsize:
+        self.entries.popitem(last=False)
+
+  def clear(self) -> None:
+    """Removes all entries"""
+    with self.lock:
+      self.entries.clear()
+
+
+class TTLCache:
+  """Thread-safe mapping whose entries expire `ttl` seconds after they are put.
+  Used for remote state that changes on its own, but not often enough to fetch on every use."""
+
+  def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+    self.ttl = ttl
+    self.clock = clock
+    # Key -> (expiry time, value)
+    self.entries: dict[Hashable, tuple[float, Any]] = {}
+    self.lock = threading.Lock()
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  def get(self, key: Hashable, default: Optional[Any] = None) -> Optional[Any]:
+    """Returns the value for key, or default if it is missing or expired"""
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return default
+      expiry, value = entry
+      if self.clock() >= expiry:
+        del self.entries[key]
+        return default
+      return value
+
+  def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+    """Adds or replaces an entry that expires after ttl seconds (default: self.ttl)"""
+    with self.lock:
+      self.entries[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+
+  def invalidate(self, *keys: Hashable) -> None:
+    """Removes the entries for keys, if present"""
+    with self.lock:
+      for key in keys:
+        self.entries.pop(key, None)
+
+  def clear(self) -> None:
+    """Removes all entries"""
+    with self.lock:
+      self.entries.clear()
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopThread:
+  """Runs an asyncio event loop forever in a daemon thread.
+
+  Coroutines can be submitted from any other thread. The loop lives as long as its owner,
+  so clients bound to it (ex: aiohttp sessions) can be reused across calls."""
+
+  def __init__(self, name: str = 'event-loop'):
+    self.loop = asyncio.new_event_loop()
+    self.thread = threading.Thread(target=self.__run_loop, name=name, daemon=True)
+    self.thread.start()
+
+  def __run_loop(self) -> None:
+    asyncio.set_event_loop(self.loop)
+    self.loop.run_forever()
+
+  def submit(self, coro: Coroutine) -> Future:
+    """Schedules a coroutine on the loop and returns a future for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+  def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Runs a coroutine on the loop and blocks until it completes.
+    Must not be called from the loop's own thread."""
+    if threading.current_thread() is self.thread:
+      raise RuntimeError('EventLoopThread.run would deadlock when called from its own thread')
+    return self.submit(coro).result(timeout)
+
+  def stop(self) -> None:
+    """Cancels pending tasks, stops the loop, and waits for the thread to exit"""
+    if self.loop.is_closed():
+      return
+
+    async def cancel_tasks() -> None:
+      tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+      self.run(cancel_tasks(), timeout=5)
+    except TimeoutError:
+      logger.warning('Timed out waiting for event loop tasks to cancel')
+    self.loop.call_soon_threadsafe(self.loop.stop)
+    self.thread.join()
+    self.loop.close()
+
+
+def run_sync(coro: Coroutine, loop: asyncio.AbstractEventLoop) -> Any:
+  """Runs a coroutine on loop from synchronous code and returns its result.
+
+  If the loop is already running in another thread (ex: an EventLoopThread), the
+  coroutine is submitted to it and this thread blocks until it completes. Otherwise
+  the loop is run until the coroutine completes."""
+  if loop.is_running():
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+  return loop.run_until_complete(coro)
@@ -0,0 +1,93 @@
+import re
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+# Length of the character n-grams that strings are compared by
+NGRAM_SIZE = 3
+
+
+def ngrams(text: str, n: int = NGRAM_SIZE) -> set[str]:
+  """Returns the set of character n-grams in text after lowercasing it and collapsing
+  punctuation/whitespace. Words are padded so that short words and word boundaries count."""
+  normalized = ' '.join(re.sub(r'[^\w]+', ' ', text.lower()).split())
+  padded = f"{' ' * (n - 1)}{normalized} "
+  return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class FuzzyIndex:
+  """Ranks a fixed list of candidate strings by their similarity to query strings.
+
+  Similarity is the Dice coefficient of the strings' character trigrams: twice the number of
+  shared trigrams over the total number of trigrams. Like difflib.SequenceMatcher.ratio, it is
+  1.0 for identical strings and 0.0 for strings with nothing in common, but it is computed
+  from an inverted index built once for the candidates, so scoring a query only touches the
+  candidates that share a trigram with it and needs no Python-level loop over candidates."""
+
+  def __init__(self, candidates: Sequence[str], n: int = NGRAM_SIZE):
+    self.candidates = list(candidates)
+    self.n = n
+
+    # Inverted index in CSR form: candidate indices containing trigram t are
+    # postings[offsets[t]:offsets[t + 1]]
+    self.vocabulary: dict[str, int] = {}
+    postings: list[list[int]] = []
+    self.sizes = np.zeros(len(self.candidates), dtype=np.float32)
+    for i, candidate in enumerate(self.candidates):
+      grams = ngrams(candidate, n)
+      self.sizes[i] = len(grams)
+      for gram in grams:
+        gram_id = self.vocabulary.setdefault(gram, len(postings))
+        if gram_id == len(postings):
+          postings.append([])
+        postings[gram_id].append(i)
+
+    self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+    self.offsets[1:] = np.cumsum([len(p) for p in postings])
+    self.postings = np.fromiter(
+      (i for p in postings for i in p), dtype=np.int32, count=int(self.offsets[-1]))
+
+  def __len__(self) -> int:
+    return len(self.candidates)
+
+  def scores(self, query: str) -> np.ndarray:
+    """Returns the similarity of query to every candidate, in candidate order"""
+    grams = ngrams(query, self.n)
+    gram_ids = [self.vocabulary[g] for g in grams if g in self.vocabulary]
+    if not gram_ids:
+      return np.zeros(len(self.candidates), dtype=np.float32)
+
+    matched = np.concatenate([
+      self.postings[self.offsets[g]:self.offsets[g + 1]] for g in gram_ids])
+    shared = np.bincount(matched, minlength=len(self.candidates)).astype(np.float32)
+    return 2 * shared / (self.sizes + len(grams))
+
+  def top_k(self, query: str, k: int = 1) -> list[tuple[int, float]]:
+    """Returns (candidate index, score) for the k candidates most similar to query, best first.
+    Ties are broken by candidate order."""
+    if not self.candidates or k <= 0:
+      return []
+    scores = self.scores(query)
+    k = min(k, len(scores))
+    # Partition instead of fully sorting since k is usually much smaller than the candidates.
+    # Which of several tied candidates argpartition keeps is arbitrary, so every candidate
+    # scoring at least the k-th best score is kept before sorting.
+    if k < len(scores):
+      kth_score = scores[np.argpartition(-scores, k - 1)[k - 1]]
+      top = np.flatnonzero(scores >= kth_score)
+    else:
+      top = np.arange(len(scores))
+    top = top[np.lexsort((top, -scores[top]))][:k]
+    return [(int(i), float(scores[i])) for i in top]
+
+  def best(self, query: str) -> Optional[tuple[int, float]]:
+    """Returns (candidate index, score) of the candidate most similar to query, or None if
+    there are no candidates"""
+    top = self.top_k(query, 1)
+    return top[0] if top else None
+
+
+def best_match(query: str, candidates: Iterable[str]) -> Optional[tuple[int, float]]:
+  """Returns (index, score) of the candidate most similar to query, or None if there are no
+  candidates. Builds a one-off FuzzyIndex; keep a FuzzyIndex for repeated queries."""
+  return FuzzyIndex(list(candidates)).best(query)
@@ -0,0 +1,151 @@
+import argparse
+import json
+import logging
+import random
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from bot.common.fuzzy import FuzzyIndex
+from bot.common.main import init
+
+DEFAULT_SIZES = [10, 1000, 100000]
+DEFAULT_QUERIES = 20
+DEFAULT_RANDOM_SEED = 0
+LATENCY_PERCENTILES = [50, 90, 99]
+
+SYLLABLES = [
+  'ka', 'lo', 'mi', 'ra', 'ne', 'to', 'su', 'vi', 'da', 're', 'mo', 'shi', 'an', 'el', 'or',
+  'us', 'in', 'ber', 'ton', 'la', 'ri', 'go', 'ze', 'pa', 'qui', 'wen', 'ly', 'sta', 'co',
+]
+
+logger = logging.getLogger('bot.common.fuzzy_bench')
+logger.setLevel(logging.NOTSET) # Override default behavior for root logger
+
+
+def bench(
+    sizes: list[int],
+    queries: int = DEFAULT_QUERIES,
+    random_seed: int = DEFAULT_RANDOM_SEED,
+) -> list[dict]:
+  """Compares FuzzyIndex with ranking by SequenceMatcher.ratio for each candidate count in sizes.
+
+  Candidates are random multi-word names, and queries are candidates with a typo and different
+  casing, like a transcribed spoken name. Reports query latency for both, the build time of the
+  index, how often each ranks the original candidate first, and how often they agree."""
+  rng = random.Random(random_seed)
+  results = []
+  for size in sizes:
+    candidates = _random_names(rng, size)
+    targets = [rng.randrange(size) for _ in range(queries)]
+    query_texts = [_misspell(rng, candidates[t]) for t in targets]
+
+    start = time.perf_counter()
+    index = FuzzyIndex(candidates)
+    build_seconds = time.perf_counter() - start
+
+    fuzzy_latencies, fuzzy_hits = [], []
+    ratio_latencies, ratio_hits = [], []
+    agreements = 0
+    for target, query in zip(targets, query_texts):
+      start = time.perf_counter()
+      fuzzy_best, _ = index.best(query)
+      fuzzy_latencies.append(time.perf_counter() - start)
+
+      start = time.perf_counter()
+      ratios = [SequenceMatcher(None, query, candidate).ratio() for candidate in candidates]
+      ratio_best = max(range(size), key=ratios.__getitem__)
+      ratio_latencies.append(time.perf_counter() - start)
+
+      fuzzy_hits.append(candidates[fuzzy_best] == candidates[target])
+      ratio_hits.append(candidates[ratio_best] == candidates[target])
+      agreements += candidates[fuzzy_best] == candidates[ratio_best]
+
+    result = {
+      'candidates': size,
+      'queries': queries,
+      'index_build_ms': build_seconds * 1000,
+      'fuzzy_index': _method_result(fuzzy_latencies, fuzzy_hits),
+      'sequence_matcher': _method_result(ratio_latencies, ratio_hits),
+      'top1_agreement': agreements / queries,
+    }
+    log_result(result)
+    results.append(result)
+  return results
+
+
+def _method_result(latencies: list[float], hits: list[bool]) -> dict:
+  latencies_ms = np.array(latencies) * 1000
+  return {
+    'top1_accuracy': sum(hits) / len(hits),
+    'latency_ms': {
+      f'p{p}': float(np.percentile(latencies_ms, p)) for p in LATENCY_PERCENTILES
+    },
+  }
+
+
+def _random_names(rng: random.Random, count: int) -> list[str]:
+  names = []
+  for _ in range(count):
+    words = [
+      ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+      for _ in range(rng.randint(1, 4))
+    ]
+    names.append(' '.join(word.capitalize() for word in words))
+  return names
+
+
+def _misspell(rng: random.Random, name: str) -> str:
+  """Lowercases name and replaces, drops, or inserts a single letter"""
+  chars = list(name.lower())
+  i = rng.randrange(len(chars))
+  match rng.randrange(3):
+    case 0:
+      chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    case 1:
+      del chars[i]
+    case 2:
+      chars.insert(i, rng.choice('abcdefghijklmnopqrstuvwxyz'))
+  return ''.join(chars)
+
+
+def log_result(result: dict) -> None:
+  """Logs a human-readable summary of the benchmark for one candidate count"""
+  logger.info(
+    f"{result['candidates']:,} candidates ({result['queries']} queries, "
+    f"index built in {result['index_build_ms']:.01f} ms):")
+  for method in ('fuzzy_index', 'sequence_matcher'):
+    latency = ', '.join(
+      f'{name} {value:.03f}' for name, value in result[method]['latency_ms'].items())
+    logger.info(
+      f"  {method}: top-1 accuracy {result[method]['top1_accuracy']:.01%}, latency (ms) {latency}")
+  logger.info(f"  top-1 agreement: {result['top1_agreement']:.01%}")
+
+
+def main():
+  logger.info('Benchmarking fuzzy matching...')
+
+  parser = argparse.ArgumentParser(
+    prog = 'drone bench_fuzzy'
+  )
+  parser.add_argument(
+    '-n', '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+    help='candidate counts to benchmark')
+  parser.add_argument('-q', '--queries', type=int, default=DEFAULT_QUERIES)
+  parser.add_argument('-s', '--random-seed', type=int, default=DEFAULT_RANDOM_SEED)
+  parser.add_argument('-o', '--output', default=None, help='path to write the JSON report to')
+  args = vars(parser.parse_args())
+
+  output_path = args.pop('output')
+  results = bench(**args)
+  if output_path is not None:
+    with open(output_path, 'w', encoding='utf-8') as f:
+      json.dump(results, f, indent=2)
+    logger.info(f'Wrote report to {output_path}')
+  else:
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  init(main)
@@ -1,5 +1,7 @@
+import hashlib
 import os
 import re
+from typing import Optional
 
 
 def find_latest_numbered_entry(search_dir: str, pattern: re.Pattern[str]) -> int:
@@ -22,3 +24,42 @@ def find_latest_numbered_entry(search_dir: str, pattern: re.Pattern[str]) -> int
       id_number = max(id_number, int(match.group(1)))
 
   return id_number
+
+
+def directory_fingerprint(search_dir: str) -> str:
+  """
+  Returns a hash of the relative paths and contents of every file under `search_dir`.
+  Used to detect when a directory-based artifact such as a trained model has changed.
+  """
+  digest = hashlib.sha256()
+  for root, dirs, files in os.walk(search_dir):
+    dirs.sort()
+    for file_name in sorted(files):
+      path = os.path.join(root, file_name)
+      digest.update(os.path.relpath(path, search_dir).encode('utf-8'))
+      with open(path, 'rb') as f:
+        digest.update(f.read())
+  return digest.hexdigest()
+
+
+def directory_signature(search_dir: str) -> Optional[tuple]:
+  """
+  Returns the relative path, size, and modification time of every file under `search_dir`,
+  or None if it doesn't exist. Much cheaper than directory_fingerprint since no files are
+  read, so it can be polled to detect when the directory is being changed.
+  """
+  if not os.path.isdir(search_dir):
+    return None
+
+  entries = []
+  for root, dirs, files in os.walk(search_dir):
+    dirs.sort()
+    for file_name in sorted(files):
+      path = os.path.join(root, file_name)
+      try:
+        stat = os.stat(path)
+      except FileNotFoundError:
+        # Removed while walking the directory
+        continue
+      entries.append((os.path.relpath(path, search_dir), stat.st_size, stat.st_mtime_ns))
+  return tuple(entries)
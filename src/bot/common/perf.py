@@ -1,9 +1,12 @@
+import inspect
 import logging
 import time
 
 import psutil
 import torch
 
+from bot.common.cache import CacheStats
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,7 +21,18 @@ except (psutil.AccessDenied, psutil.NoSuchProcess) as init_ex:
 
 
 def timed_fn(fn: callable) -> callable:
-  """Decorator that will log the execution time of decorated functions in seconds"""
+  """Decorator that will log the execution time of decorated functions in seconds.
+  Coroutine functions are timed until the coroutine completes."""
+  if inspect.iscoroutinefunction(fn):
+    async def wrapped_coroutine_fn(*args, **kwargs):
+      start = time.perf_counter()
+      result = await fn(*args, **kwargs)
+      end = time.perf_counter()
+      logger.debug(f"Function {fn.__name__!r} executed in {end-start:.04f} seconds")
+      return result
+
+    return wrapped_coroutine_fn
+
   def wrapped_fn(*args, **kwargs):
     start = time.perf_counter()
     result = fn(*args, **kwargs)
@@ -64,6 +78,13 @@ def log_resource_usage(torch_device: torch.device = None) -> None:
     )
 
 
+def log_cache_stats(name: str, stats: CacheStats) -> None:
+  """Logs the hit rate and estimated time saved by a cache"""
+  logger.debug(
+    f'{name}: {stats.hit_rate:.01%} hit rate ({stats.hits} hits / {stats.misses} misses), '
+    f'{stats.time_saved:.04f} seconds saved')
+
+
 def __bytes_human_readable(num_bytes: int) -> str:
   units = ['TiB', 'GiB', 'MiB', 'KiB', 'bytes']
   unit_factor = __BYTE_CONVERSION_FACTOR ** (len(units) - 1)
@@ -0,0 +1,57 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+  """Limits operations to `rate` per second on average, with bursts of up to `capacity`.
+
+  The bucket isn't bound to an event loop or thread, so a single bucket can budget the
+  operations of every client in the process."""
+
+  def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+    self.rate = rate
+    self.capacity = capacity
+    self.clock = clock
+    self.tokens = capacity
+    self.updated_at = clock()
+    # Operations wait until this time, see pause
+    self.paused_until = float('-inf')
+    self.lock = threading.Lock()
+
+  def reserve(self) -> float:
+    """Takes a token and returns how many seconds to wait before using it. Tokens can be taken
+    before they are available, so callers are served in the order they reserved."""
+    with self.lock:
+      now = self.clock()
+      self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+      self.updated_at = now
+      self.tokens -= 1
+      return max(-self.tokens / self.rate, self.paused_until - now, 0.0)
+
+  def pause(self, seconds: float) -> None:
+    """Makes all operations wait until `seconds` from now, ex: when a server asks clients to
+    slow down"""
+    with self.lock:
+      self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+  async def acquire(self) -> float:
+    """Waits for a token. Returns the seconds spent waiting."""
+    delay = self.reserve()
+    if delay <= 0:
+      return 0.0
+    start = self.clock()
+    while delay > 0:
+      await asyncio.sleep(delay)
+      # A pause may have started while waiting
+      delay = self.paused_until - self.clock()
+    return self.clock() - start
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+  """Returns a random delay before retry number `attempt` (starting at 0). The delay's upper
+  bound grows exponentially from base up to cap ("full jitter"), so that clients that failed
+  together don't retry together."""
+  return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -4,3 +4,13 @@ from bot import DATA_DIR, MODELS_DIR
 
 ASSISTANT_DATA_DIR = os.path.join(DATA_DIR, 'assistant')
 ASSISTANT_MODEL_DIR = os.path.join(MODELS_DIR, 'assistant')
+ASSISTANT_TRAIN_CACHE_DIR = os.path.join(MODELS_DIR, '.cache', 'assistant')
+ASSISTANT_LINEAR_MODEL_DIR = os.path.join(MODELS_DIR, 'assistant_linear')
+
+# NLU engines that Executor can use, see Executor's nlu_engine argument
+SNIPS_ENGINE = 'snips'
+LINEAR_ENGINE = 'linear'
+NLU_ENGINE_MODEL_DIRS = {
+  SNIPS_ENGINE: ASSISTANT_MODEL_DIR,
+  LINEAR_ENGINE: ASSISTANT_LINEAR_MODEL_DIR,
+}
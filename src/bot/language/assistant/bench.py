@@ -0,0 +1,346 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import numpy as np
+from snips_nlu import SnipsNLUEngine
+from snips_nlu.dataset import Dataset
+from snips_nlu.default_configs import CONFIG_EN
+
+from bot import LOGS_DIR, PROJECT_ROOT_DIR
+from bot import logger as root_logger
+from bot.common.logging import numbered_file_handler
+from bot.common.main import init
+from bot.language.assistant import (ASSISTANT_DATA_DIR, LINEAR_ENGINE, NLU_ENGINE_MODEL_DIRS,
+                                    SNIPS_ENGINE)
+from bot.language.assistant.executor import Executor
+from bot.language.assistant.linear_engine import LinearNLUEngine
+from bot.language.assistant.train import RANDOM_SEED
+
+DEFAULT_FOLDS = 5
+LATENCY_PERCENTILES = [50, 90, 95, 99]
+
+logger = logging.getLogger('bot.language.assistant.bench')
+logger.setLevel(logging.NOTSET) # Override default behavior for root logger
+
+
+@dataclass
+class LabeledUtterance:
+  """An utterance from the dataset along with its expected intent and slots"""
+  text: str
+  intent_name: str
+  # (slot name, start, end) for each slot
+  slots: list[tuple[str, int, int]]
+
+
+@dataclass
+class Counts:
+  """True positive, false positive, and false negative counts"""
+  tp: int = 0
+  fp: int = 0
+  fn: int = 0
+
+  @property
+  def precision(self) -> float:
+    """Fraction of predictions that were correct"""
+    return self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+
+  @property
+  def recall(self) -> float:
+    """Fraction of expected labels that were predicted"""
+    return self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+
+  @property
+  def f1(self) -> float:
+    """Harmonic mean of precision and recall"""
+    total = self.precision + self.recall
+    return 2 * self.precision * self.recall / total if total else 0.0
+
+  def to_dict(self) -> dict:
+    """Returns the counts along with precision, recall, and F1"""
+    return {
+      **asdict(self),
+      'precision': self.precision,
+      'recall': self.recall,
+      'f1': self.f1,
+    }
+
+
+@dataclass
+class FoldResult:
+  """Parse results and latencies for the held-out utterances of one fold"""
+  utterances: list[LabeledUtterance]
+  results: list[dict] = field(default_factory=list)
+  latencies: list[float] = field(default_factory=list)
+
+
+def bench(
+    data_dir: str = ASSISTANT_DATA_DIR,
+    folds: int = DEFAULT_FOLDS,
+    processes: Optional[int] = None,
+    random_seed: int = RANDOM_SEED,
+    nlu_engine: str = SNIPS_ENGINE,
+) -> dict:
+  """Evaluates an assistant NLU engine with stratified k-fold cross validation.
+
+  Each fold trains an engine on the other folds' utterances in a separate process, then parses
+  its own utterances one at a time with Executor._parse. Returns a JSON-serializable report of
+  per-intent precision/recall, slot precision/recall/F1, and parse latency percentiles.
+  Every engine is evaluated on the same folds for a given random_seed."""
+  dataset_paths = sorted(
+    os.path.join(data_dir, entry)
+    for entry in os.listdir(data_dir)
+    if os.path.isfile(os.path.join(data_dir, entry))
+  )
+  dataset = Dataset.from_yaml_files('en', dataset_paths).json
+  fold_utterances = _split_folds(dataset, folds, random_seed)
+
+  start = time.perf_counter()
+  with ProcessPoolExecutor(
+      max_workers=processes or min(folds, os.cpu_count() or 1),
+      mp_context=multiprocessing.get_context('spawn'),
+  ) as pool:
+    fold_results = list(pool.map(
+      _evaluate_fold,
+      [dataset] * folds,
+      fold_utterances,
+      [random_seed] * folds,
+      [nlu_engine] * folds,
+    ))
+  logger.info(
+    f'Evaluated {folds} folds with the {nlu_engine} engine '
+    f'in {time.perf_counter() - start:.04f} seconds')
+
+  return _build_report(fold_results, folds, random_seed, nlu_engine)
+
+
+def _split_folds(dataset: dict, folds: int, random_seed: int) -> list[list[LabeledUtterance]]:
+  """Assigns each intent's utterances to folds round-robin after shuffling, so that every fold
+  has about the same share of each intent. Intents with fewer utterances than folds are only
+  used for training."""
+  rng = random.Random(random_seed)
+  fold_utterances = [[] for _ in range(folds)]
+  for intent_name, intent in dataset['intents'].items():
+    utterances = [_label_utterance(intent_name, u) for u in intent['utterances']]
+    if len(utterances) < folds:
+      logger.warning(f'Not evaluating intent {intent_name} with {len(utterances)} utterances')
+      continue
+    rng.shuffle(utterances)
+    for i, utterance in enumerate(utterances):
+      fold_utterances[i % folds].append(utterance)
+  return fold_utterances
+
+
+def _label_utterance(intent_name: str, utterance: dict) -> LabeledUtterance:
+  text = ''
+  slots = []
+  for chunk in utterance['data']:
+    if 'slot_name' in chunk:
+      slots.append((chunk['slot_name'], len(text), len(text) + len(chunk['text'])))
+    text += chunk['text']
+  return LabeledUtterance(text, intent_name, slots)
+
+
+def _evaluate_fold(
+    dataset: dict,
+    test_utterances: list[LabeledUtterance],
+    random_seed: int,
+    nlu_engine: str,
+) -> FoldResult:
+  test_texts = {(u.intent_name, u.text) for u in test_utterances}
+  train_dataset = {
+    **dataset,
+    'intents': {
+      intent_name: {
+        **intent,
+        'utterances': [
+          u for u in intent['utterances']
+          if (intent_name, _label_utterance(intent_name, u).text) not in test_texts
+        ],
+      }
+      for intent_name, intent in dataset['intents'].items()
+    },
+  }
+
+  if nlu_engine == LINEAR_ENGINE:
+    engine = LinearNLUEngine(random_seed=random_seed).fit(train_dataset)
+  else:
+    engine = SnipsNLUEngine(config=CONFIG_EN, random_state=random_seed)
+    engine.fit(train_dataset)
+
+  fold_result = FoldResult(test_utterances)
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    model_dir = os.path.join(tmp_dir, 'assistant')
+    engine.persist(model_dir)
+
+    # Disable the parse cache so that every utterance is timed against the engine
+    executor = Executor(
+      model_dir=model_dir, intent_handlers=[], parse_cache_size=0, nlu_engine=nlu_engine,
+      watch_model=False)
+    try:
+      for utterance in test_utterances:
+        start = time.perf_counter()
+        # pylint: disable-next=protected-access
+        fold_result.results.append(executor._parse(utterance.text))
+        fold_result.latencies.append(time.perf_counter() - start)
+    finally:
+      executor.close()
+
+  return fold_result
+
+
+def _build_report(
+    fold_results: list[FoldResult], folds: int, random_seed: int, nlu_engine: str) -> dict:
+  intent_counts = defaultdict(Counts)
+  slot_counts = defaultdict(Counts)
+  total_slot_counts = Counts()
+  latencies = []
+
+  for fold_result in fold_results:
+    latencies += fold_result.latencies
+    for utterance, result in zip(fold_result.utterances, fold_result.results):
+      predicted_intent = result['intent']['intentName']
+      if predicted_intent == utterance.intent_name:
+        intent_counts[utterance.intent_name].tp += 1
+      else:
+        intent_counts[utterance.intent_name].fn += 1
+        if predicted_intent is not None:
+          intent_counts[predicted_intent].fp += 1
+
+      expected_slots = set(utterance.slots)
+      predicted_slots = {
+        (slot['slotName'], slot['range']['start'], slot['range']['end'])
+        for slot in result['slots']
+      }
+      counts = slot_counts[utterance.intent_name]
+      for slot_counts_ in (counts, total_slot_counts):
+        slot_counts_.tp += len(expected_slots & predicted_slots)
+        slot_counts_.fp += len(predicted_slots - expected_slots)
+        slot_counts_.fn += len(expected_slots - predicted_slots)
+
+  latencies_ms = np.array(latencies) * 1000
+  return {
+    'commit': _current_commit(),
+    'engine': nlu_engine,
+    'folds': folds,
+    'random_seed': random_seed,
+    'utterances': len(latencies),
+    'intents': {
+      intent_name: {
+        **intent_counts[intent_name].to_dict(),
+        'slots': slot_counts[intent_name].to_dict(),
+      }
+      for intent_name in sorted(intent_counts)
+    },
+    'slots': total_slot_counts.to_dict(),
+    'latency_ms': {
+      **{f'p{p}': float(np.percentile(latencies_ms, p)) for p in LATENCY_PERCENTILES},
+      'mean': float(latencies_ms.mean()),
+      'max': float(latencies_ms.max()),
+    },
+  }
+
+
+def _current_commit() -> Optional[str]:
+  try:
+    return subprocess.run(
+      ['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT_DIR, capture_output=True, check=True,
+      text=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def log_report(report: dict, baseline: Optional[dict] = None) -> None:
+  """Logs a summary of a report from bench, with changes relative to a baseline report"""
+  def metric(name: str, *keys: str) -> str:
+    value = report
+    baseline_value = baseline
+    for key in keys:
+      value = value[key]
+      baseline_value = baseline_value.get(key) if isinstance(baseline_value, dict) else None
+
+    if baseline_value is None:
+      return f'{name} {value:.03f}'
+    return f'{name} {value:.03f} ({value - baseline_value:+.03f})'
+
+  engine = report.get('engine', SNIPS_ENGINE)
+  if baseline is not None:
+    baseline_engine = baseline.get('engine', SNIPS_ENGINE)
+    logger.info(f'Results for the {engine} engine (relative to the {baseline_engine} engine)')
+  else:
+    logger.info(f'Results for the {engine} engine')
+
+  for intent_name in report['intents']:
+    logger.info(f"{intent_name}: " + ', '.join([
+      metric('precision', 'intents', intent_name, 'precision'),
+      metric('recall', 'intents', intent_name, 'recall'),
+      metric('slot F1', 'intents', intent_name, 'slots', 'f1'),
+    ]))
+
+  logger.info(f"Overall: {metric('slot F1', 'slots', 'f1')}")
+  logger.info('Parse latency (ms): ' + ', '.join(
+    metric(name, 'latency_ms', name) for name in report['latency_ms']))
+
+
+def main():
+  root_logger.addHandler(numbered_file_handler(os.path.join(LOGS_DIR, 'assistant', 'benchmarks')))
+
+  logger.info('Benchmarking assistant...')
+
+  parser = argparse.ArgumentParser(
+    prog = 'drone bench_assist'
+  )
+  parser.add_argument('-d', '--data-dir', default=ASSISTANT_DATA_DIR)
+  parser.add_argument('-k', '--folds', type=int, default=DEFAULT_FOLDS)
+  parser.add_argument('-p', '--processes', type=int, default=None)
+  parser.add_argument('-s', '--random-seed', type=int, default=RANDOM_SEED)
+  parser.add_argument(
+    '-e', '--engine', dest='nlu_engines', action='append', choices=NLU_ENGINE_MODEL_DIRS,
+    help='engine to evaluate, can be repeated to compare engines (default: snips)')
+  parser.add_argument(
+    '-o', '--output', default=None,
+    help='path to write the JSON report to, or a list of reports when comparing engines')
+  parser.add_argument(
+    '-b', '--baseline', default=None, help='JSON report from a previous run to compare against')
+  args = vars(parser.parse_args())
+
+  output_path = args.pop('output')
+  baseline_path = args.pop('baseline')
+  nlu_engines = args.pop('nlu_engines') or [SNIPS_ENGINE]
+
+  baseline = None
+  if baseline_path is not None:
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+      baseline = json.load(f)
+    if isinstance(baseline, list):
+      baseline = baseline[0]
+
+  # When comparing engines, the first engine is the baseline for the others
+  reports = []
+  for nlu_engine in nlu_engines:
+    report = bench(**args, nlu_engine=nlu_engine)
+    log_report(report, baseline)
+    reports.append(report)
+    baseline = baseline or report
+
+  output = reports[0] if len(reports) == 1 else reports
+  if output_path is not None:
+    with open(output_path, 'w', encoding='utf-8') as f:
+      json.dump(output, f, indent=2)
+    logger.info(f'Wrote report to {output_path}')
+  else:
+    print(json.dumps(output, indent=2))
+
+
+if __name__ == '__main__':
+  init(main)
@@ -0,0 +1,34 @@
+import re
+
+# Conjunctions that can join two commands, ex: "pause the music and tell me the weather"
+CONJUNCTION_PATTERN = re.compile(
+  r'\s*(?:,\s*)?\b(?:and then|and also|and|then)\b\s*|\s*;\s*', re.IGNORECASE)
+
+
+def split_compound_utterance(input_text: str, slots: list[dict] = ()) -> list[str]:
+  """Splits an utterance at conjunctions into the utterances it is made of.
+
+  Conjunctions inside a slot of `slots` (the slots parsed from the whole utterance) are not
+  split at, since they are probably part of a name, ex: "play Simon and Garfunkel". Neither are
+  conjunctions that join two values of the same slot, ex: "the weather in Denver and Boston".
+  Returns a list with only input_text if there is nothing to split."""
+  parts = []
+  start = 0
+  for match in CONJUNCTION_PATTERN.finditer(input_text):
+    if any(
+      slot['range']['start'] < match.end() and match.start() < slot['range']['end']
+      for slot in slots
+    ) or _joins_slot_values(match, slots):
+      continue
+    parts.append(input_text[start:match.start()])
+    start = match.end()
+  parts.append(input_text[start:])
+
+  parts = [part.strip() for part in parts if part.strip()]
+  return parts if len(parts) > 1 else [input_text]
+
+
+def _joins_slot_values(match: re.Match, slots: list[dict]) -> bool:
+  before = {slot.get('slotName') for slot in slots if slot['range']['end'] == match.start()}
+  after = {slot.get('slotName') for slot in slots if slot['range']['start'] == match.end()}
+  return bool(before & after)
@@ -1,95 +1,438 @@
+import asyncio
+import json
 import logging
-from typing import Optional
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Optional
 
 import requests
 from halo import Halo
 from snips_nlu import SnipsNLUEngine
 
 from bot import DEFAULT_BOT_NAME
+from bot.common.event_loop import EventLoopThread
 from bot.common.halo import halo_stream
 from bot.common.logging import serialize_dict, serialize_http_error
-from bot.common.perf import log_resource_usage, timed_fn
-from bot.language.assistant import ASSISTANT_MODEL_DIR
-from bot.language.assistant.intents import ALL_HANDLERS, IntentHandler
+from bot.common.paths import directory_fingerprint
+from bot.common.perf import log_cache_stats, log_resource_usage, timed_fn
+from bot.language.assistant import LINEAR_ENGINE, NLU_ENGINE_MODEL_DIRS, SNIPS_ENGINE
+from bot.language.assistant.compound import split_compound_utterance
+from bot.language.assistant.fast_path import FastPathMatcher
+from bot.language.assistant.intents import (ALL_HANDLERS, DEFAULT_INIT_WAIT, HandlerRegistry,
+                                            HandlerStartingError, IntentHandler)
+from bot.language.assistant.linear_engine import LinearNLUEngine
+from bot.language.assistant.model_watcher import DEFAULT_WATCH_INTERVAL, ModelWatcher
+from bot.language.assistant.parse_cache import (DEFAULT_PARSE_CACHE_SIZE, ParseCache,
+                                                normalize_utterance)
+from bot.language.assistant.parse_pool import ParsePool, measure_parse_throughput
+from bot.language.assistant.snapshot import load_engine, snapshot_path_for
 
 DEFAULT_CONFIDENCE_THRESHOLD = 0.33
+# Seconds to wait for an intent handler before replying with a fallback, see IntentHandler.deadline
+DEFAULT_HANDLER_DEADLINE = 6.0
+# Seconds that a handler which missed its deadline may keep running before it is cancelled
+DEFAULT_LATE_RESPONSE_TIMEOUT = 60.0
+
+# Parsed by every reloaded engine before it is used, to check that it works
+RELOAD_CHECK_UTTERANCE = 'Pause the music'
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class LoadedModel:
+  """An NLU engine and the other artifacts loaded from its model directory"""
+  engine: SnipsNLUEngine | LinearNLUEngine
+  fingerprint: str
+  fast_path: Optional[FastPathMatcher]
+
+
 class Executor:
   """Primary class for the AI assistant.
   
-  Uses snips-nlu to parse text into intents (queries or commands),
-  which are then passed to the appropriate IntentHandler implementation
-  to execute that query/command."""
+  Uses snips-nlu (or LinearNLUEngine, see nlu_engine) to parse text into intents
+  (queries or commands), which are then passed to the appropriate IntentHandler
+  implementation to execute that query/command."""
 
   def __init__(
       self,
       bot_name: str = DEFAULT_BOT_NAME,
-      model_dir: str = ASSISTANT_MODEL_DIR,
+      model_dir: Optional[str] = None,
       confidence_threshold: float = DEFAULT_CONFIDENCE_THRESHOLD,
-      intent_handlers: list[IntentHandler] = None
+      intent_handlers: list[IntentHandler] = None,
+      parse_processes: Optional[int] = None,
+      parse_cache_size: int = DEFAULT_PARSE_CACHE_SIZE,
+      preload_handlers: bool = False,
+      handler_init_wait: float = DEFAULT_INIT_WAIT,
+      snapshot_path: Optional[str] = None,
+      fast_path: bool = True,
+      nlu_engine: str = SNIPS_ENGINE,
+      watch_model: bool = True,
+      watch_interval: float = DEFAULT_WATCH_INTERVAL,
+      handler_deadline: Optional[float] = DEFAULT_HANDLER_DEADLINE,
+      late_response_timeout: float = DEFAULT_LATE_RESPONSE_TIMEOUT,
+      follow_up: Optional[Callable[[str], None]] = None,
   ):
+    if nlu_engine not in NLU_ENGINE_MODEL_DIRS:
+      raise ValueError(f'Unknown NLU engine: {nlu_engine}')
+    model_dir = model_dir or NLU_ENGINE_MODEL_DIRS[nlu_engine]
+
     self.bot_name = bot_name
-    self.engine = self.__init_engine(model_dir)
+    self.nlu_engine = nlu_engine
+    self.model_dir = model_dir
+    self.snapshot_path = snapshot_path or snapshot_path_for(model_dir)
+    self.parse_cache = ParseCache(parse_cache_size)
+    self.use_fast_path = fast_path
+
+    # When model_dir changes, the new engine is loaded in the background and swapped in at the
+    # start of the next parse, see __swap_reloaded_model
+    self.model_watcher = (
+      ModelWatcher(model_dir, self.__reload_model, self.__on_model_reloaded, watch_interval)
+      if watch_model else None
+    )
+    self.reloaded_model: Optional[LoadedModel] = None
+    self.reload_lock = threading.Lock()
+
+    model = self.__init_model(model_dir)
+    self.engine = model.engine
+    # Matches fixed phrases from the dataset without running the engine, see FastPathMatcher
+    self.fast_path = model.fast_path
+    self.parse_cache.reset(model.fingerprint)
+    if self.model_watcher is not None:
+      self.model_watcher.start()
     self.confidence_threshold = confidence_threshold
 
-    self.__init_handlers(intent_handlers)
+    self.parse_processes = parse_processes
+    self.parse_pool: Optional[ParsePool] = None
+
+    # Intent handlers run on a single long-lived event loop so that their async clients
+    # (ex: Spotify's aiohttp session) persist across turns
+    self.event_loop = EventLoopThread('assistant-event-loop')
+    self.handlers = HandlerRegistry(handler_init_wait, self.event_loop.loop)
+    self.__init_handlers(intent_handlers, preload_handlers)
+
+    # Handlers that miss their deadline keep running for up to late_response_timeout.
+    # If they finish, their response is sent with follow_up (ex: IOHandler.send).
+    self.handler_deadline = handler_deadline
+    self.late_response_timeout = late_response_timeout
+    self.follow_up = follow_up
+    self.late_responses: set[asyncio.Task] = set()
+
+    # In-flight executions of idempotent intents by intent_key, see
+    # IntentHandler.idempotent_intents. Only accessed from the event loop, so it needs no lock.
+    self.in_flight: dict[tuple, asyncio.Future] = {}
+    # Number of requests (or late responses) waiting for each handler task. A task is only
+    # cancelled once nothing is waiting for it.
+    self.task_waiters: Counter[asyncio.Future] = Counter()
 
     log_resource_usage()
 
   @timed_fn
-  def __init_engine(self, model_dir: str) -> SnipsNLUEngine:
+  def __init_model(self, model_dir: str) -> LoadedModel:
     with Halo(text='Loading assistant NLU engine...', spinner='dots', stream=halo_stream()):
-      return SnipsNLUEngine.from_path(model_dir)
+      return self.__load_model(model_dir)
 
-  @timed_fn
-  def __init_handlers(self, intent_handlers: list[IntentHandler]) -> None:
-    with Halo(
-        text='Initializing assistant intent handlers...', spinner='dots', stream=halo_stream()):
-      if intent_handlers is None:
-        self.intent_handlers = []
-        for handler_type in ALL_HANDLERS:
-          try:
-            self.intent_handlers.append(handler_type())
-          except RuntimeError:
-            logger.exception(f"Couldn't initialize handler type {handler_type.__name__!s}")
-      else:
-        self.intent_handlers = intent_handlers
+  def __load_model(self, model_dir: str) -> LoadedModel:
+    fingerprint = directory_fingerprint(model_dir)
+    if self.nlu_engine == LINEAR_ENGINE:
+      engine = LinearNLUEngine.from_path(model_dir)
+    else:
+      # The snapshot is only used if it was written from the current contents of model_dir
+      engine = load_engine(model_dir, self.snapshot_path, fingerprint)
+    fast_path = FastPathMatcher.load(model_dir) if self.use_fast_path else None
+    return LoadedModel(engine, fingerprint, fast_path)
+
+  def __reload_model(self, model_dir: str) -> LoadedModel:
+    # Runs on the model watcher thread. Raising keeps the current engine.
+    model = self.__load_model(model_dir)
+    result = model.engine.parse(RELOAD_CHECK_UTTERANCE)
+    if not isinstance(result.get('intent'), dict) or not isinstance(result.get('slots'), list):
+      raise ValueError(f'Reloaded engine returned an invalid parse result: {result}')
+    return model
+
+  def __on_model_reloaded(self, model: LoadedModel) -> None:
+    with self.reload_lock:
+      self.reloaded_model = model
+
+  def __swap_reloaded_model(self) -> None:
+    """Replaces the engine with the latest reloaded engine, if any. Called between turns so
+    that a parse already in progress finishes with the engine it started with."""
+    with self.reload_lock:
+      model, self.reloaded_model = self.reloaded_model, None
+    if model is None:
+      return
+
+    self.engine = model.engine
+    self.fast_path = model.fast_path
+    self.parse_cache.reset(model.fingerprint)
+    # Parse workers hold their own copy of the old engine
+    if self.parse_pool is not None:
+      self.parse_pool.close()
+      self.parse_pool = None
+    logger.info(f'Swapped in reloaded assistant NLU engine from {self.model_dir}')
+
+  def __init_handlers(self, intent_handlers: list[IntentHandler], preload: bool) -> None:
+    # Handler types are constructed in the background when first needed, see HandlerRegistry
+    if intent_handlers is None:
+      for handler_type in ALL_HANDLERS:
+        self.handlers.register_type(handler_type)
+    else:
+      for handler in intent_handlers:
+        self.handlers.register(handler)
+
+    if preload:
+      self.handlers.preload()
 
   @timed_fn
-  def converse(self, input_text: str) -> Optional[str]:
+  def converse(self, input_text: str, spinner: bool = True) -> Optional[str]:
     """Parses a text input as an intent, handles that command/query,
-    and returns a text response indicating how the input was handled."""
+    and returns a text response indicating how the input was handled.
+    Shows a spinner while working unless spinner is False."""
+    if not spinner:
+      return self.event_loop.run(self.converse_async(input_text))
     with Halo(text=f'{self.bot_name} is working...', spinner='dots', stream=halo_stream()):
-      intent = self._parse(input_text)
+      return self.event_loop.run(self.converse_async(input_text))
+
+  @timed_fn
+  async def converse_async(self, input_text: str) -> Optional[str]:
+    """Async version of converse. Must be awaited on self.event_loop."""
+    intent = await asyncio.to_thread(self._parse, input_text)
+    logger.debug(f'Parsed assistant intent:\n{serialize_dict(intent)}')
+
+    parts = await asyncio.to_thread(self.__parse_compound, input_text, intent)
+    if parts is not None:
+      return await self.__handle_compound(parts)
+
+    if intent['intent']['probability'] < self.confidence_threshold:
+      logger.debug('Intent was ignored due to low confidence')
+      return None
+    return await self.__handle_intent(intent)
 
+  def __parse_compound(
+      self, input_text: str, intent: dict) -> Optional[list[tuple[dict, IntentHandler]]]:
+    """Returns the intent and handler of each part of a compound input such as "pause the
+    music and tell me the weather", or None if the input isn't one. Every part must be
+    understood and have a ready handler, otherwise the input is handled as a whole."""
+    part_texts = split_compound_utterance(normalize_utterance(input_text), intent['slots'])
+    if len(part_texts) < 2:
+      return None
+
+    parts = []
+    for part_text in part_texts:
+      part_intent = self._parse(part_text)
+      if part_intent['intent']['probability'] < self.confidence_threshold:
+        return None
       try:
-        logger.debug(f'Parsed assistant intent:\n{serialize_dict(intent)}')
+        handler = self.handlers.find(part_intent)
+      except HandlerStartingError:
+        return None
+      if handler is None:
+        return None
+      parts.append((part_intent, handler))
+
+    logger.debug(
+      f'Split compound input into {len(parts)} intents: '
+      f"{[part_intent['intent']['intentName'] for part_intent, _ in parts]}")
+    return parts
+
+  async def __handle_compound(self, parts: list[tuple[dict, IntentHandler]]) -> Optional[str]:
+    """Handles the parts of a compound input and joins their responses in order.
 
-        if intent['intent']['probability'] < self.confidence_threshold:
-          logger.debug('Intent was ignored due to low confidence')
-          return None
+    Parts with different handlers are handled concurrently. Parts with the same handler are
+    handled one at a time in order, since they may depend on each other (ex: "pause the
+    music and then play Hello")."""
+    responses: list[Optional[str]] = [None] * len(parts)
+    part_indices_by_handler: dict[int, list[int]] = {}
+    for i, (_, handler) in enumerate(parts):
+      part_indices_by_handler.setdefault(id(handler), []).append(i)
 
-        for handler in self.intent_handlers:
-          if handler.can_handle(intent):
-            return handler.handle(intent)
+    async def handle_in_order(part_indices: list[int]) -> None:
+      for i in part_indices:
+        part_intent, handler = parts[i]
+        responses[i] = await self.__handle_intent(part_intent, handler)
 
+    await asyncio.gather(*(
+      handle_in_order(part_indices) for part_indices in part_indices_by_handler.values()))
+    responses = [response for response in responses if response]
+    return ' '.join(responses) if responses else None
+
+  async def __handle_intent(
+      self, intent: dict, handler: Optional[IntentHandler] = None) -> Optional[str]:
+    """Handles an intent with handler, finding its handler first if it isn't given"""
+    try:
+      if handler is None:
+        handler = await asyncio.to_thread(self.handlers.find, intent)
+      if handler is None:
         logger.debug("Couldn't find a handler for the intent")
         return None
 
-      except requests.HTTPError as ex:
-        logger.exception(
-          f'An error occurred while processing the intent\n{serialize_http_error(ex)}')
-        return "Sorry, but I'm having trouble connecting to the Internet to handle that for you."
-      except requests.ConnectionError:
-        logger.exception('An error occurred while processing the intent')
-        return "Sorry, but I'm having trouble connecting to the Internet to handle that for you."
-      except RuntimeError:
-        logger.exception('An error occurred while processing the intent')
-        return 'Sorry, but a problem occurred while I was looking into that for you.'
+      return await self.__handle_with_deadline(handler, intent)
+
+    except HandlerStartingError:
+      logger.debug('Intent handler is still initializing', exc_info=True)
+      return "Sorry, I'm still getting ready to do that. Please try again in a moment."
+
+    except requests.HTTPError as ex:
+      logger.exception(
+        f'An error occurred while processing the intent\n{serialize_http_error(ex)}')
+      return "Sorry, but I'm having trouble connecting to the Internet to handle that for you."
+    except requests.ConnectionError:
+      logger.exception('An error occurred while processing the intent')
+      return "Sorry, but I'm having trouble connecting to the Internet to handle that for you."
+    except RuntimeError:
+      logger.exception('An error occurred while processing the intent')
+      return 'Sorry, but a problem occurred while I was looking into that for you.'
+
+  async def __handle_with_deadline(self, handler: IntentHandler, intent: dict) -> Optional[str]:
+    deadline = handler.deadline if handler.deadline is not None else self.handler_deadline
+    task = self.__start_handling(handler, intent)
+    self.task_waiters[task] += 1
+    try:
+      if deadline is None:
+        # Shielded since the task may be shared with other requests
+        return await asyncio.shield(task)
+
+      try:
+        # Shielded so that the handler keeps running if the deadline passes
+        return await asyncio.wait_for(asyncio.shield(task), deadline)
+      except TimeoutError:
+        logger.warning(f'{type(handler).__name__} missed its {deadline:.01f} second deadline')
+
+      # The late response waits for the task in place of this request
+      self.task_waiters[task] += 1
+      late_response = asyncio.ensure_future(self.__finish_late(handler, task))
+      self.late_responses.add(late_response)
+      late_response.add_done_callback(self.late_responses.discard)
+    finally:
+      self.__release(task)
+
+    if self.follow_up is not None:
+      return "Sorry, that's taking longer than expected. I'll let you know when I have an answer."
+    return "Sorry, that's taking too long right now. Please try again in a moment."
+
+  def __start_handling(self, handler: IntentHandler, intent: dict) -> asyncio.Future:
+    """Starts handling an intent, or returns the in-flight execution of an identical
+    idempotent intent so that concurrent duplicates share its result"""
+    if intent['intent']['intentName'] not in handler.idempotent_intents:
+      return asyncio.ensure_future(handler.handle_async(intent))
+
+    key = intent_key(intent)
+    task = self.in_flight.get(key)
+    if task is not None:
+      logger.debug(f'Sharing the in-flight execution of {key}')
+      return task
+
+    task = asyncio.ensure_future(handler.handle_async(intent))
+    self.in_flight[key] = task
+    task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+    return task
+
+  async def __finish_late(self, handler: IntentHandler, task: asyncio.Future) -> None:
+    """Waits for a handler that missed its deadline, cancelling it after
+    late_response_timeout unless other requests are still waiting for it. Its response is
+    logged and sent with follow_up."""
+    handler_name = type(handler).__name__
+    try:
+      # Shielded since the task may be shared with other requests
+      response = await asyncio.wait_for(asyncio.shield(task), self.late_response_timeout)
+    except TimeoutError:
+      if self.__release(task):
+        # Handlers run in a worker thread (the default handle_async) can't be interrupted, but
+        # their response is discarded
+        task.cancel()
+        logger.warning(
+          f'Cancelled {handler_name} after {self.late_response_timeout:.01f} seconds')
+      else:
+        logger.warning(
+          f'Stopped waiting for {handler_name} after {self.late_response_timeout:.01f} seconds')
+      return
+    except Exception: # pylint: disable=broad-exception-caught
+      self.__release(task)
+      logger.exception(f'{handler_name} failed after missing its deadline')
+      return
+
+    self.__release(task)
+    logger.info(f'Late response from {handler_name}: {response}')
+    if response and self.follow_up is not None:
+      self.follow_up(response)
+
+  def __release(self, task: asyncio.Future) -> bool:
+    """Stops waiting for a handler task, returning whether nothing else is waiting for it"""
+    self.task_waiters[task] -= 1
+    if self.task_waiters[task] > 0:
+      return False
+    del self.task_waiters[task]
+    return True
 
   @timed_fn
   def _parse(self, input_text: str) -> dict:
-    return self.engine.parse(input_text)
+    self.__swap_reloaded_model()
+    input_text = normalize_utterance(input_text)
+    result = self.__match_fast_path(input_text)
+    if result is not None:
+      return result
+
+    result = self.parse_cache.parse(self.engine, input_text)
+    log_cache_stats('Assistant parse cache', self.parse_cache.stats)
+    return result
+
+  def __match_fast_path(self, input_text: str) -> Optional[dict]:
+    if self.fast_path is None:
+      return None
+    result = self.fast_path.match(input_text)
+    self.fast_path.log_stats()
+    return result
+
+  @timed_fn
+  def parse_batch(self, input_texts: list[str]) -> list[dict]:
+    """Parses many utterances in parallel with a pool of worker processes.
+
+    The pool is started on first use and reused afterwards. Each worker loads the engine
+    from model_dir once, so results are identical to calling _parse on each text.
+    LinearNLUEngine parses faster than a worker process can be sent an utterance, so
+    it always parses in this process."""
+    self.__swap_reloaded_model()
+    input_texts = [normalize_utterance(input_text) for input_text in input_texts]
+    results = [self.__match_fast_path(input_text) for input_text in input_texts]
+    missed_indices = [i for i, result in enumerate(results) if result is None]
+    if not missed_indices:
+      return results
+
+    if self.nlu_engine == LINEAR_ENGINE:
+      for i in missed_indices:
+        results[i] = self.engine.parse(input_texts[i])
+      return results
+
+    if self.parse_pool is None:
+      with Halo(text='Starting assistant parse workers...', spinner='dots', stream=halo_stream()):
+        self.parse_pool = ParsePool(self.model_dir, self.parse_processes)
+    parsed_results = self.parse_pool.parse([input_texts[i] for i in missed_indices])
+    for i, result in zip(missed_indices, parsed_results):
+      results[i] = result
+    return results
+
+  def measure_parse_scaling(
+      self, input_texts: list[str], max_processes: Optional[int] = None) -> dict[int, float]:
+    """Reports parse_batch throughput (utterances/sec) for 1 to max_processes workers"""
+    if self.nlu_engine == LINEAR_ENGINE:
+      raise ValueError('Parse workers are only used by the snips engine')
+    return measure_parse_throughput(self.model_dir, input_texts, max_processes)
+
+  def close(self) -> None:
+    """Releases background resources such as parse worker processes and the event loop"""
+    if self.model_watcher is not None:
+      self.model_watcher.stop()
+    self.handlers.close()
+    self.event_loop.stop()
+    if self.parse_pool is not None:
+      self.parse_pool.close()
+      self.parse_pool = None
+
+
+def intent_key(intent: dict) -> tuple:
+  """Returns a hashable key of an intent's name and resolved slot values. Intents with equal
+  keys are handled the same way, regardless of how they were worded."""
+  slot_values = sorted(
+    (slot['slotName'], json.dumps(slot['value'], sort_keys=True)) for slot in intent['slots'])
+  return (intent['intent']['intentName'], tuple(slot_values))
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+import yaml
+
+from bot.common.cache import CacheStats
+
+FAST_PATH_FILENAME = 'fast_path.json'
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_phrase(input_text: str) -> str:
+  """Lowercases text and removes punctuation and extra whitespace"""
+  return ' '.join(re.sub(r'[^\w\s]', '', input_text.lower()).split())
+
+
+class FastPathMatcher:
+  """Matches inputs against the slot-free utterances in the assistant dataset.
+
+  Many commands are short fixed phrases ("pause the music", "next track"). When an input is
+  exactly one of those phrases after normalization, its intent is known without running the
+  NLU engine. Phrases that appear in more than one intent are never matched."""
+
+  def __init__(self, phrases: dict[str, str]):
+    # Normalized phrase -> intent name
+    self.phrases = phrases
+    self.stats = CacheStats()
+
+  @classmethod
+  def from_dataset_files(cls, dataset_paths: list[str]) -> 'FastPathMatcher':
+    """Builds a matcher from snips-nlu YAML dataset files"""
+    intents_by_phrase: dict[str, set[str]] = {}
+    for path in dataset_paths:
+      with open(path, 'r', encoding='utf-8') as f:
+        docs = list(yaml.safe_load_all(f))
+      for doc in docs:
+        if doc.get('type') != 'intent':
+          continue
+        for utterance in doc.get('utterances', []):
+          # Slots are written as [slot_name] or [slot_name](value)
+          if '[' in utterance:
+            continue
+          intents_by_phrase.setdefault(normalize_phrase(utterance), set()).add(doc['name'])
+
+    phrases = {}
+    for phrase, intent_names in intents_by_phrase.items():
+      if len(intent_names) > 1:
+        logger.debug(f"Excluding ambiguous phrase '{phrase}' from fast path: {intent_names}")
+        continue
+      phrases[phrase] = intent_names.pop()
+    return cls(phrases)
+
+  @classmethod
+  def load(cls, model_dir: str) -> Optional['FastPathMatcher']:
+    """Loads the matcher saved to model_dir, or returns None if there isn't one"""
+    path = os.path.join(model_dir, FAST_PATH_FILENAME)
+    if not os.path.isfile(path):
+      return None
+    with open(path, 'r', encoding='utf-8') as f:
+      return cls(json.load(f)['phrases'])
+
+  def save(self, model_dir: str) -> None:
+    """Saves the matcher to model_dir alongside the NLU engine"""
+    with open(os.path.join(model_dir, FAST_PATH_FILENAME), 'w', encoding='utf-8') as f:
+      json.dump({'phrases': self.phrases}, f, indent=2, sort_keys=True)
+
+  def match(self, input_text: str) -> Optional[dict]:
+    """Returns a parse result in the same format as SnipsNLUEngine.parse if input_text
+    is a known phrase, otherwise None"""
+    start = time.perf_counter()
+    intent_name = self.phrases.get(normalize_phrase(input_text))
+    if intent_name is None:
+      self.stats.record_miss(time.perf_counter() - start)
+      return None
+
+    result = {
+      'input': input_text,
+      'intent': {
+        'intentName': intent_name,
+        'probability': 1.0,
+      },
+      'slots': [],
+    }
+    self.stats.record_hit(time.perf_counter() - start)
+    return result
+
+  def log_stats(self) -> None:
+    """Logs the hit rate and average latency of matched inputs"""
+    average_hit_ms = self.stats.hit_seconds / self.stats.hits * 1000 if self.stats.hits else 0.0
+    logger.debug(
+      f'Assistant fast path: {self.stats.hit_rate:.01%} hit rate '
+      f'({self.stats.hits} hits / {self.stats.misses} misses), '
+      f'{average_hit_ms:.04f} ms average hit latency')
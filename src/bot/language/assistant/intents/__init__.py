@@ -1,5 +1,6 @@
 from .intent import IntentHandler
 from .music import MusicHandler
+from .registry import DEFAULT_INIT_WAIT, HandlerRegistry, HandlerStartingError
 from .weather import WeatherHandler
 
 ALL_HANDLERS = [
@@ -0,0 +1,257 @@
+import asyncio
+import copy
+import json
+import logging
+import random
+import time
+from collections import Counter, deque
+from typing import Optional
+from urllib.parse import unquote
+
+from aiohttp import web
+
+FAKE_USER = {'id': 'fake-user', 'display_name': 'Fake User'}
+FAKE_DEVICES = [
+  {'id': 'laptop', 'name': 'Laptop', 'type': 'Computer', 'volume_percent': 50},
+  {'id': 'kitchen', 'name': 'Kitchen Speaker', 'type': 'Speaker', 'volume_percent': 30},
+  {'id': 'phone', 'name': 'Phone', 'type': 'Smartphone', 'volume_percent': 80},
+]
+
+logger = logging.getLogger(__name__)
+
+
+class FakeSpotifyServer:
+  """Local stand-in for the subset of the Spotify Web API used by MusicHandler.
+
+  It keeps a single user's player state, devices, playlists, and saved tracks in memory so
+  that commands behave as they would against Spotify. Each response is delayed by `latency`
+  seconds plus up to `jitter` seconds. Errors can be injected:
+  - `error_rate`: fraction of requests that fail with a 503
+  - `rate_limit`: requests per second above which requests fail with a 429 and a Retry-After
+
+  Requests are counted by method and path in `requests`. Point a SpotifyClient at `url`."""
+
+  def __init__(
+      self,
+      latency: float = 0.0,
+      jitter: float = 0.0,
+      error_rate: float = 0.0,
+      rate_limit: Optional[float] = None,
+      playlists: int = 120,
+      saved_tracks: int = 500,
+      random_seed: int = 0,
+  ):
+    self.latency = latency
+    self.jitter = jitter
+    self.error_rate = error_rate
+    self.rate_limit = rate_limit
+    self.random = random.Random(random_seed)
+    self.requests: Counter[tuple[str, str]] = Counter()
+    self.injected_errors: Counter[int] = Counter()
+    self.recent_requests: deque[float] = deque()
+
+    self.devices = copy.deepcopy(FAKE_DEVICES)
+    self.player = {
+      'device': {**self.devices[0], 'is_active': True},
+      'shuffle_state': False,
+      'repeat_state': 'off',
+      'is_playing': False,
+      'item': None,
+    }
+    self.playlists = [
+      _playlist(f'playlist{i}', 'Workshop' if i == 0 else f'Playlist {i}') for i in range(playlists)
+    ]
+    self.saved_tracks = [
+      {'added_at': '2023-02-08T15:30:00Z', 'track': _track(f'saved{i}', f'Saved Track {i}')}
+      for i in range(saved_tracks)
+    ]
+
+    self.app = web.Application(middlewares=[self.__inject])
+    self.app.add_routes([
+      web.get('/v1/me', self.__current_user),
+      web.get('/v1/me/player', self.__current_player),
+      web.put('/v1/me/player', self.__transfer_player),
+      web.get('/v1/me/player/devices', self.__available_devices),
+      web.put('/v1/me/player/play', self.__play),
+      web.put('/v1/me/player/pause', self.__pause),
+      web.post('/v1/me/player/next', self.__skip),
+      web.post('/v1/me/player/previous', self.__skip),
+      web.put('/v1/me/player/volume', self.__set_volume),
+      web.put('/v1/me/player/shuffle', self.__set_shuffle),
+      web.put('/v1/me/player/repeat', self.__set_repeat),
+      web.post('/v1/me/player/queue', self.__queue),
+      web.get('/v1/me/playlists', self.__current_playlists),
+      web.get('/v1/me/tracks', self.__saved_tracks),
+      web.get('/v1/search', self.__search),
+    ])
+    self.runner: Optional[web.AppRunner] = None
+    self.url: Optional[str] = None
+
+  async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+    """Starts serving on the running event loop and returns the API URL"""
+    self.runner = web.AppRunner(self.app)
+    await self.runner.setup()
+    site = web.TCPSite(self.runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1] # pylint: disable=protected-access
+    self.url = f'http://{host}:{port}/v1'
+    logger.debug(f'Fake Spotify API listening on {self.url}')
+    return self.url
+
+  async def stop(self) -> None:
+    """Stops serving"""
+    if self.runner is not None:
+      await self.runner.cleanup()
+      self.runner = None
+
+  @property
+  def request_count(self) -> int:
+    """Number of requests received, including those that failed"""
+    return sum(self.requests.values())
+
+  @web.middleware
+  async def __inject(self, request: web.Request, handler) -> web.StreamResponse:
+    self.requests[(request.method, request.path)] += 1
+
+    delay = self.latency + self.random.uniform(0, self.jitter)
+    if delay > 0:
+      await asyncio.sleep(delay)
+
+    if self.rate_limit is not None:
+      now = time.monotonic()
+      while self.recent_requests and now - self.recent_requests[0] >= 1.0:
+        self.recent_requests.popleft()
+      if len(self.recent_requests) >= self.rate_limit:
+        retry_after = 1.0 - (now - self.recent_requests[0])
+        return self.__error(429, 'API rate limit exceeded', {'Retry-After': f'{retry_after:.03f}'})
+      self.recent_requests.append(now)
+
+    if self.error_rate and self.random.random() < self.error_rate:
+      return self.__error(503, 'Service unavailable')
+    return await handler(request)
+
+  def __error(self, status: int, message: str, headers: Optional[dict] = None) -> web.Response:
+    self.injected_errors[status] += 1
+    return web.json_response(
+      {'error': {'status': status, 'message': message}}, status=status, headers=headers)
+
+  async def __current_user(self, _: web.Request) -> web.Response:
+    return web.json_response(FAKE_USER)
+
+  async def __current_player(self, _: web.Request) -> web.Response:
+    return web.json_response(self.player)
+
+  async def __available_devices(self, _: web.Request) -> web.Response:
+    active_id = self.player['device']['id']
+    return web.json_response({
+      'devices': [{**device, 'is_active': device['id'] == active_id} for device in self.devices]
+    })
+
+  async def __transfer_player(self, request: web.Request) -> web.Response:
+    body = await request.json()
+    device = self.__device(body['device_ids'][0])
+    if device is None:
+      return self.__not_found('Device not found')
+    self.player['device'] = {**device, 'is_active': True}
+    self.player['is_playing'] = self.player['is_playing'] or body.get('play', False)
+    return web.Response(status=204)
+
+  async def __play(self, request: web.Request) -> web.Response:
+    device_id = request.query.get('device_id')
+    if device_id is not None:
+      device = self.__device(device_id)
+      if device is None:
+        return self.__not_found('Device not found')
+      self.player['device'] = {**device, 'is_active': True}
+
+    body = json.loads(await request.text() or '{}')
+    if body.get('uris'):
+      self.player['item'] = _track(body['uris'][0].rsplit(':', 1)[-1], 'Track')
+    elif body.get('context_uri'):
+      self.player['item'] = _track(f'{body["context_uri"].rsplit(":", 1)[-1]}-1', 'Track 1')
+    self.player['is_playing'] = True
+    return web.Response(status=204)
+
+  async def __pause(self, _: web.Request) -> web.Response:
+    self.player['is_playing'] = False
+    return web.Response(status=204)
+
+  async def __skip(self, _: web.Request) -> web.Response:
+    self.player['item'] = _track(f'track{self.random.randrange(10 ** 6)}', 'Next Track')
+    return web.Response(status=204)
+
+  async def __set_volume(self, request: web.Request) -> web.Response:
+    volume = int(request.query['volume_percent'])
+    self.player['device']['volume_percent'] = volume
+    self.__device(self.player['device']['id'])['volume_percent'] = volume
+    return web.Response(status=204)
+
+  async def __set_shuffle(self, request: web.Request) -> web.Response:
+    self.player['shuffle_state'] = request.query['state'] == 'true'
+    return web.Response(status=204)
+
+  async def __set_repeat(self, request: web.Request) -> web.Response:
+    self.player['repeat_state'] = request.query['state']
+    return web.Response(status=204)
+
+  async def __queue(self, _: web.Request) -> web.Response:
+    return web.Response(status=204)
+
+  async def __current_playlists(self, request: web.Request) -> web.Response:
+    return web.json_response(_page(self.playlists, request))
+
+  async def __saved_tracks(self, request: web.Request) -> web.Response:
+    return web.json_response(_page(self.saved_tracks, request))
+
+  async def __search(self, request: web.Request) -> web.Response:
+    # spotify.py quotes the query before aiohttp encodes it
+    query = unquote(request.query['q'])
+    limit = int(request.query.get('limit', 20))
+    results = {}
+    for query_type in request.query['type'].split(','):
+      match query_type:
+        case 'track':
+          name = query.removeprefix('track:').split(' artist:')[0]
+          items = [_track(f'search{i}', name) for i in range(limit)]
+        case 'playlist':
+          items = [_playlist(f'search{i}', f'{query} {i}' if i else query) for i in range(limit)]
+          items[0]['owner']['id'] = 'spotify'
+        case _:
+          items = []
+      results[f'{query_type}s'] = {'items': items, 'next': None}
+    return web.json_response(results)
+
+  def __device(self, device_id: str) -> Optional[dict]:
+    return next((device for device in self.devices if device['id'] == device_id), None)
+
+  def __not_found(self, message: str) -> web.Response:
+    return web.json_response({'error': {'status': 404, 'message': message}}, status=404)
+
+
+def _track(track_id: str, name: str) -> dict:
+  return {
+    'id': track_id,
+    'name': name,
+    'uri': f'spotify:track:{track_id}',
+    'artists': [{'id': 'artist', 'name': 'Fake Artist'}],
+  }
+
+
+def _playlist(playlist_id: str, name: str) -> dict:
+  return {
+    'id': playlist_id,
+    'name': name,
+    'uri': f'spotify:playlist:{playlist_id}',
+    'owner': {'id': FAKE_USER['id']},
+  }
+
+
+def _page(items: list, request: web.Request) -> dict:
+  limit = int(request.query.get('limit', 20))
+  offset = int(request.query.get('offset', 0))
+  has_next = offset + limit < len(items)
+  return {
+    'items': items[offset:offset + limit],
+    'total': len(items),
+    'next': f'{request.url.with_query(limit=limit, offset=offset + limit)}' if has_next else None,
+  }
@@ -0,0 +1,63 @@
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Optional
+
+from bot.common.cache import CacheStats, TTLCache
+from bot.language.assistant.intents.weather_series import DailySeries
+
+# Seconds that each weather.com redux-dal query's responses are cached for, following how often
+# the data behind them changes. Forecasts are revised several times an hour at most, and the
+# last 30 days of observations gain a day at a time. Almanac averages and sun/moon times for a
+# given date don't change.
+FORECAST_TTL = 30 * 60
+HISTORICAL_TTL = 60 * 60
+ALMANAC_TTL = 7 * 24 * 60 * 60
+ASTRO_TTL = 7 * 24 * 60 * 60
+
+FORECAST_QUERY = 'getSunV3DailyForecastWithHeadersUrlConfig'
+HISTORICAL_QUERY = 'getSunV3HistoricalDailyConditions30DayUrlConfig'
+ALMANAC_QUERY = 'getSunV3DailyAlmanacUrlConfig'
+ASTRO_QUERY = 'getSunV2AstroUrlConfig'
+
+
+@dataclass(frozen=True)
+class ForecastSource:
+  """A redux-dal query whose responses can be cached, along with how long they are cached for
+  and how their data is parsed"""
+  ttl: float
+  parse: Callable[[dict], DailySeries]
+
+
+FORECAST_SOURCES = {
+  FORECAST_QUERY: ForecastSource(FORECAST_TTL, DailySeries.from_forecast),
+  HISTORICAL_QUERY: ForecastSource(HISTORICAL_TTL, DailySeries.from_historical),
+  ALMANAC_QUERY: ForecastSource(ALMANAC_TTL, DailySeries.from_almanac),
+  ASTRO_QUERY: ForecastSource(ASTRO_TTL, DailySeries.from_astro),
+}
+
+
+class ForecastCache:
+  """Caches the data returned by weather.com redux-dal queries by query name and geocode,
+  parsed into DailySeries.
+
+  Each response covers a range of dates (ex: the 15 day forecast), so one response answers
+  questions about any of those dates until it expires."""
+
+  def __init__(self, clock: Callable[[], float] = time.monotonic):
+    self.entries = TTLCache(FORECAST_TTL, clock)
+    self.stats = CacheStats()
+
+  def get(self, query_name: str, geocode: str, dates: list[date]) -> Optional[DailySeries]:
+    """Returns the cached data for the query and geocode if it has every date"""
+    series = self.entries.get((query_name, geocode))
+    if series is None or not series.covers(dates):
+      return None
+    return series
+
+  def put(self, query_name: str, geocode: str, data: dict) -> DailySeries:
+    """Parses and caches the data returned by a successful query for geocode"""
+    source = FORECAST_SOURCES[query_name]
+    series = source.parse(data)
+    self.entries.put((query_name, geocode), series, source.ttl)
+    return series
@@ -0,0 +1,107 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from bot import DATA_DIR
+
+WEATHER_DATA_DIR = os.path.join(DATA_DIR, 'weather')
+GEOCODE_CACHE_PATH = os.path.join(WEATHER_DATA_DIR, 'geocode.sqlite3')
+# Seconds to wait for another process to finish writing to the cache
+LOCK_TIMEOUT = 5.0
+
+logger = logging.getLogger(__name__)
+
+# (found city name, latitude, longitude), see WeatherHandler.fetch_city_metadata
+Location = tuple[str, float, float]
+
+
+class GeocodeCache:
+  """Persistent cache of the locations that city name queries resolve to, since city
+  coordinates essentially never change.
+
+  Entries are keyed by the normalized query and locale, and stored in a SQLite database so that
+  several processes can share the cache safely. Every entry is loaded into memory when the cache
+  is opened; entries added by other processes since then are read from the database on a miss.
+  If the database can't be used, the cache only lasts as long as the process."""
+
+  def __init__(self, path: str = GEOCODE_CACHE_PATH):
+    self.path = path
+    self.entries: dict[tuple[str, str], Location] = {}
+    self.lock = threading.Lock()
+    self.connection: Optional[sqlite3.Connection] = None
+    self.__open()
+
+  def __open(self) -> None:
+    start = time.perf_counter()
+    try:
+      os.makedirs(os.path.dirname(self.path), exist_ok=True)
+      # Used from the worker threads that handle intents, serialized by lock
+      self.connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+      with self.connection:
+        # Lets processes read while another one writes
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+          'CREATE TABLE IF NOT EXISTS geocodes ('
+          'query TEXT NOT NULL, locale TEXT NOT NULL, city TEXT NOT NULL, '
+          'latitude REAL NOT NULL, longitude REAL NOT NULL, fetched_at REAL NOT NULL, '
+          'PRIMARY KEY (query, locale)) WITHOUT ROWID')
+      rows = self.connection.execute(
+        'SELECT query, locale, city, latitude, longitude FROM geocodes').fetchall()
+    except (OSError, sqlite3.Error):
+      logger.warning(f'Failed to open the geocode cache at {self.path}', exc_info=True)
+      self.close()
+      return
+
+    self.entries = {(query, locale): (city, lat, lon) for query, locale, city, lat, lon in rows}
+    logger.debug(
+      f'Loaded {len(self.entries)} cached geocodes in {time.perf_counter() - start:.04f} seconds')
+
+  def get(self, query: str, locale: str) -> Optional[Location]:
+    """Returns the cached location for a city name query, or None if it isn't cached"""
+    key = (normalize_query(query), locale)
+    with self.lock:
+      location = self.entries.get(key)
+      if location is not None or self.connection is None:
+        return location
+
+      # May have been added by another process
+      try:
+        row = self.connection.execute(
+          'SELECT city, latitude, longitude FROM geocodes WHERE query = ? AND locale = ?',
+          key).fetchone()
+      except sqlite3.Error:
+        logger.warning('Failed to read from the geocode cache', exc_info=True)
+        return None
+      if row is not None:
+        self.entries[key] = row
+      return row
+
+  def put(self, query: str, locale: str, location: Location) -> None:
+    """Caches the location that a city name query resolved to"""
+    key = (normalize_query(query), locale)
+    with self.lock:
+      self.entries[key] = location
+      if self.connection is None:
+        return
+      try:
+        with self.connection:
+          self.connection.execute(
+            'INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?)',
+            (*key, *location, time.time()))
+      except sqlite3.Error:
+        logger.warning('Failed to write to the geocode cache', exc_info=True)
+
+  def close(self) -> None:
+    """Closes the database. Entries already in memory remain available."""
+    with self.lock:
+      if self.connection is not None:
+        self.connection.close()
+        self.connection = None
+
+
+def normalize_query(query: str) -> str:
+  """Normalizes a city name query so that variations in case and spacing share an entry"""
+  return ' '.join(query.casefold().split())
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional
 
@@ -5,9 +6,28 @@ from typing import Optional
 class IntentHandler(ABC):
   """Base class for intent handlers. Provides convenience methods for extracting data
   from snips-nlu intent dictionaries returned by the parser"""
-  @abstractmethod
+
+  # Names of the intents handled by this class. HandlerRegistry uses these to dispatch
+  # intents with a dict lookup, and to defer constructing the handler until it is needed.
+  supported_intents: frozenset[str] = frozenset()
+
+  # Intents that can be handled once for several identical concurrent requests, since handling
+  # them twice has the same effect as handling them once (ex: queries). Executor shares one
+  # execution of these between requests with the same intent and slot values.
+  idempotent_intents: frozenset[str] = frozenset()
+
+  # Seconds that Executor waits for handle_async before replying with a fallback.
+  # None uses the Executor's handler_deadline.
+  deadline: Optional[float] = None
+
+  def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+    # The event loop that handle_async will be awaited on. Handlers holding async clients
+    # should bind them to this loop.
+    self.loop = loop
+
   def can_handle(self, intent: dict) -> bool:
     """Returns true if this class can handle the specified intent."""
+    return self._find_intent_name(intent) in self.supported_intents
 
   @abstractmethod
   def handle(self, intent: dict) -> str:
@@ -16,6 +36,12 @@ class IntentHandler(ABC):
     
     Raises ValueError if this IntentHandler class can't handle the specified intent."""
 
+  async def handle_async(self, intent: dict) -> str:
+    """Async version of handle. Handlers that make network requests should override this
+    so that their requests can run concurrently. By default, handle is run in a worker thread
+    so that it doesn't block the event loop."""
+    return await asyncio.to_thread(self.handle, intent)
+
   def _find_intent_name(self, intent: dict) -> str:
     return intent['intent']['intentName']
 
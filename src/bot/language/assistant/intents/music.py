@@ -1,22 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import logging
 import os
 import threading
 import time
 import webbrowser
-from difflib import SequenceMatcher
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from typing import Optional, Type
+from typing import Any, Awaitable, Callable, Coroutine, Optional, Type
 from urllib.parse import parse_qs, urlparse
 
 import spotify
 
 from bot import SECRETS_PATH
+from bot.common.cache import CacheStats, TTLCache
+from bot.common.event_loop import run_sync
+from bot.common.fuzzy import best_match
 from bot.language.assistant.intents.intent import IntentHandler
+from bot.language.assistant.intents.spotify_client import SpotifyClient
+from bot.language.assistant.intents.spotify_library import REFRESH_INTERVAL, SpotifyLibraryIndex
+from bot.language.assistant.intents.spotify_player import PLAYER_POLL_INTERVAL, PlayerStateMirror
 
-SUPPORTED_INTENTS = {
+SUPPORTED_INTENTS = frozenset({
   'play_track',
   'queue_track',
   'play_playlist',
@@ -30,7 +40,46 @@ SUPPORTED_INTENTS = {
   'toggle_music_shuffle',
   'toggle_music_repeat',
   'switch_music_device',
-}
+})
+
+# Intents with the same effect when run twice at once, so concurrent duplicates can share one
+# execution. Toggles, volume changes, skips, and queueing change state relative to the current
+# state, so each duplicate must run.
+IDEMPOTENT_INTENTS = frozenset({
+  'play_track',
+  'play_playlist',
+  'play_artist_radio',
+  'pause_music',
+  'resume_music',
+  'switch_music_device',
+})
+
+# Seconds to reuse the device list fetched from Spotify. Commands that change it invalidate the
+# cached value, so this only bounds how stale changes made elsewhere (ex: in the Spotify app)
+# can be. The player state is mirrored separately, see PlayerStateMirror.
+SPOTIFY_STATE_TTL = 5.0
+
+# Spotify state cache lookups for the command being handled, see MusicHandler.handle_async
+_command_cache_stats: ContextVar[Optional[CacheStats]] = ContextVar(
+  'command_cache_stats', default=None)
+_MISSING = object()
+
+
+@dataclass
+class RoundTrips:
+  """Spotify requests made while handling a command. When requests run concurrently, their
+  total duration is more than the time the command took."""
+  count: int = 0
+  seconds: float = 0.0
+
+  def record(self, seconds: float) -> None:
+    """Records a completed request"""
+    self.count += 1
+    self.seconds += seconds
+
+
+_command_round_trips: ContextVar[Optional[RoundTrips]] = ContextVar(
+  'command_round_trips', default=None)
 
 OAUTH_SCOPES = [
   'playlist-read-collaborative',
@@ -60,17 +109,58 @@ class MusicHandler(IntentHandler):
   For a full list of supported commands, see data/assistant/music.yml. Examples:
   - Play Forget Me Nots by Patrice Rushen
   - Lower the volume
-  - Skip to the next track"""
+  - Skip to the next track
+
+  Commands are coroutines on `loop`, which may be running in another thread (see
+  Executor). Use `run` to call them from synchronous code.
+
+  Track and playlist names are looked up in a local index of the user's library (see
+  SpotifyLibraryIndex) before falling back to Spotify search. The index is refreshed in the
+  background on `loop` whenever it is older than REFRESH_INTERVAL.
+
+  The player state is mirrored locally (see PlayerStateMirror) and polled in the background
+  every PLAYER_POLL_INTERVAL seconds, so that commands like volume changes only need to send
+  the change."""
+
+  supported_intents = SUPPORTED_INTENTS
+  idempotent_intents = IDEMPOTENT_INTENTS
 
   def __init__(
       self,
       client_id: Optional[str] = None,
       client_secret: Optional[str] = None,
       refresh_token: Optional[str] = None,
+      loop: Optional[asyncio.AbstractEventLoop] = None,
+      client: Optional[SpotifyClient] = None,
+      library: Optional[SpotifyLibraryIndex] = None,
   ):
+    """Authenticates with the given credentials, falling back to those in secrets.json and
+    then to authorizing in a browser. If client is specified, it is used as is and secrets.json
+    is ignored, ex: for a client connected to a FakeSpotifyServer. The user's library index is
+    loaded from SPOTIFY_DATA_DIR unless library is specified."""
+    super().__init__(loop or asyncio.new_event_loop())
+    self._init_state_cache()
+
     # Disable asyncio spam caused by spotify.py
     logging.getLogger('asyncio').setLevel(logging.CRITICAL)
 
+    if client is None:
+      self.__auth_with_secrets(client_id, client_secret, refresh_token)
+    else:
+      self.client = client
+      self.user = self.run(client.current_user())
+      self._time_requests()
+
+    self._init_library(library or SpotifyLibraryIndex.for_user(self.user['id']))
+    if self.loop.is_running():
+      self.loop.call_soon_threadsafe(self.__start_background_tasks)
+
+  def __auth_with_secrets(
+      self,
+      client_id: Optional[str] = None,
+      client_secret: Optional[str] = None,
+      refresh_token: Optional[str] = None,
+  ) -> None:
     secrets = {'spotify': {}}
     if os.path.isfile(SECRETS_PATH):
       with open(SECRETS_PATH, 'r', encoding='utf-8') as f:
@@ -92,27 +182,102 @@ class MusicHandler(IntentHandler):
         json.dump(secrets, f)
 
   def _auth(self, client_id: str, client_secret: str, refresh_token: Optional[str] = None) -> None:
-    client = spotify.Client(client_id, client_secret)
-
     if refresh_token is None:
+      client = spotify.Client(client_id, client_secret, loop=self.loop)
       oauth = spotify.OAuth2(client_id, OAUTH_CODE_CALLBACK_URL, scopes=OAUTH_SCOPES)
       oauth_code = _authorize(oauth.url, OAUTH_CODE_CALLBACK_URL)
-      self.user = client.loop.run_until_complete(
+      user = self.run(
         spotify.User.from_code(client, oauth_code, redirect_uri=OAUTH_CODE_CALLBACK_URL))
-    else:
+      # Only its refresh token is needed, requests are made by a SpotifyClient
+      refresh_token = user.http.refresh_token
+      self.run(user.http.close())
+
+    try:
+      self.client, self.user = self.run(self.__connect(client_id, client_secret, refresh_token))
+    except spotify.HTTPException:
+      logger.warning('Refresh token may be expired', exc_info=True)
+      self._auth(client_id, client_secret)
+      return
+
+    self._time_requests()
+
+  async def __connect(
+      self, client_id: str, client_secret: str, refresh_token: str) -> tuple[SpotifyClient, dict]:
+    """Returns a SpotifyClient for refresh_token and the user it belongs to. The client is
+    created here so that its HTTP session belongs to the running loop."""
+    client = SpotifyClient(client_id, client_secret, None, refresh_token)
+    try:
+      return client, await client.current_user()
+    except BaseException:
+      await client.close()
+      raise
+
+  def _init_state_cache(self, ttl: float = SPOTIFY_STATE_TTL) -> None:
+    # Available devices, keyed by 'devices'
+    self.state_cache = TTLCache(ttl)
+    self.state_cache_stats = CacheStats()
+    self.player = PlayerStateMirror()
+    self.player_poll: Optional[asyncio.Task] = None
+
+  def _time_requests(self) -> None:
+    """Records the duration of each request made by client in the current command's
+    RoundTrips, see handle_async"""
+    # Totals of the commands handled so far
+    self.round_trips_by_intent: defaultdict[str, RoundTrips] = defaultdict(RoundTrips)
+    self.commands_by_intent: Counter[str] = Counter()
+    request = self.client.request
+
+    @functools.wraps(request)
+    async def timed_request(*args, **kwargs):
+      start = time.perf_counter()
       try:
-        self.user = client.loop.run_until_complete(
-          spotify.User.from_refresh_token(client, refresh_token))
-      except spotify.HTTPException:
-        logger.warning('Refresh token may be expired', exc_info=True)
-        self._auth(client_id, client_secret)
+        return await request(*args, **kwargs)
+      finally:
+        round_trips = _command_round_trips.get()
+        if round_trips is not None:
+          round_trips.record(time.perf_counter() - start)
 
-    self.client = self.user.http
+    self.client.request = timed_request
 
-  def can_handle(self, intent: dict) -> bool:
-    return self._find_intent_name(intent) in SUPPORTED_INTENTS
+  def _init_library(self, library: SpotifyLibraryIndex) -> None:
+    self.library = library
+    self.library_refresh: Optional[asyncio.Task] = None
+
+  def run(self, coro: Coroutine) -> Any:
+    """Runs a coroutine on this handler's event loop from synchronous code"""
+    return run_sync(coro, self.loop)
 
   def handle(self, intent: dict) -> str:
+    return self.run(self.handle_async(intent))
+
+  async def handle_async(self, intent: dict) -> str:
+    # Started before the command's context variables are set so that the background refresh
+    # isn't counted as part of this command
+    self.__refresh_library_if_stale()
+
+    intent_name = self._find_intent_name(intent)
+    command_stats = CacheStats()
+    _command_cache_stats.set(command_stats)
+    round_trips = RoundTrips()
+    _command_round_trips.set(round_trips)
+    start = time.perf_counter()
+    try:
+      return await self.__handle_intent(intent)
+    finally:
+      totals = self.round_trips_by_intent[intent_name]
+      totals.count += round_trips.count
+      totals.seconds += round_trips.seconds
+      self.commands_by_intent[intent_name] += 1
+      logger.debug(
+        f'Handled {intent_name} in {time.perf_counter() - start:.04f} seconds with '
+        f'{round_trips.count} Spotify round trips totaling {round_trips.seconds:.04f} seconds')
+      logger.debug(
+        f'Spotify state cache saved {command_stats.hits} round trips for '
+        f'{intent_name} ({command_stats.misses} made). Overall: '
+        f'{self.state_cache_stats.hit_rate:.01%} hit rate, '
+        f'{self.state_cache_stats.time_saved:.04f} seconds saved')
+
+  async def __handle_intent(self, intent: dict) -> str:
     track_name = self._find_named_slot_value(intent, 'track', '')
     artist_name = self._find_named_slot_value(intent, 'artist', '')
     playlist_name = self._find_named_slot_value(intent, 'playlist', '')
@@ -121,78 +286,81 @@ class MusicHandler(IntentHandler):
     intent_name = self._find_intent_name(intent)
     match intent_name:
       case 'play_track':
-        return self.play_track(track_name, artist_name, device_name)
+        return await self.play_track(track_name, artist_name, device_name)
       case 'queue_track':
-        return self.queue_track(track_name, artist_name)
+        return await self.queue_track(track_name, artist_name)
       case 'play_playlist':
-        return self.play_playlist(playlist_name, device_name)
+        return await self.play_playlist(playlist_name, device_name)
       case 'play_artist_radio':
-        return self.play_artist_radio(artist_name, device_name)
+        return await self.play_artist_radio(artist_name, device_name)
       case 'pause_music':
-        return self.pause_music()
+        return await self.pause_music()
       case 'resume_music':
-        return self.resume_music()
+        return await self.resume_music()
       case 'play_previous_track':
-        return self.play_previous_track()
+        return await self.play_previous_track()
       case 'play_next_track':
-        return self.play_next_track()
+        return await self.play_next_track()
       case 'raise_music_volume':
-        return self.raise_volume()
+        return await self.raise_volume()
       case 'lower_music_volume':
-        return self.lower_volume()
+        return await self.lower_volume()
       case 'toggle_music_shuffle':
-        return self.toggle_shuffle()
+        return await self.toggle_shuffle()
       case 'toggle_music_repeat':
-        return self.toggle_repeat()
+        return await self.toggle_repeat()
       case 'switch_music_device':
-        return self.switch_device(device_name)
+        return await self.switch_device(device_name)
 
     raise ValueError(f'Unrecognized intent name {intent_name}')
 
-  def play_track(self, track_name: str, artist_name: str = '', device_name: str = '') -> str:
-    """Searches for a track with the specified title and artist and queues the first result.
+  async def play_track(self, track_name: str, artist_name: str = '', device_name: str = '') -> str:
+    """Searches for a track with the specified title and artist and plays the first result.
     If a device name is specified, an available device with the most similar name will be used
-    for playback."""
-    def play(track: spotify.Track) -> None:
-      device_id = self.__device_id(device_name)
-      self.client.loop.run_until_complete(
-        self.client.play_playback([track['uri']], device_id=device_id))
-
-    return self.__operate_on_searched_track('Playing', play, track_name, artist_name)
-
-  def queue_track(self, track_name: str, artist_name: str = '') -> str:
-    """Searches for a track with the specified title and artist and queues the first result.
-    If a device name is specified, an available device with the most similar name will be used
-    for playback."""
-    def queue(track: spotify.Track) -> None:
-      self.client.loop.run_until_complete(self.client.playback_queue(uri=track['uri']))
-
-    return self.__operate_on_searched_track('Queueing', queue, track_name, artist_name)
-
-  def play_playlist(self, playlist_name: str, device_name: str = '') -> str:
-    """Searches for and then plays a Spotify-curated playlist that most closely matches
-    the specified artist name"""
-    results = self.client.loop.run_until_complete(self.client.current_playlists(limit=50))
-    playlists = results['items']
-    if not playlists:
-      return "I couldn't find any playlists that belong to you"
-
-    self.__sort_results_by_relevance(playlists, 'name', playlist_name)
-    playlist = playlists[0]
-    logger.debug(f"Found playlist '{playlist['name']}' with relevance {playlist['relevance']}")
-
-    # TODO: Search doesn't seem to include private playlists from the current user
-    #   fall back to playlist search if relevance is too low (<0.5?)
+    for playback. The track and device are looked up concurrently."""
+    track, device_id = await asyncio.gather(
+      self.__find_track(track_name, artist_name), self.__device_id(device_name))
+    if track is None:
+      return _track_not_found_response(track_name, artist_name)
+
+    await self.__send(
+      self.client.play_playback([track['uri']], device_id=device_id),
+      self.__playback_changes(device_id))
+    return _track_response('Playing', track)
+
+  async def queue_track(self, track_name: str, artist_name: str = '') -> str:
+    """Searches for a track with the specified title and artist and queues the first result"""
+    track = await self.__find_track(track_name, artist_name)
+    if track is None:
+      return _track_not_found_response(track_name, artist_name)
+
+    await self.client.playback_queue(uri=track['uri'])
+    return _track_response('Queueing', track)
+
+  async def play_playlist(self, playlist_name: str, device_name: str = '') -> str:
+    """Plays the user's playlist that most closely matches the specified name. If none of the
+    user's playlists are similar, the most relevant public playlist found by search is played."""
+    playlist = self.library.find_playlist(playlist_name)
+    if playlist is None:
+      # Search doesn't include the user's private playlists, but they are in the library index
+      results, device_id = await asyncio.gather(
+        self.client.search(playlist_name, query_type='playlist'), self.__device_id(device_name))
+      playlists = results['playlists']['items']
+      if not playlists:
+        return f"I couldn't find any playlists named {playlist_name}"
+      playlist = self.__most_relevant(playlists, 'name', playlist_name)
+    else:
+      device_id = await self.__device_id(device_name)
 
-    device_id = self.__device_id(device_name)
-    self.client.loop.run_until_complete(
-      self.client.play_playback(playlist['uri'], device_id=device_id))
+    await self.__send(
+      self.client.play_playback(playlist['uri'], device_id=device_id),
+      self.__playback_changes(device_id))
     return f"Playing the playlist \"{playlist['name']}\" on Spotify"
 
-  def play_artist_radio(self, artist_name: str, device_name: str = '') -> str:
+  async def play_artist_radio(self, artist_name: str, device_name: str = '') -> str:
     """Plays a Spotify-curated playlist that most closely matches the specified artist name"""
-    results = self.client.loop.run_until_complete(
-      self.client.search(artist_name, query_type='playlist'))
+    results, device_id = await asyncio.gather(
+      self.client.search(artist_name, query_type='playlist'), self.__device_id(device_name))
     playlists = [p for p in results['playlists']['items'] if p['owner']['id'] == 'spotify']
     if not playlists:
       return f"I couldn't find any playlists for the artist {artist_name}"
@@ -200,155 +368,271 @@ class MusicHandler(IntentHandler):
     playlist = playlists[0]
     logger.debug(f"Found playlist '{playlist['name']}' for artist '{artist_name}'")
 
-    device_id = self.__device_id(device_name)
-    self.client.loop.run_until_complete(
-      self.client.play_playback(playlist['uri'], device_id=device_id))
+    await self.__send(
+      self.client.play_playback(playlist['uri'], device_id=device_id),
+      self.__playback_changes(device_id))
     return f"Playing the playlist \"{playlist['name']}\" on Spotify"
 
-  def pause_music(self) -> str:
+  async def pause_music(self) -> str:
     """Pauses music on the active playback device"""
     try:
-      self.client.loop.run_until_complete(self.client.pause_playback())
+      await self.__send(self.client.pause_playback(), {'is_playing': False})
     except spotify.NotFound:
       return "I couldn't find a Spotify device to pause"
     return 'I paused the music'
 
-  def resume_music(self) -> str:
+  async def resume_music(self) -> str:
     """Starts/resumes music on the last active playback device"""
     try:
-      self.client.loop.run_until_complete(self.client.play_playback(None))
+      await self.__send(self.client.play_playback(None), {'is_playing': True})
     except spotify.NotFound:
       return "I couldn't find a Spotify device to resume"
     return "I've resumed the music"
 
-  def play_previous_track(self) -> str:
+  async def play_previous_track(self) -> str:
     """Skips to the previous track on the user's track context"""
     try:
-      self.client.loop.run_until_complete(self.client.skip_previous())
+      # The mirror doesn't track the current track closely enough to predict it
+      await self.__send(self.client.skip_previous(), {})
     except spotify.NotFound:
       return "I couldn't find a Spotify device to control"
     return 'Started playing the previous track'
 
-  def play_next_track(self) -> str:
+  async def play_next_track(self) -> str:
     """Skips to next queued track"""
     try:
-      self.client.loop.run_until_complete(self.client.skip_next())
+      # The mirror doesn't track the current track closely enough to predict it
+      await self.__send(self.client.skip_next(), {})
     except spotify.NotFound:
       return "I couldn't find a Spotify device to control"
     return 'Started playing the next track'
 
-  def raise_volume(self) -> str:
+  async def raise_volume(self) -> str:
     """Increases volume on the current device by VOLUME_CHANGE_AMOUNT.
     Returns a failure response if no music is currently playing."""
-    return self._change_volume(VOLUME_CHANGE_AMOUNT)
+    return await self._change_volume(VOLUME_CHANGE_AMOUNT)
 
-  def lower_volume(self) -> str:
+  async def lower_volume(self) -> str:
     """Decreases volume on the current device by VOLUME_CHANGE_AMOUNT.
     Returns a failure response if no music is currently playing."""
-    return self._change_volume(-VOLUME_CHANGE_AMOUNT)
+    return await self._change_volume(-VOLUME_CHANGE_AMOUNT)
 
-  def _change_volume(self, amount: int) -> str:
-    player = self.client.loop.run_until_complete(self.client.current_player())
+  async def _change_volume(self, amount: int) -> str:
+    player = await self.__current_player()
     if not player:
       return "I can't do that since no music appears to be playing"
     volume = player['device']['volume_percent']
     new_volume = max(0, min(volume + amount, 100))
 
-    self.client.loop.run_until_complete(self.client.set_playback_volume(new_volume))
+    await self.__send(
+      self.client.set_playback_volume(new_volume), {'device.volume_percent': new_volume})
+    self.state_cache.invalidate('devices')
     return f'I set the volume to {new_volume} percent'
 
-  def toggle_shuffle(self) -> str:
+  async def toggle_shuffle(self) -> str:
     """Toggles playback shuffle mode.
     Returns a failure response if no music is currently playing."""
     # TODO: Support explicit on/off commands
-    player = self.client.loop.run_until_complete(self.client.current_player())
+    player = await self.__current_player()
     if not player:
       return "I can't do that since no music appears to be playing"
     shuffle_state = not player['shuffle_state']
 
-    self.client.loop.run_until_complete(self.client.shuffle_playback(shuffle_state))
+    await self.__send(self.client.shuffle_playback(shuffle_state), {'shuffle_state': shuffle_state})
     return f"I {'enabled' if shuffle_state else 'disabled'} playback shuffle"
 
-  def toggle_repeat(self) -> str:
+  async def toggle_repeat(self) -> str:
     """Toggles playback repeat mode between repeat-track and none.
     Returns a failure response if no music is currently playing."""
     # TODO: Support explicit on/off commands and repeat-track mode
-    player = self.client.loop.run_until_complete(self.client.current_player())
+    player = await self.__current_player()
     if not player:
       return "I can't do that since no music appears to be playing"
     repeat_state = 'context' if player['repeat_state'] == 'off' else 'off'
 
-    self.client.loop.run_until_complete(self.client.repeat_playback(repeat_state))
+    await self.__send(self.client.repeat_playback(repeat_state), {'repeat_state': repeat_state})
     return f"I {'enabled' if repeat_state == 'context' else 'disabled'} playback repeat"
 
-  def switch_device(self, device_name: str) -> str:
+  async def switch_device(self, device_name: str) -> str:
     """Begin playing music on the device that most closely matches device_name.
     device_name cannot be an empty string."""
-    device_id = self.__device_id(device_name)
-    self.client.loop.run_until_complete(self.client.transfer_player(device_id, play=True))
+    device_id = await self.__device_id(device_name)
+    # The device list fetched by __device_id is still valid for looking up the device's name
+    devices = [d for d in await self.__available_devices() if d['id'] == device_id]
+    device = devices[0] if devices else None
+
+    changes = None
+    if device is not None:
+      changes = {
+        'device.id': device['id'],
+        'device.name': device['name'],
+        'device.volume_percent': device['volume_percent'],
+        'is_playing': True,
+      }
+    await self.__send(self.client.transfer_player(device_id, play=True), changes)
+    self.state_cache.invalidate('devices')
 
     device_qualifier = ''
-    devices = self.client.loop.run_until_complete(self.client.available_devices())['devices']
-    if devices:
-      devices = [d for d in devices if d['id'] == device_id]
-      if devices:
-        device = devices[0]
-        device_qualifier = f" to {device['name']}"
+    if device is not None:
+      device_qualifier = f" to {device['name']}"
     return f'I transferred the music playback{device_qualifier}'
 
-  def __operate_on_searched_track(
-      self,
-      op_verb: str,
-      op: callable,
-      track_name: str,
-      artist_name: str = '',
-  ) -> str:
+  async def __find_track(self, track_name: str, artist_name: str = '') -> Optional[dict]:
+    """Returns the name, uri, and artist names of the track that best matches track_name and
+    artist_name, or None if there is no match. The library index is searched before Spotify."""
+    track = self.library.find_track(track_name, artist_name)
+    if track is not None:
+      logger.debug(f"Found track '{track['name']}' in the library index")
+      return track
+
     query = f'track:{track_name}'
     if artist_name != '':
       query += f' artist:{artist_name}'
-    results = self.client.loop.run_until_complete(self.client.search(query, query_type='track'))
-
+    results = await self.client.search(query, query_type='track')
     if not results['tracks']['items']:
       logger.info(f'No track results found for {query}')
-      track_description = track_name
-      if artist_name:
-        track_description += f' by {artist_name}'
-      return f"I couldn't find any results for the track {track_description}"
+      return None
+
     track = results['tracks']['items'][0]
+    return {
+      'name': track['name'],
+      'uri': track['uri'],
+      'artists': [artist['name'] for artist in track['artists']],
+    }
 
-    op(track)
+  def __start_background_tasks(self) -> None:
+    self.__refresh_library_if_stale()
+    if self.player_poll is None or self.player_poll.done():
+      self.player_poll = self.loop.create_task(self.__poll_player())
 
-    artist_description = ''
-    if track['artists']:
-      artist_description = f" by {track['artists'][0]['name']}"
-    return f"{op_verb} the track {track['name']}{artist_description} on Spotify"
+  async def __poll_player(self) -> None:
+    while True:
+      await asyncio.sleep(PLAYER_POLL_INTERVAL)
+      try:
+        await self.__fetch_player()
+      except Exception: # pylint: disable=broad-exception-caught
+        logger.warning('Failed to poll the Spotify player state', exc_info=True)
+
+  def __refresh_library_if_stale(self) -> None:
+    """Starts refreshing the library index in the background if it is older than
+    REFRESH_INTERVAL. Must be called on loop."""
+    if self.library_refresh is not None and not self.library_refresh.done():
+      return
+    if time.time() - self.library.refreshed_at < REFRESH_INTERVAL:
+      return
+    self.library_refresh = self.loop.create_task(self.__refresh_library())
+
+  async def __refresh_library(self) -> None:
+    try:
+      await self.library.refresh(self.client)
+    except Exception: # pylint: disable=broad-exception-caught
+      logger.warning('Failed to refresh the Spotify library index', exc_info=True)
 
-  def __device_id(self, device_name: str = '') -> Optional[str]:
+  async def __device_id(self, device_name: str = '') -> Optional[str]:
     """Determines which device to play on.
     Returns None if a device is already active and device_name is empty."""
     if device_name == '':
-      player = self.client.loop.run_until_complete(self.client.current_player())
+      player = await self.__current_player()
       if not player:
-        devices = self.client.loop.run_until_complete(self.client.available_devices())['devices']
+        devices = await self.__available_devices()
         if not devices:
           return None
         return devices[0]['id']
 
     else:
-      devices = self.client.loop.run_until_complete(self.client.available_devices())['devices']
+      devices = await self.__available_devices()
       if not devices:
         return None
-      self.__sort_results_by_relevance(devices, 'name', device_name)
-      device = devices[0]
-      logger.debug(f"Found device {device['name']} with relevance {device['relevance']}")
-      return device['id']
+      return self.__most_relevant(devices, 'name', device_name)['id']
 
     return None
 
-  def __sort_results_by_relevance(self, elts: list[dict], key: str, query: str) -> dict:
-    for elt in elts:
-      elt['relevance'] = SequenceMatcher(None, query, elt[key]).ratio()
-    elts.sort(key=lambda e: e['relevance'], reverse=True)
+  async def __current_player(self) -> dict:
+    """Returns the mirrored player state, fetching it if it isn't fresh or no device was
+    active, since music may have been started elsewhere. Returns an empty dict if no device is
+    active."""
+    start = time.perf_counter()
+    if self.player.is_fresh() and self.player.state:
+      self.__record_lookup(True, time.perf_counter() - start)
+      return self.player.state
+
+    await self.__fetch_player()
+    self.__record_lookup(False, time.perf_counter() - start)
+    return self.player.state
+
+  async def __fetch_player(self) -> None:
+    requested_at = self.player.clock()
+    self.player.replace(await self.client.current_player(), requested_at)
+
+  async def __send(self, request: Awaitable, changes: Optional[dict[str, Any]]) -> None:
+    """Awaits a request that changes the player. The mirror is updated with changes (see
+    PlayerStateMirror.update) before the request is sent so that concurrent commands build on
+    them. The mirror is invalidated if changes is None because the effect of the request can't
+    be predicted, or if the request fails."""
+    if changes is not None:
+      self.player.update(changes)
+    try:
+      await request
+    except BaseException:
+      self.player.invalidate()
+      raise
+    if changes is None:
+      self.player.invalidate()
+
+  def __playback_changes(self, device_id: Optional[str]) -> Optional[dict[str, Any]]:
+    """Returns the changes to the player when playback starts on device_id (None for the active
+    device), or None if playback moves to another device"""
+    if device_id is not None and device_id != self.player.state.get('device', {}).get('id'):
+      return None
+    return {'is_playing': True}
+
+  async def __available_devices(self) -> list[dict]:
+    return await self.__cached('devices', self.__fetch_devices)
+
+  async def __fetch_devices(self) -> list[dict]:
+    return (await self.client.available_devices())['devices']
+
+  async def __cached(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Returns the value cached under key in state_cache, fetching it on a miss"""
+    start = time.perf_counter()
+    value = self.state_cache.get(key, _MISSING)
+    if value is not _MISSING:
+      self.__record_lookup(True, time.perf_counter() - start)
+      return value
+
+    value = await fetch()
+    self.state_cache.put(key, value)
+    self.__record_lookup(False, time.perf_counter() - start)
+    return value
+
+  def __record_lookup(self, hit: bool, seconds: float) -> None:
+    """Records a lookup of Spotify state in the overall and current command's CacheStats"""
+    command_stats = _command_cache_stats.get() or CacheStats()
+    for stats in (self.state_cache_stats, command_stats):
+      if hit:
+        stats.record_hit(seconds)
+      else:
+        stats.record_miss(seconds)
+
+  def __most_relevant(self, elts: list[dict], key: str, query: str) -> dict:
+    """Returns the element of a non-empty list whose value for key is most similar to query"""
+    i, relevance = best_match(query, [elt[key] for elt in elts])
+    logger.debug(f"Found {elts[i][key]!r} with relevance {relevance:.03f} for {query!r}")
+    return elts[i]
+
+
+def _track_response(op_verb: str, track: dict) -> str:
+  artist_description = ''
+  if track['artists']:
+    artist_description = f" by {track['artists'][0]}"
+  return f"{op_verb} the track {track['name']}{artist_description} on Spotify"
+
+
+def _track_not_found_response(track_name: str, artist_name: str = '') -> str:
+  track_description = track_name
+  if artist_name:
+    track_description += f' by {artist_name}'
+  return f"I couldn't find any results for the track {track_description}"
 
 
 # TODO: if Spotify makes their device OAuth2 flow public, reimplement this using the
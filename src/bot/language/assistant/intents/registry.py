@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from .intent import IntentHandler
+
+# How long a turn waits for a handler that is still initializing before giving up
+DEFAULT_INIT_WAIT = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+class HandlerStartingError(RuntimeError):
+  """Raised when an intent's handler has not finished initializing yet"""
+
+
+class _HandlerSlot:
+  """Holds a single handler, constructing it in the background on first use"""
+
+  def __init__(self, handler_type: type[IntentHandler], handler: Optional[IntentHandler] = None):
+    self.handler_type = handler_type
+    self.future: Optional[Future] = None
+    if handler is not None:
+      self.future = Future()
+      self.future.set_result(handler)
+
+  def start(
+      self, init_pool: ThreadPoolExecutor, loop: Optional[asyncio.AbstractEventLoop]) -> Future:
+    if self.future is None:
+      self.future = init_pool.submit(self.__init_handler, loop)
+    return self.future
+
+  def __init_handler(self, loop: Optional[asyncio.AbstractEventLoop]) -> Optional[IntentHandler]:
+    name = self.handler_type.__name__
+    start = time.perf_counter()
+    try:
+      handler = self.handler_type(loop=loop) if loop is not None else self.handler_type()
+    except Exception: # pylint: disable=broad-exception-caught
+      logger.exception(f"Couldn't initialize handler type {name!s}")
+      return None
+
+    logger.debug(f'Initialized handler type {name!s} in {time.perf_counter() - start:.04f} seconds')
+    return handler
+
+
+class HandlerRegistry:
+  """Maps intent names to the handlers that support them.
+
+  Handler types are registered by the intents they declare in `supported_intents`, so
+  dispatch is a dict lookup. A handler type isn't constructed until one of its intents
+  is dispatched (or `preload` is called), and then only in a background thread, since
+  constructors such as MusicHandler's may block on network requests or user input.
+
+  Handler instances that don't declare their intents are checked with `can_handle`.
+  If `loop` is specified, it is passed to the constructor of each registered handler type."""
+
+  def __init__(
+      self,
+      init_wait: float = DEFAULT_INIT_WAIT,
+      loop: Optional[asyncio.AbstractEventLoop] = None,
+  ):
+    self.init_wait = init_wait
+    self.loop = loop
+    self.init_pool = ThreadPoolExecutor(thread_name_prefix='intent-handler-init')
+    self.slots_by_intent: dict[str, _HandlerSlot] = {}
+    self.slots: list[_HandlerSlot] = []
+    self.undeclared_handlers: list[IntentHandler] = []
+    self.lock = threading.Lock()
+
+  def register_type(self, handler_type: type[IntentHandler]) -> None:
+    """Registers a handler type to be constructed the first time one of its intents is dispatched"""
+    self.__add_slot(_HandlerSlot(handler_type))
+
+  def register(self, handler: IntentHandler) -> None:
+    """Registers an already constructed handler"""
+    if not handler.supported_intents:
+      self.undeclared_handlers.append(handler)
+      return
+    self.__add_slot(_HandlerSlot(type(handler), handler))
+
+  def __add_slot(self, slot: _HandlerSlot) -> None:
+    for intent_name in slot.handler_type.supported_intents:
+      if intent_name in self.slots_by_intent:
+        raise ValueError(
+          f'Intent {intent_name} is supported by both '
+          f'{self.slots_by_intent[intent_name].handler_type.__name__} '
+          f'and {slot.handler_type.__name__}')
+      self.slots_by_intent[intent_name] = slot
+    self.slots.append(slot)
+
+  def preload(self) -> None:
+    """Starts initializing every registered handler type in the background"""
+    with self.lock:
+      for slot in self.slots:
+        slot.start(self.init_pool, self.loop)
+
+  def find(self, intent: dict) -> Optional[IntentHandler]:
+    """Returns the handler for the intent, or None if there isn't one or it failed to initialize.
+
+    Raises HandlerStartingError if the handler is still initializing after waiting `init_wait`"""
+    intent_name = intent['intent']['intentName']
+    slot = self.slots_by_intent.get(intent_name)
+    if slot is None:
+      for handler in self.undeclared_handlers:
+        if handler.can_handle(intent):
+          return handler
+      return None
+
+    with self.lock:
+      future = slot.start(self.init_pool, self.loop)
+    try:
+      return future.result(timeout=self.init_wait)
+    except FutureTimeoutError as ex:
+      raise HandlerStartingError(
+        f'Handler type {slot.handler_type.__name__} is still initializing') from ex
+
+  def close(self) -> None:
+    """Stops the initialization thread, abandoning handlers that haven't started initializing"""
+    self.init_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Any, Optional
+
+import aiohttp
+import spotify
+
+from bot.common.rate_limit import TokenBucket, backoff_delay
+
+SPOTIFY_API_URL = 'https://api.spotify.com/v1'
+
+# Spotify doesn't publish its rate limit, which is computed over a rolling 30 second window.
+# These keep bursts of commands from several sessions well below it.
+SPOTIFY_REQUESTS_PER_SECOND = 5.0
+SPOTIFY_REQUEST_BURST = 20
+
+MAX_RETRIES = 4
+# Bounds of the jittered exponential backoff before retrying transient errors
+RETRY_BACKOFF_BASE = 0.25
+RETRY_BACKOFF_CAP = 8.0
+# Seconds to wait after a 429 response without a Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+# Responses that are worth retrying since they are usually transient
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+# Methods whose requests can be repeated without repeating their effect. Requests with other
+# methods (ex: POST to skip a track) may have been handled before a 5xx or a dropped
+# connection, so they are only retried when they certainly weren't.
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'})
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitStats:
+  """Counts of the requests made by SpotifyClients and the delays added by rate limiting"""
+  requests: int = 0
+  # 429 responses
+  throttled: int = 0
+  # Retries of transient errors, not including retries after a 429
+  retries: int = 0
+  # Requests that waited for the request budget and the total time waited
+  queued: int = 0
+  queue_seconds: float = 0.0
+  # Total time that Spotify asked us to wait in Retry-After headers
+  retry_after_seconds: float = 0.0
+  lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+  def record(self, **increments: float) -> None:
+    """Adds increments to the named counters"""
+    with self.lock:
+      for name, increment in increments.items():
+        setattr(self, name, getattr(self, name) + increment)
+
+  def to_dict(self) -> dict:
+    """Returns the counters"""
+    with self.lock:
+      return {f.name: getattr(self, f.name) for f in fields(self) if f.name != 'lock'}
+
+
+# Shared by every SpotifyClient in the process unless another budget is passed to it
+SPOTIFY_REQUEST_BUDGET = TokenBucket(SPOTIFY_REQUESTS_PER_SECOND, SPOTIFY_REQUEST_BURST)
+SPOTIFY_REQUEST_STATS = RateLimitStats()
+
+
+class SpotifyClient(spotify.HTTPUserClient):
+  """spotify.py user client that budgets its requests and retries throttled and failed ones.
+
+  Every request takes a token from `budget` first. A 429 response pauses the whole budget for
+  the response's Retry-After seconds, so that every client sharing it backs off, and is then
+  retried. Transient errors (RETRY_STATUSES and connection errors) are retried after a jittered
+  exponential backoff. Both are retried up to max_retries times before raising.
+
+  Requests are sent to api_url instead of the Spotify API if it is set, ex: for a fake server."""
+
+  def __init__(
+      self,
+      client_id: str,
+      client_secret: str,
+      token: Optional[str] = None,
+      refresh_token: Optional[str] = None,
+      loop: Optional[asyncio.AbstractEventLoop] = None,
+      budget: TokenBucket = SPOTIFY_REQUEST_BUDGET,
+      stats: RateLimitStats = SPOTIFY_REQUEST_STATS,
+      max_retries: int = MAX_RETRIES,
+      api_url: str = SPOTIFY_API_URL,
+  ):
+    super().__init__(client_id, client_secret, token, refresh_token, loop=loop)
+    self.budget = budget
+    self.stats = stats
+    self.max_retries = max_retries
+    self.api_url = api_url
+
+  def route(self, method: str, path: str, *, base: Optional[str] = None, **kwargs) -> tuple:
+    return spotify.HTTPClient.route(method, path, base=base or self.api_url, **kwargs)
+
+  async def request(self, route: tuple[str, str], **kwargs) -> Any:
+    """Makes a request to the Spotify API, see spotify.HTTPClient.request"""
+    method, url = route
+
+    headers = kwargs.pop('headers', {})
+    if 'Authorization' not in headers:
+      if self.bearer_info is None:
+        self.bearer_info = await self.get_bearer_info()
+      headers['Authorization'] = 'Bearer ' + self.bearer_info['access_token']
+    headers = {
+      'Content-Type': kwargs.pop('content_type', 'application/json'),
+      'User-Agent': self.user_agent,
+      **headers,
+    }
+    if 'json' in kwargs:
+      headers['Content-Type'] = 'application/json'
+      kwargs['data'] = json.dumps(kwargs.pop('json'), separators=(',', ':'), ensure_ascii=True)
+
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    attempt = 0
+    refreshed_token = False
+    while True:
+      queue_seconds = await self.budget.acquire()
+      self.stats.record(requests=1)
+      if queue_seconds > 0:
+        self.stats.record(queued=1, queue_seconds=queue_seconds)
+
+      try:
+        async with self._session.request(method, url, headers=headers, **kwargs) as response:
+          status = response.status
+          try:
+            data = json.loads(await response.text(encoding='utf-8'))
+          except json.JSONDecodeError:
+            data = {}
+      except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as ex:
+        # Failing to connect is the only error that guarantees the request wasn't sent
+        sent = not isinstance(ex, aiohttp.ClientConnectorError)
+        if attempt >= self.max_retries or (sent and not idempotent):
+          raise
+        delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+        logger.info(f'Retrying {method} {url} in {delay:.02f} seconds after {ex!r}')
+        self.stats.record(retries=1)
+        attempt += 1
+        await asyncio.sleep(delay)
+        continue
+
+      if 200 <= status < 300:
+        return data
+
+      if status == 401 and not refreshed_token:
+        # Access token expired
+        refreshed_token = True
+        self.bearer_info = await self.get_bearer_info()
+        headers['Authorization'] = 'Bearer ' + self.bearer_info['access_token']
+        continue
+
+      if status == 429:
+        retry_after = _retry_after(response.headers.get('Retry-After'))
+        logger.info(f'Spotify rate limit reached, pausing requests for {retry_after} seconds')
+        self.stats.record(throttled=1, retry_after_seconds=retry_after)
+        self.budget.pause(retry_after)
+        if attempt < self.max_retries:
+          attempt += 1
+          continue
+
+      if status in RETRY_STATUSES and idempotent and attempt < self.max_retries:
+        delay = backoff_delay(attempt, RETRY_BACKOFF_BASE, RETRY_BACKOFF_CAP)
+        logger.info(f'Retrying {method} {url} in {delay:.02f} seconds after status {status}')
+        self.stats.record(retries=1)
+        attempt += 1
+        await asyncio.sleep(delay)
+        continue
+
+      if status == 403:
+        raise spotify.Forbidden(response, data)
+      if status == 404:
+        raise spotify.NotFound(response, data)
+      raise spotify.HTTPException(response, data)
+
+
+def _retry_after(header: Optional[str]) -> float:
+  try:
+    return max(0.0, float(header))
+  except (TypeError, ValueError):
+    return DEFAULT_RETRY_AFTER
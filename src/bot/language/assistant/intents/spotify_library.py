@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import spotify
+
+from bot import DATA_DIR
+from bot.common.fuzzy import FuzzyIndex
+
+SPOTIFY_DATA_DIR = os.path.join(DATA_DIR, 'spotify')
+LIBRARY_INDEX_VERSION = 1
+
+PAGE_SIZE = 50
+# Seconds between incremental refreshes while the handler is running
+REFRESH_INTERVAL = 10 * 60
+# Seconds between full refreshes of saved tracks, which also pick up removed tracks
+FULL_REFRESH_INTERVAL = 24 * 60 * 60
+# Minimum FuzzyIndex score for a playlist name to match a query
+MIN_PLAYLIST_RELEVANCE = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(name: str) -> str:
+  """Lowercases a track/playlist/artist name and removes punctuation so that spoken names
+  match written ones (ex: "Don't Stop Me Now" and "dont stop me now")"""
+  return ' '.join(re.sub(r"[^\w\s]", '', name.lower()).split())
+
+
+class SpotifyLibraryIndex:
+  """Local index of the current user's playlists and saved tracks.
+
+  The index is persisted to `path` and refreshed from the Spotify API with `refresh`.
+  Playlists are always fully re-fetched since there are few of them. Saved tracks are
+  fetched newest first until an already indexed track is reached, with a full re-fetch
+  every FULL_REFRESH_INTERVAL to drop removed tracks.
+
+  Lookups are local and don't make any requests."""
+
+  def __init__(self, path: str):
+    self.path = path
+    self.playlists: list[dict] = []
+    self.tracks: list[dict] = []
+    self.refreshed_at = 0.0
+    self.full_refreshed_at = 0.0
+    self.__build_lookups()
+
+  @classmethod
+  def for_user(cls, user_id: str) -> 'SpotifyLibraryIndex':
+    """Loads the index for a user from SPOTIFY_DATA_DIR, or returns an empty index"""
+    index = cls(os.path.join(SPOTIFY_DATA_DIR, f'library-{user_id}.json'))
+    index.load()
+    return index
+
+  def load(self) -> bool:
+    """Loads the index from path. Returns False if it doesn't exist or can't be used."""
+    if not os.path.isfile(self.path):
+      return False
+    try:
+      with open(self.path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    except (OSError, ValueError):
+      logger.warning(f'Ignoring unreadable Spotify library index {self.path}', exc_info=True)
+      return False
+    if data.get('version') != LIBRARY_INDEX_VERSION:
+      return False
+
+    self.playlists = data['playlists']
+    self.tracks = data['tracks']
+    self.refreshed_at = data['refreshed_at']
+    self.full_refreshed_at = data['full_refreshed_at']
+    self.__build_lookups()
+    logger.debug(
+      f'Loaded Spotify library index with {len(self.playlists)} playlists and '
+      f'{len(self.tracks)} saved tracks')
+    return True
+
+  def save(self) -> None:
+    """Writes the index to path"""
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    tmp_path = f'{self.path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+      json.dump({
+        'version': LIBRARY_INDEX_VERSION,
+        'refreshed_at': self.refreshed_at,
+        'full_refreshed_at': self.full_refreshed_at,
+        'playlists': self.playlists,
+        'tracks': self.tracks,
+      }, f)
+    os.replace(tmp_path, self.path)
+
+  async def refresh(self, client: spotify.HTTPClient, full: bool = False) -> None:
+    """Fetches playlists and saved tracks that changed since the last refresh and saves
+    the index. All saved tracks are re-fetched if full or after FULL_REFRESH_INTERVAL."""
+    start = time.perf_counter()
+    now = time.time()
+    full = full or not self.tracks or now - self.full_refreshed_at >= FULL_REFRESH_INTERVAL
+
+    playlists = [
+      _playlist_entry(playlist) for playlist in await _fetch_all(client.current_playlists)]
+
+    known_track_ids = set() if full else {track['id'] for track in self.tracks}
+    new_tracks = []
+    try:
+      async for item in _iterate_pages(client.saved_tracks):
+        if item['track']['id'] in known_track_ids:
+          break
+        new_tracks.append(_track_entry(item))
+    except spotify.Forbidden:
+      logger.warning('Not allowed to read saved tracks, user-library-read may not be granted')
+
+    self.playlists = playlists
+    if full:
+      self.tracks = new_tracks
+      self.full_refreshed_at = now
+    else:
+      self.tracks = new_tracks + self.tracks
+    self.refreshed_at = now
+    self.__build_lookups()
+    await asyncio.to_thread(self.save)
+
+    logger.info(
+      f"{'Fully refreshed' if full else 'Refreshed'} Spotify library index in "
+      f'{time.perf_counter() - start:.04f} seconds: {len(self.playlists)} playlists, '
+      f'{len(self.tracks)} saved tracks ({len(new_tracks)} fetched)')
+
+  def __build_lookups(self) -> None:
+    self.playlists_by_name = {normalize_name(p['name']): p for p in reversed(self.playlists)}
+    self.playlist_names = FuzzyIndex([p['name'] for p in self.playlists])
+    self.tracks_by_name: dict[str, list[dict]] = {}
+    for track in self.tracks:
+      self.tracks_by_name.setdefault(normalize_name(track['name']), []).append(track)
+
+  def find_playlist(self, name: str) -> Optional[dict]:
+    """Returns the indexed playlist whose name best matches name, or None if no name is
+    similar enough"""
+    query = normalize_name(name)
+    playlist = self.playlists_by_name.get(query)
+    if playlist is not None:
+      return playlist
+
+    best = self.playlist_names.best(query)
+    if best is None or best[1] < MIN_PLAYLIST_RELEVANCE:
+      return None
+    playlist = self.playlists[best[0]]
+    logger.debug(f"Found indexed playlist '{playlist['name']}' with relevance {best[1]:.03f}")
+    return playlist
+
+  def find_track(self, name: str, artist_name: str = '') -> Optional[dict]:
+    """Returns the most recently saved track with the given name (and artist, if specified)"""
+    tracks = self.tracks_by_name.get(normalize_name(name), [])
+    if artist_name:
+      artist = normalize_name(artist_name)
+      tracks = [t for t in tracks if any(artist in normalize_name(a) for a in t['artists'])]
+    return tracks[0] if tracks else None
+
+
+def _playlist_entry(playlist: dict) -> dict:
+  return {
+    'id': playlist['id'],
+    'name': playlist['name'],
+    'uri': playlist['uri'],
+    'owner_id': playlist['owner']['id'],
+  }
+
+
+def _track_entry(item: dict) -> dict:
+  track = item['track']
+  return {
+    'id': track['id'],
+    'name': track['name'],
+    'uri': track['uri'],
+    'artists': [artist['name'] for artist in track['artists']],
+    'added_at': item['added_at'],
+  }
+
+
+async def _iterate_pages(fetch_page: Callable[..., Awaitable[dict]]):
+  """Yields every item of a paginated endpoint such as HTTPClient.current_playlists"""
+  offset = 0
+  while True:
+    page = await fetch_page(limit=PAGE_SIZE, offset=offset)
+    for item in page['items']:
+      yield item
+    if not page.get('next') or not page['items']:
+      return
+    offset += len(page['items'])
+
+
+async def _fetch_all(fetch_page: Callable[..., Awaitable[dict]]) -> list[Any]:
+  return [item async for item in _iterate_pages(fetch_page)]
@@ -0,0 +1,113 @@
+import copy
+import logging
+import time
+from typing import Any, Callable, Optional
+
+# Seconds between background polls of the player state while the handler is running
+PLAYER_POLL_INTERVAL = 20.0
+# Seconds that a mirrored player state can be used for before it must be fetched again. Longer
+# than PLAYER_POLL_INTERVAL so that a slow or failed poll doesn't force commands to fetch it.
+PLAYER_STATE_MAX_AGE = 60.0
+# Seconds that Spotify may take to reflect a change we made. A fetched state that disagrees
+# with a change made longer ago than this means the player was changed elsewhere.
+PENDING_UPDATE_GRACE = 3.0
+
+logger = logging.getLogger(__name__)
+
+
+class PlayerStateMirror:
+  """Local copy of the Spotify player state (as returned by HTTPClient.current_player), so that
+  commands such as volume changes can be computed without fetching it first.
+
+  The mirror is replaced by states fetched from Spotify (ex: by a background poll) and updated
+  optimistically by commands as soon as they decide on a change. Optimistic updates stay
+  pending until a fetched state confirms them. If a state fetched after PENDING_UPDATE_GRACE
+  contradicts one, the player was changed elsewhere (or our request didn't take effect). That
+  is counted as a conflict, and the fetched value wins.
+
+  Fields are addressed by dotted paths into the player state, ex: 'device.volume_percent'."""
+
+  def __init__(
+      self,
+      max_age: float = PLAYER_STATE_MAX_AGE,
+      grace: float = PENDING_UPDATE_GRACE,
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    self.max_age = max_age
+    self.grace = grace
+    self.clock = clock
+    # {} when no device is active
+    self.state: dict = {}
+    # When state was last fetched, or None if it is unknown
+    self.fetched_at: Optional[float] = None
+    # States requested before this are outdated, see invalidate
+    self.invalidated_at = float('-inf')
+    # Optimistic updates not yet seen in a fetched state: path -> (value, time applied)
+    self.pending: dict[str, tuple[Any, float]] = {}
+    self.conflicts = 0
+
+  def is_fresh(self) -> bool:
+    """Returns whether state can be used instead of fetching the player state"""
+    return self.fetched_at is not None and self.clock() - self.fetched_at < self.max_age
+
+  def replace(self, state: Optional[dict], requested_at: float) -> None:
+    """Replaces the mirror with a state fetched from Spotify by a request sent at requested_at
+    (according to clock). Pending updates that the state doesn't reflect are re-applied if the
+    request may have been too early to see them."""
+    latest = self.invalidated_at if self.fetched_at is None else max(
+      self.fetched_at, self.invalidated_at)
+    if requested_at < latest:
+      # Older than the current state, ex: a poll that finished after a command's fetch
+      return
+
+    state = copy.deepcopy(state) if state else {}
+    for path, (value, applied_at) in list(self.pending.items()):
+      fetched_value = _get_path(state, path)
+      if fetched_value == value:
+        del self.pending[path]
+      elif requested_at < applied_at + self.grace:
+        # Too early to tell whether Spotify disagrees
+        if state:
+          _set_path(state, path, copy.deepcopy(value))
+      else:
+        self.conflicts += 1
+        del self.pending[path]
+        logger.info(
+          f'Spotify player {path} is {fetched_value!r} but was set to {value!r}, '
+          'it may have been changed elsewhere')
+
+    self.state = state
+    self.fetched_at = requested_at
+
+  def update(self, changes: dict[str, Any]) -> None:
+    """Optimistically applies changes (path -> value) made by a command. Does nothing if the
+    state is unknown, since the changed fields can't be placed in it."""
+    if self.fetched_at is None or not self.state:
+      return
+    now = self.clock()
+    for path, value in changes.items():
+      _set_path(self.state, path, copy.deepcopy(value))
+      self.pending[path] = (value, now)
+
+  def invalidate(self) -> None:
+    """Forgets the state, for changes that can't be applied optimistically"""
+    self.state = {}
+    self.fetched_at = None
+    self.invalidated_at = self.clock()
+    self.pending.clear()
+
+
+def _get_path(state: dict, path: str) -> Any:
+  value = state
+  for key in path.split('.'):
+    if not isinstance(value, dict):
+      return None
+    value = value.get(key)
+  return value
+
+
+def _set_path(state: dict, path: str, value: Any) -> None:
+  *parents, key = path.split('.')
+  for parent in parents:
+    state = state.setdefault(parent, {})
+  state[key] = value
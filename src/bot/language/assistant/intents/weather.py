@@ -1,18 +1,31 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import math
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
 from enum import StrEnum
-from typing import Optional
+from time import perf_counter
+from typing import Callable, Optional
 
+import numpy as np
 import requests
 
+from bot.common.cache import CacheStats
 from bot.common.logging import serialize_dict
+from bot.language.assistant.intents.forecast_cache import (ALMANAC_QUERY, ASTRO_QUERY,
+                                                           FORECAST_QUERY, HISTORICAL_QUERY,
+                                                           ForecastCache)
+from bot.language.assistant.intents.geocode_cache import GeocodeCache, Location
 from bot.language.assistant.intents.intent import IntentHandler
+from bot.language.assistant.intents.weather_series import DailySeries
 
 DEFAULT_LOCALE = 'en-US'
+# Longest range of dates after the first one that a question can summarize, ex: "next week"
+MAX_RANGE_DAYS = timedelta(days=14)
+# Queries that a date's weather is taken from, from least to most specific
+QUERY_PRIORITY = [ASTRO_QUERY, ALMANAC_QUERY, HISTORICAL_QUERY, FORECAST_QUERY]
 DEFAULT_HEADERS = {
   'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/109.0',
   'Accept': '*/*',
@@ -42,26 +55,102 @@ class WeatherHandler(IntentHandler):
   - What's the weather like today?
   - Will it be windy on Saturday?"""
 
-  def can_handle(self, intent: dict) -> bool:
-    return self._find_intent_name(intent) == 'query_weather'
+  supported_intents = frozenset({'query_weather'})
+  idempotent_intents = supported_intents
+
+  def __init__(
+      self,
+      loop: Optional[asyncio.AbstractEventLoop] = None,
+      geocode_cache: Optional[GeocodeCache] = None,
+  ):
+    super().__init__(loop)
+    # City name queries resolve to the same location every time, so they are only fetched once
+    self.geocode_cache = geocode_cache or GeocodeCache()
+    self.geocode_stats = CacheStats()
+    # Each forecast/almanac/astronomy response covers many dates, see ForecastCache
+    self.forecast_cache = ForecastCache()
 
   def handle(self, intent: dict) -> str:
-    city = self._find_named_slot_value(intent, 'city', 'San Francisco')
+    cities = self._find_city_slot_values(intent) or ['San Francisco']
     current_dt = datetime.utcnow()
     dt = datetime.fromisoformat(self._find_named_slot_value(intent, 'time', current_dt.isoformat()))
     current_dt = current_dt.replace(tzinfo=dt.tzinfo)
     attribute = self._find_named_slot_value(intent, 'attribute')
+    end_date = self._find_time_interval_end(intent, dt.date())
 
-    found_city, latitude, longitude = self.fetch_city_metadata(city)
-    weather = self.fetch_daily_weather(latitude, longitude, dt.date(), current_dt.date())
-    logger.debug(
-      f'Parsed weather forecast/data for {found_city} on {dt}:\n{serialize_dict(vars(weather))}')
-
-    return self.format_response(found_city, dt.date(), current_dt.date(), weather, attribute)
-
-  def fetch_city_metadata(self, city_name_query: str) -> tuple[str, float, float]:
+    results = self.fetch_weather_batch(
+      [WeatherQuery(city, dt.date(), end_date) for city in cities], current_dt.date())
+    responses = []
+    for found_city, weather in results:
+      logger.debug(
+        f'Parsed weather forecast/data for {found_city} from {dt} to {end_date}:\n'
+        f'{serialize_dict(vars(weather))}')
+      responses.append(self.format_response(
+        found_city, dt.date(), current_dt.date(), weather, attribute, end_date))
+    return ' '.join(responses)
+
+  def _find_city_slot_values(self, intent: dict) -> list[str]:
+    """Returns the value of each city slot, ex: "compare the weather in Denver and Boston",
+    without duplicates"""
+    cities = [slot['value']['value'] for slot in intent['slots'] if slot['slotName'] == 'city']
+    return list(dict.fromkeys(cities))
+
+  def _find_time_interval_end(self, intent: dict, start_date: date) -> date:
+    """Returns the last day of the time slot if it is an interval (ex: "next week"), up to
+    MAX_RANGE_DAYS after start_date, or start_date otherwise"""
+    for slot in intent['slots']:
+      if slot['slotName'] == 'time' and slot['value'].get('kind') == 'TimeInterval':
+        if not slot['value'].get('to'):
+          break
+        # The end of an interval is exclusive, ex: midnight after its last day
+        end_dt = datetime.fromisoformat(slot['value']['to']) - timedelta(microseconds=1)
+        return max(start_date, min(end_dt.date(), start_date + MAX_RANGE_DAYS))
+    return start_date
+
+  def fetch_weather_batch(
+      self, queries: list[WeatherQuery], current_dt: date) -> list[tuple[str, Weather]]:
+    """Returns the found city name and weather summary for each query, see fetch_weather_range.
+    Every city that isn't cached is looked up in a single request, then the weather data for
+    every location is fetched in a single request."""
+    locations = self.fetch_cities_metadata([query.city_name_query for query in queries])
+    series = self._request_daily_weather([
+      (f'{latitude},{longitude}', _date_range(query.start_date, query.end_date))
+      for query, (_, latitude, longitude) in zip(queries, locations)
+    ], current_dt)
+    return [(found_city, _summarize(s)) for (found_city, _, _), s in zip(locations, series)]
+
+  def fetch_city_metadata(self, city_name_query: str) -> Location:
     """Returns metadata for a city name that can be used to fetch weather data"""
+    return self.fetch_cities_metadata([city_name_query])[0]
+
+  def fetch_cities_metadata(self, city_name_queries: list[str]) -> list[Location]:
+    """Returns metadata for each city name, looking up the ones that aren't cached in a single
+    request"""
+    locations = {}
+    for city_name_query in city_name_queries:
+      start = perf_counter()
+      location = self.geocode_cache.get(city_name_query, DEFAULT_LOCALE)
+      if location is not None:
+        locations[city_name_query] = location
+        self.geocode_stats.record_hit(perf_counter() - start)
+
+    uncached = list(dict.fromkeys(
+      city_name_query for city_name_query in city_name_queries
+      if city_name_query not in locations))
+    if uncached:
+      start = perf_counter()
+      locations.update(self._request_cities_metadata(uncached))
+      elapsed = perf_counter() - start
+      for city_name_query in uncached:
+        self.geocode_cache.put(city_name_query, DEFAULT_LOCALE, locations[city_name_query])
+        self.geocode_stats.record_miss(elapsed)
+
+    logger.debug(
+      f'Geocode cache: {self.geocode_stats.hit_rate:.01%} hit rate, '
+      f'{self.geocode_stats.time_saved:.04f} seconds saved')
+    return [locations[city_name_query] for city_name_query in city_name_queries]
 
+  def _request_cities_metadata(self, city_name_queries: list[str]) -> dict[str, Location]:
     request_data = [
       {
         'name': 'getSunV3LocationSearchUrlConfig',
@@ -70,90 +159,103 @@ class WeatherHandler(IntentHandler):
           'language': DEFAULT_LOCALE,
           'locationType': 'locale',
         },
-      },
+      }
+      for city_name_query in city_name_queries
     ]
-
-    response = requests.post(
-      'https://weather.com/api/v1/p/redux-dal',
-      json = request_data,
-      headers = DEFAULT_HEADERS,
-      timeout = 5,
-    )
-    response.raise_for_status()
-    response_data = self._get_query_response(
-      response.json()['dal'], request_data, 'getSunV3LocationSearchUrlConfig')['location']
-
-    return response_data['city'][0], response_data['latitude'][0], response_data['longitude'][0]
+    response_data = self._post_queries(request_data)
+
+    locations = {}
+    for city_name_query, query in zip(city_name_queries, request_data):
+      data = self._get_query_response(response_data, query)
+      if data is None:
+        raise RuntimeError(f'Failed to find the location of {city_name_query}')
+      location = data['location']
+      locations[city_name_query] = (
+        location['city'][0], location['latitude'][0], location['longitude'][0])
+    return locations
 
   def fetch_daily_weather(
       self, latitude: float, longitude: float, dt: date, current_dt: date) -> Weather:
     """Combines forecasts and historical data to return weather information for a given date"""
+    return self.fetch_weather_range(latitude, longitude, dt, dt, current_dt)
 
-    response, request_data = self._request_daily_weather(latitude, longitude, dt, current_dt)
-    response_data = response.json()['dal']
-
-    weather = self._process_forecast_data(response_data, request_data, dt)
-    if weather is not None:
-      return weather
-    return self._process_non_forecast_data(response_data, request_data, dt)
-
-  def _request_daily_weather(
+  def fetch_weather_range(
       self,
       latitude: float,
       longitude: float,
-      dt: date,
+      start_date: date,
+      end_date: date,
       current_dt: date,
-  ) -> tuple[requests.Response, list[dict]]:
-    date_str = dt.strftime('%Y%m%d')
-    geocode = f'{latitude},{longitude}'
-    locale = 'en-US'
+  ) -> Weather:
+    """Summarizes the weather from start_date to end_date (inclusive): the highest high and
+    lowest low, the highest chance and total amount of precipitation, and the strongest wind.
+    Sunrise, sunset and moon phase are only included for a single date."""
+    dates = _date_range(start_date, end_date)
+    return _summarize(
+      self._request_daily_weather([(f'{latitude},{longitude}', dates)], current_dt)[0])
 
-    request_data = [
-      {
-        'name': 'getSunV2AstroUrlConfig',
-        'params': {
-          'date': date_str,
-          'days': '30',
-          'geocode': geocode,
-          'language': locale,
-        },
-      },
-      {
-        'name': 'getSunV3DailyAlmanacUrlConfig',
-        'params': {
-          'startMonth': dt.month,
-          'startDay': 1,
-          'days': '45', # Returns 401 if not set to 45
-          'geocode': geocode,
-          'language': locale,
-          'units': 'e',
-        },
-      },
+  def _request_daily_weather(
+      self,
+      locations: list[tuple[str, list[date]]],
+      current_dt: date,
+  ) -> list[DailySeries]:
+    """Returns the weather data for each (geocode, dates) location, taking each date's values
+    from the most specific query that has them: forecasts, then historical data, then almanac
+    and astronomy data. Data cached in forecast_cache is used instead of querying it again, and
+    the rest is queried for every location in a single request."""
+    start = perf_counter()
+    # Keyed by query name and params, since the same location can need queries with different
+    # params, ex: almanac data for two months
+    series_by_query = {}
+    queries_by_location = []
+    request_data = []
+    uncached_locations = set()
+    for geocode, dates in locations:
+      location_queries = []
+      for query_name, query_dates in _dates_by_query(dates, current_dt).items():
+        query = _daily_weather_query(query_name, geocode, query_dates[0])
+        key = (query_name, _query_key(query['params']))
+        location_queries.append(key)
+        series = self.forecast_cache.get(query_name, geocode, query_dates)
+        if series is not None:
+          series_by_query[key] = series
+          continue
+        uncached_locations.add(geocode)
+        # The same query can be needed for more than one location, ex: the same city twice
+        if query not in request_data:
+          request_data.append(query)
+      queries_by_location.append(location_queries)
+
+    if request_data:
+      response_data = self._post_queries(request_data)
+      for query in request_data:
+        data = self._get_query_response(response_data, query)
+        if data is not None:
+          series_by_query[(query['name'], _query_key(query['params']))] = self.forecast_cache.put(
+            query['name'], query['params']['geocode'], data)
+
+    elapsed = perf_counter() - start
+    for geocode, _ in locations:
+      if geocode in uncached_locations:
+        self.forecast_cache.stats.record_miss(elapsed)
+      else:
+        self.forecast_cache.stats.record_hit(elapsed)
+    stats = self.forecast_cache.stats
+    logger.debug(
+      f'Forecast cache: {stats.hit_rate:.01%} hit rate, {stats.time_saved:.04f} seconds saved')
+
+    return [
+      DailySeries.combine([
+        series_by_query[key]
+        for key in sorted(location_queries, key=lambda key: QUERY_PRIORITY.index(key[0]))
+        if key in series_by_query
+      ], dates)
+      for (_, dates), location_queries in zip(locations, queries_by_location)
     ]
 
-    if current_dt <= dt <= current_dt + timedelta(days=15):
-      request_data = [
-        {
-          'name': 'getSunV3DailyForecastWithHeadersUrlConfig',
-          'params': {
-            'duration': '15day',
-            'geocode': geocode,
-            'language': locale,
-            'units': 'e',
-          },
-        }
-      ]
-
-    elif current_dt - timedelta(days=30) <= dt < current_dt:
-      request_data.append({
-        'name': 'getSunV3HistoricalDailyConditions30DayUrlConfig',
-        'params': {
-          'geocode': geocode,
-          'language': locale,
-          'units': 'e',
-        },
-      })
-
+  def _post_queries(self, request_data: list[dict]) -> dict:
+    """Sends every query to the redux-dal endpoint at once and returns their responses, see
+    _get_query_response"""
     response = requests.post(
       'https://weather.com/api/v1/p/redux-dal',
       json = request_data,
@@ -161,142 +263,40 @@ class WeatherHandler(IntentHandler):
       timeout = 5,
     )
     response.raise_for_status()
-    return response, request_data
-
-  def _process_forecast_data(
-      self,
-      response_data: dict,
-      request_data: list[dict],
-      dt: date,
-  ) -> Optional[Weather]:
-    """Process data from forecasts"""
-
-    forecasts = self._get_query_response(
-      response_data, request_data, 'getSunV3DailyForecastWithHeadersUrlConfig')
-    if forecasts is None:
+    return response.json()['dal']
+
+  def _get_query_response(self, response_data: dict, query: dict) -> Optional[dict]:
+    """Returns the data that a query sent by _post_queries returned, or None if it failed.
+    Responses are grouped by query name, then keyed by the query's params (see _query_key), so
+    that several queries with the same name can be sent at once."""
+    query_name = query['name']
+    if query_name not in response_data:
+      logger.error((
+        f"weather.com Redux DAL malformed response:\n"
+        f"Query Name: {query_name}\n"
+        f"Response Keys: {', '.join(list(response_data.keys()))}"
+      ))
       return None
-
-    for i, datetime_str in enumerate(forecasts['validTimeLocal']):
-      if datetime.fromisoformat(datetime_str).date() == dt:
-        weather = Weather()
-
-        weather.high = forecasts['temperatureMax'][i] or forecasts['calendarDayTemperatureMax'][i]
-        weather.low = forecasts['temperatureMin'][i] or forecasts['calendarDayTemperatureMin'][i]
-
-        # TODO: Get weather conditions:
-        #   Day: forecasts['daypart'][0]['wxPhraseLong'][i] # may be None
-        #   Night: forecasts['daypart'][0]['wxPhraseLong'][i+1]
-
-        day_precip_chance = forecasts['daypart'][0]['precipChance'][2*i]
-        night_precip_chance = forecasts['daypart'][0]['precipChance'][2*i+1]
-        if day_precip_chance is None:
-          day_precip_chance = night_precip_chance
-        weather.precipitation_chance = math.floor((day_precip_chance + night_precip_chance) / 2)
-
-        if forecasts['qpf'][i] >= forecasts['qpfSnow'][i]:
-          weather.precipitation_amount = forecasts['qpf'][i]
-          weather.precipitation_type = PrecipitationType.RAIN
-        else:
-          weather.precipitation_amount = forecasts['qpfSnow'][i]
-          weather.precipitation_type = PrecipitationType.SNOW
-
-        day_wind_speed = forecasts['daypart'][0]['windSpeed'][2*i]
-        night_wind_speed = forecasts['daypart'][0]['windSpeed'][2*i+1]
-        weather.wind_speed = day_wind_speed or night_wind_speed
-        day_wind_direction = forecasts['daypart'][0]['windDirectionCardinal'][2*i]
-        night_wind_direction = forecasts['daypart'][0]['windDirectionCardinal'][2*i+1]
-        weather.wind_direction = Direction(day_wind_direction or night_wind_direction)
-
-        # TODO: Humidity
-        # TODO: Thunder
-
-        sunrise_dt = datetime.fromisoformat(forecasts['sunriseTimeLocal'][i])
-        weather.sunrise = sunrise_dt.replace(second=0, microsecond=0).time()
-        sunset_dt = datetime.fromisoformat(forecasts['sunsetTimeLocal'][i])
-        weather.sunset = sunset_dt.replace(second=0, microsecond=0).time()
-        weather.moon_phase = MoonPhase(forecasts['moonPhase'][i].lower())
-
-        return weather
-
-    return None
-
-  def _process_non_forecast_data(
-      self,
-      response_data: dict,
-      request_data: list[dict],
-      dt: date,
-  ) -> Optional[Weather]:
-    """When weather data does not fall within available forecast range,
-    fall back to historic / almanac / astronomical data"""
-
-    weather = Weather()
-
-    almanac = self._get_query_response(
-      response_data, request_data, 'getSunV3DailyAlmanacUrlConfig')
-    dt_almanac = dt.strftime('%m%d')
-    if almanac is not None:
-      for i, date_str in enumerate(almanac['almanacRecordDate']):
-        if date_str == dt_almanac:
-          weather.high = almanac['temperatureAverageMax'][i]
-          weather.low = almanac['temperatureAverageMin'][i]
-          break
-
-    historic = self._get_query_response(
-      response_data, request_data, 'getSunV3HistoricalDailyConditions30DayUrlConfig')
-    if historic is not None:
-      for i, datetime_str in enumerate(historic['validTimeLocal']):
-        if datetime.fromisoformat(datetime_str).date() == dt:
-          weather.high = historic['temperatureMax'][i]
-          weather.low = historic['temperatureMin'][i]
-
-          if historic['rain24Hour'][i] >= historic['snow24Hour'][i]:
-            weather.precipitation_amount = historic['rain24Hour'][i]
-            weather.precipitation_type = PrecipitationType.RAIN
-          else:
-            weather.precipitation_amount = historic['snow24Hour'][i]
-            weather.precipitation_type = PrecipitationType.SNOW
-          weather.precipitation_chance = 100 if weather.precipitation_amount > 0 else 0
-
-          break
-
-    astronomy = self._get_query_response(response_data, request_data, 'getSunV2AstroUrlConfig')
-    if astronomy is not None:
-      for day_data in astronomy['astroData']:
-        if datetime.fromisoformat(day_data['dateLocal']).date() == dt:
-          sunrise_dt = datetime.fromisoformat(day_data['sun']['riseSet']['riseLocal'])
-          weather.sunrise = sunrise_dt.replace(second=0, microsecond=0).time()
-          sunset_dt = datetime.fromisoformat(day_data['sun']['riseSet']['setLocal'])
-          weather.sunset = sunset_dt.replace(second=0, microsecond=0).time()
-          # TODO: Parse moon phase data
-          break
-
-    return weather
-
-  def _get_query_response(
-      self,
-      response_data: dict,
-      request_data: list[dict],
-      query_name: str,
-  ) -> Optional[dict]:
-    for query in request_data:
-      if query['name'] == query_name:
-        if query_name not in response_data:
-          logger.error((
-            f"weather.com Redux DAL malformed response:\n"
-            f"Query Name: {query_name}\n"
-            f"Response Keys: {', '.join(list(response_data.keys()))}"
-          ))
-          return None
-        query_response = response_data[query_name][list(response_data[query_name].keys())[0]]
-        if query_response['status'] // 100 != 2:
-          logger.error((
-            f"weather.com Redux DAL query {query_name} failed:\n"
-            f"Params:\n{serialize_dict(query['params'])}\n"
-            f"Response:\n{serialize_dict(query_response)}"
-          ))
-          return None
-        return query_response['data']
-    return None
+    query_responses = response_data[query_name]
+    query_response = query_responses.get(_query_key(query['params']))
+    if query_response is None and len(query_responses) == 1:
+      # Only one query with this name was sent
+      query_response = next(iter(query_responses.values()))
+    if query_response is None:
+      logger.error((
+        f"weather.com Redux DAL response is missing query {query_name}:\n"
+        f"Params:\n{serialize_dict(query['params'])}\n"
+        f"Response Keys: {', '.join(list(query_responses.keys()))}"
+      ))
+      return None
+    if query_response['status'] // 100 != 2:
+      logger.error((
+        f"weather.com Redux DAL query {query_name} failed:\n"
+        f"Params:\n{serialize_dict(query['params'])}\n"
+        f"Response:\n{serialize_dict(query_response)}"
+      ))
+      return None
+    return query_response['data']
 
   def format_response(
       self,
@@ -305,11 +305,18 @@ class WeatherHandler(IntentHandler):
       current_dt: date,
       weather: Weather,
       attribute: str,
+      end_dt: Optional[date] = None,
   ) -> str:
-    """Build a text response for the fetched weather data and the requested attribute"""
+    """Build a text response for the fetched weather data and the requested attribute.
+    If end_dt is after dt, weather summarizes the days from dt to end_dt."""
 
-    base_response = f'{self._format_response_datetime(dt, current_dt)} in {found_city}'
-    verb = self._format_response_verb(dt, current_dt)
+    is_range = end_dt is not None and end_dt > dt
+    if is_range:
+      base_response = f'{self._format_response_date_range(dt, end_dt)} in {found_city}'
+      verb = self._format_response_verb(end_dt, current_dt)
+    else:
+      base_response = f'{self._format_response_datetime(dt, current_dt)} in {found_city}'
+      verb = self._format_response_verb(dt, current_dt)
     responses = []
 
     attributes = {attribute}
@@ -329,6 +336,15 @@ class WeatherHandler(IntentHandler):
     ):
       if weather.precipitation_chance == 0:
         responses.append(f'there {verb} no rain')
+      elif is_range and end_dt >= current_dt:
+        responses.append((
+          f'there {verb} up to a {weather.precipitation_chance} percent chance of '
+          f'{weather.precipitation_type} ({weather.precipitation_amount} inches in total)'
+        ))
+      elif is_range:
+        responses.append(
+          f'there were {weather.precipitation_amount} inches of {weather.precipitation_type} '
+          'in total')
       elif dt >= current_dt:
         responses.append((
           f'there {verb} a {weather.precipitation_chance} percent chance of '
@@ -378,6 +394,10 @@ class WeatherHandler(IntentHandler):
     else:
       return f"On {dt.strftime('%B')} {dt.day}, {dt.year}"
 
+  def _format_response_date_range(self, dt: date, end_dt: date) -> str:
+    return (
+      f"From {dt.strftime('%A, %B')} {dt.day} to {end_dt.strftime('%A, %B')} {end_dt.day}")
+
   def _format_response_verb(self, dt: date, current_dt: date) -> str:
     if dt == current_dt:
       return 'is'
@@ -386,6 +406,97 @@ class WeatherHandler(IntentHandler):
     else:
       return 'was'
 
+
+def _date_range(start_date: date, end_date: date) -> list[date]:
+  return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def _dates_by_query(dates: list[date], current_dt: date) -> dict[str, list[date]]:
+  """Returns the dates that each query is needed for"""
+  dates_by_query = defaultdict(list)
+  for dt in dates:
+    if current_dt <= dt <= current_dt + timedelta(days=15):
+      dates_by_query[FORECAST_QUERY].append(dt)
+      continue
+    dates_by_query[ASTRO_QUERY].append(dt)
+    dates_by_query[ALMANAC_QUERY].append(dt)
+    if current_dt - timedelta(days=30) <= dt < current_dt:
+      dates_by_query[HISTORICAL_QUERY].append(dt)
+  return dates_by_query
+
+
+def _daily_weather_query(query_name: str, geocode: str, first_date: date) -> dict:
+  """Returns a redux-dal query for daily weather data starting at first_date"""
+  params = {'geocode': geocode, 'language': DEFAULT_LOCALE}
+  if query_name == FORECAST_QUERY:
+    params.update({'duration': '15day', 'units': 'e'})
+  elif query_name == HISTORICAL_QUERY:
+    params.update({'units': 'e'})
+  elif query_name == ALMANAC_QUERY:
+    params.update({
+      'startMonth': first_date.month,
+      'startDay': 1,
+      'days': '45', # Returns 401 if not set to 45
+      'units': 'e',
+    })
+  elif query_name == ASTRO_QUERY:
+    params.update({'date': first_date.strftime('%Y%m%d'), 'days': '30'})
+  return {'name': query_name, 'params': params}
+
+
+def _query_key(params: dict) -> str:
+  """Returns the key that redux-dal responds to a query with, ex: 'geocode:37.779,-122.42;...'"""
+  return ';'.join(f'{name}:{value}' for name, value in sorted(params.items()))
+
+
+def _summarize(series: DailySeries) -> Weather:
+  columns = series.columns
+  weather = Weather(
+    high = _aggregate(np.nanmax, columns['high']),
+    low = _aggregate(np.nanmin, columns['low']),
+    precipitation_chance = _aggregate(np.nanmax, columns['precipitation_chance']),
+    wind_speed = _aggregate(np.nanmax, columns['wind_speed']),
+  )
+
+  rain = _aggregate(np.nansum, columns['rain'])
+  snow = _aggregate(np.nansum, columns['snow'])
+  if rain is not None and (snow is None or rain >= snow):
+    weather.precipitation_amount = rain
+    weather.precipitation_type = PrecipitationType.RAIN
+  elif snow is not None:
+    weather.precipitation_amount = snow
+    weather.precipitation_type = PrecipitationType.SNOW
+
+  if weather.wind_speed is not None:
+    # Direction of the strongest wind
+    wind_direction = columns['wind_direction'][np.nanargmax(columns['wind_speed'])]
+    weather.wind_direction = Direction(wind_direction) if wind_direction else None
+
+  if len(series) == 1:
+    weather.sunrise = columns['sunrise'][0]
+    weather.sunset = columns['sunset'][0]
+    moon_phase = columns['moon_phase'][0]
+    weather.moon_phase = MoonPhase(moon_phase.lower()) if moon_phase else None
+
+  return weather
+
+
+def _aggregate(fn: Callable[[np.ndarray], float], values: np.ndarray) -> Optional[int | float]:
+  """Aggregates the values that aren't missing, as an int if the result is whole"""
+  if np.isnan(values).all():
+    return None
+  value = float(fn(values))
+  return int(value) if value.is_integer() else value
+
+
+@dataclass(frozen=True)
+class WeatherQuery:
+  """A city to summarize the weather in from start_date to end_date (inclusive)"""
+  city_name_query: str
+  start_date: date
+  end_date: date
+
+
 @dataclass
 class Weather:
   """A collection of weather forecast/historic/almanac data for a given day"""
@@ -419,7 +530,7 @@ class Direction(StrEnum):
   EAST = 'E'
   EAST_SOUTHEAST = 'ESE'
   SOUTHEAST = 'SE'
-  SOUTH_SOUTHEAST = 'ESE'
+  SOUTH_SOUTHEAST = 'SSE'
   SOUTH = 'S'
   SOUTH_SOUTHWEST = 'SSW'
   SOUTHWEST = 'SW'
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Optional
+
+import numpy as np
+
+# Daily values that are numbers, stored as float arrays with NaN for missing values
+NUMERIC_COLUMNS = ('high', 'low', 'precipitation_chance', 'rain', 'snow', 'wind_speed')
+# Other daily values, stored as object arrays with None for missing values
+OBJECT_COLUMNS = ('wind_direction', 'sunrise', 'sunset', 'moon_phase')
+# Year that annual series (ex: almanac averages) are indexed under. A leap year so that
+# February 29th has a date.
+ANNUAL_YEAR = 2000
+
+
+class DailySeries:
+  """Daily weather values parsed from a weather.com redux-dal payload, stored as one array per
+  field (see NUMERIC_COLUMNS and OBJECT_COLUMNS) along with a date -> row index. Payloads are
+  parsed once, so looking up any of their dates doesn't scan or parse them again.
+
+  Annual series hold values that are the same every year, so they are looked up by month and
+  day only."""
+
+  def __init__(self, dates: list[date], columns: dict[str, np.ndarray], annual: bool = False):
+    self.dates = dates
+    self.annual = annual
+    self.index = {dt: i for i, dt in enumerate(dates)}
+    self.columns = {
+      name: columns.get(name, np.full(len(dates), np.nan)) for name in NUMERIC_COLUMNS
+    }
+    self.columns.update({
+      name: columns.get(name, np.full(len(dates), None, dtype=object)) for name in OBJECT_COLUMNS
+    })
+
+  def __len__(self) -> int:
+    return len(self.dates)
+
+  def rows(self, dates: list[date]) -> np.ndarray:
+    """Returns the row of each date, or -1 for dates that the series doesn't have"""
+    if self.annual:
+      dates = [_annual_date(dt) for dt in dates]
+    return np.array([self.index.get(dt, -1) for dt in dates], dtype=np.intp)
+
+  def covers(self, dates: list[date]) -> bool:
+    """Returns whether the series has every date"""
+    return bool((self.rows(dates) >= 0).all())
+
+  @classmethod
+  def combine(cls, layers: list[DailySeries], dates: list[date]) -> DailySeries:
+    """Returns a series for dates that takes each value from the last layer that has it"""
+    combined = cls(dates, {})
+    for layer in layers:
+      rows = layer.rows(dates)
+      has_row = rows >= 0
+      for name, column in combined.columns.items():
+        values = layer.columns[name][rows[has_row]]
+        present = _present(values)
+        column[np.flatnonzero(has_row)[present]] = values[present]
+    return combined
+
+  @classmethod
+  def from_forecast(cls, data: dict) -> DailySeries:
+    """Parses getSunV3DailyForecastWithHeadersUrlConfig data. Day and night values are
+    interleaved in its daypart arrays, and night values are used when day values are missing
+    (ex: later in the day)."""
+    daypart = data['daypart'][0]
+    day_chance, night_chance = _day_and_night(_floats(daypart['precipChance']))
+    day_wind_speed, night_wind_speed = _day_and_night(_floats(daypart['windSpeed']))
+    day_wind_direction, night_wind_direction = _day_and_night(
+      _objects(daypart['windDirectionCardinal']))
+    day_chance = _fallback(day_chance, night_chance)
+
+    high = _fallback(_floats(data['temperatureMax']), _floats(data['calendarDayTemperatureMax']))
+    low = _fallback(_floats(data['temperatureMin']), _floats(data['calendarDayTemperatureMin']))
+    return cls(_dates(data['validTimeLocal']), {
+      'high': high,
+      'low': low,
+      'precipitation_chance': np.floor((day_chance + night_chance) / 2),
+      'rain': _floats(data['qpf']),
+      'snow': _floats(data['qpfSnow']),
+      'wind_speed': _fallback(day_wind_speed, night_wind_speed),
+      'wind_direction': np.where(
+        _present(day_wind_direction), day_wind_direction, night_wind_direction),
+      'sunrise': _times(data['sunriseTimeLocal']),
+      'sunset': _times(data['sunsetTimeLocal']),
+      'moon_phase': _objects(data['moonPhase']),
+    })
+
+  @classmethod
+  def from_historical(cls, data: dict) -> DailySeries:
+    """Parses getSunV3HistoricalDailyConditions30DayUrlConfig data"""
+    rain = _floats(data['rain24Hour'])
+    snow = _floats(data['snow24Hour'])
+    amount = np.fmax(rain, snow)
+    return cls(_dates(data['validTimeLocal']), {
+      'high': _floats(data['temperatureMax']),
+      'low': _floats(data['temperatureMin']),
+      # Observed, so it either rained/snowed or it didn't
+      'precipitation_chance': np.where(np.isnan(amount), np.nan, (amount > 0) * 100.0),
+      'rain': rain,
+      'snow': snow,
+    })
+
+  @classmethod
+  def from_almanac(cls, data: dict) -> DailySeries:
+    """Parses getSunV3DailyAlmanacUrlConfig data, whose averages are the same every year"""
+    dates = [
+      date(ANNUAL_YEAR, int(mmdd[:2]), int(mmdd[2:])) for mmdd in data['almanacRecordDate']
+    ]
+    return cls(dates, {
+      'high': _floats(data['temperatureAverageMax']),
+      'low': _floats(data['temperatureAverageMin']),
+    }, annual=True)
+
+  @classmethod
+  def from_astro(cls, data: dict) -> DailySeries:
+    """Parses getSunV2AstroUrlConfig data"""
+    days = data['astroData']
+    return cls(_dates([day['dateLocal'] for day in days]), {
+      'sunrise': _times([day['sun']['riseSet']['riseLocal'] for day in days]),
+      'sunset': _times([day['sun']['riseSet']['setLocal'] for day in days]),
+    })
+
+
+def _annual_date(dt: date) -> date:
+  return dt.replace(year=ANNUAL_YEAR)
+
+
+def _dates(datetime_strs: list[str]) -> list[date]:
+  # The local date is the first 10 characters of weather.com's ISO 8601 timestamps
+  return [date.fromisoformat(s[:10]) for s in datetime_strs]
+
+
+def _times(datetime_strs: list[Optional[str]]) -> np.ndarray:
+  """Parses local times to the minute"""
+  return _objects([
+    datetime.fromisoformat(s).replace(second=0, microsecond=0).time() if s else None
+    for s in datetime_strs
+  ])
+
+
+def _floats(values: list[Optional[float]]) -> np.ndarray:
+  # None becomes NaN
+  return np.array(values, dtype=float)
+
+
+def _objects(values: list) -> np.ndarray:
+  array = np.empty(len(values), dtype=object)
+  array[:] = values
+  return array
+
+
+def _present(values: np.ndarray) -> np.ndarray:
+  if values.dtype == object:
+    return np.array([value is not None for value in values], dtype=bool)
+  return ~np.isnan(values)
+
+
+def _fallback(values: np.ndarray, fallback_values: np.ndarray) -> np.ndarray:
+  return np.where(np.isnan(values), fallback_values, values)
+
+
+def _day_and_night(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  return values[0::2], values[1::2]
@@ -0,0 +1,690 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import cycle
+from typing import Optional
+
+import numpy as np
+import yaml
+
+LINEAR_ENGINE_FILENAME = 'linear_engine.json'
+LINEAR_WEIGHTS_FILENAME = 'linear_engine.npz'
+
+DEFAULT_FEATURE_BITS = 14
+DEFAULT_AUGMENTATION = 20
+DEFAULT_NOISE_FACTOR = 2
+DEFAULT_EPOCHS = 200
+DEFAULT_LEARNING_RATE = 2.0
+DEFAULT_L2 = 1e-4
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+# Examples used to augment training utterances with builtin entity slots
+BUILTIN_ENTITY_EXAMPLES = {
+  'snips/city': [
+    'San Francisco', 'New York', 'London', 'Paris', 'Tokyo', 'Chicago', 'Seattle', 'Berlin',
+    'Los Angeles', 'Mexico City',
+  ],
+  'snips/datetime': [
+    'today', 'tonight', 'tomorrow', 'right now', 'on Friday', 'next Tuesday', 'this weekend',
+    'this week', 'next week', 'in three days', 'on March 3',
+  ],
+}
+
+# Out-of-domain utterances that the None intent is trained on, along with random sequences of
+# their words. Like the noise of snips' intent classifier, they keep chit-chat from being
+# classified as the closest intent.
+NOISE_UTTERANCES = [
+  'hello', 'hi there', 'hey', 'good morning', 'good night', 'goodbye', 'see you later',
+  'thank you', 'thanks a lot', 'you are welcome', 'how are you', "how's it going",
+  'how have you been', 'what are you doing', 'what is your name', 'who are you',
+  'who made you', 'how old are you', 'where do you live', 'are you a robot', 'do you like me',
+  'I love you', 'I am bored', 'I am tired', "I'm feeling sad today", 'that is funny',
+  'tell me a joke', 'tell me a story', 'tell me about yourself', "what's up",
+  'nice to meet you', 'what do you think about that', 'can you help me', 'never mind',
+  'what is the meaning of life', 'what is the best movie ever', "what's the point",
+  'what is the answer to my question', 'why is the sky blue', 'who is the president',
+  'how tall is the eiffel tower', 'what is two plus two', 'how do I cook rice',
+  'what is the capital of France', 'how many days are in a year', 'who wrote hamlet',
+  'what time is it', "what's the date", 'set an alarm for seven', 'set a timer for ten minutes',
+  'remind me to call mom', 'send a message to my friend', 'read my email',
+  'what is the news', 'turn on the lights', 'turn off the lights', 'lock the front door',
+  'order a pizza', 'call a taxi', 'add milk to my shopping list', "let's play a game",
+  'play some tennis with me', 'do you want to play chess', 'the kids played outside all day',
+  'my friend is coming over', 'I had a great day', 'the dog ate my homework',
+  'do you have any hobbies', 'what is your favorite color', 'what should I eat for dinner',
+  'how was your day', 'I need some advice', 'that makes sense', 'yes', 'no', 'maybe',
+  'okay', 'sure', "I don't know", 'what do you mean', 'can you repeat that', 'be quiet',
+]
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+MONTHS = [
+  'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september',
+  'october', 'november', 'december',
+]
+NUMBER_WORDS = {
+  'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+  'nine': 9, 'ten': 10,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def load_dataset_files(dataset_paths: list[str], language: str = 'en') -> dict:
+  """Loads snips-nlu YAML dataset files into the same JSON format as snips' Dataset.json,
+  without depending on snips-nlu. Slots without example values are filled with values
+  from their entity."""
+  intents = {}
+  entities = {}
+  for path in dataset_paths:
+    with open(path, 'r', encoding='utf-8') as f:
+      docs = list(yaml.safe_load_all(f))
+    for doc in docs:
+      if doc.get('type') == 'intent':
+        intents[doc['name']] = doc
+      elif doc.get('type') == 'entity':
+        entities[doc['name']] = {
+          'data': [_entity_value(value) for value in doc.get('values', [])],
+          'automatically_extensible': doc.get('automatically_extensible', True),
+          'use_synonyms': doc.get('use_synonyms', True),
+          'matching_strictness': doc.get('matching_strictness', 1.0),
+        }
+      else:
+        raise ValueError(f"Invalid 'type' value in YAML file '{path}': '{doc.get('type')}'")
+
+  dataset = {'language': language, 'intents': {}, 'entities': entities}
+  for intent_name, doc in intents.items():
+    slot_entities = {slot['name']: slot['entity'] for slot in doc.get('slots', [])}
+    dataset['intents'][intent_name] = {
+      'utterances': [
+        {'data': _parse_utterance(utterance, slot_entities)}
+        for utterance in doc.get('utterances', [])
+      ],
+    }
+    for entity_name in slot_entities.values():
+      entities.setdefault(entity_name, {})
+
+  _fill_missing_slot_values(dataset)
+  return dataset
+
+
+def _entity_value(value) -> dict:
+  if isinstance(value, list):
+    return {'value': value[0], 'synonyms': value[1:]}
+  return {'value': value, 'synonyms': []}
+
+
+def _parse_utterance(utterance: str, slot_entities: dict[str, str]) -> list[dict]:
+  """Splits an utterance such as "play [track](Forget Me Nots) on [device]" into chunks"""
+  chunks = []
+  position = 0
+  for match in re.finditer(r'\[(\w+)(?::(\w+))?\](?:\(([^)]*)\))?', utterance):
+    if match.start() > position:
+      chunks.append({'text': utterance[position:match.start()]})
+    slot_name = match.group(1)
+    chunks.append({
+      'text': match.group(3),
+      'entity': match.group(2) or slot_entities[slot_name],
+      'slot_name': slot_name,
+    })
+    position = match.end()
+  if position < len(utterance):
+    chunks.append({'text': utterance[position:]})
+  return chunks
+
+
+def _fill_missing_slot_values(dataset: dict) -> None:
+  values = {name: cycle(_entity_examples(dataset, name)) for name in dataset['entities']}
+  for intent in dataset['intents'].values():
+    for utterance in intent['utterances']:
+      for chunk in utterance['data']:
+        if 'slot_name' in chunk and chunk['text'] is None:
+          chunk['text'] = next(values[chunk['entity']])
+
+
+def _entity_examples(dataset: dict, entity_name: str) -> list[str]:
+  """Returns every known value of an entity, including synonyms and values used in utterances"""
+  examples = []
+  for value in dataset['entities'].get(entity_name, {}).get('data', []):
+    examples.append(value['value'])
+    examples += value['synonyms']
+  for intent in dataset['intents'].values():
+    for utterance in intent['utterances']:
+      for chunk in utterance['data']:
+        if chunk.get('entity') == entity_name and chunk['text'] and chunk['text'] not in examples:
+          examples.append(chunk['text'])
+  examples += BUILTIN_ENTITY_EXAMPLES.get(entity_name, [])
+  return examples
+
+
+def _normalize_tokens(text: str) -> list[str]:
+  return [token.lower() for token in TOKEN_PATTERN.findall(text)]
+
+
+def _hash_features(text: str, feature_bits: int) -> tuple[np.ndarray, np.ndarray]:
+  """Returns the indices and L2-normalized values of hashed word unigram and bigram features"""
+  tokens = ['<s>'] + _normalize_tokens(text) + ['</s>']
+  ngrams = tokens[1:-1] + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+  mask = (1 << feature_bits) - 1
+  indices, counts = np.unique(
+    np.array([zlib.crc32(ngram.encode('utf-8')) & mask for ngram in ngrams], dtype=np.int64),
+    return_counts=True)
+  values = counts.astype(np.float32)
+  return indices, values / np.linalg.norm(values)
+
+
+class Gazetteer:
+  """Token-level trie of entity values used to find entity mentions in text"""
+
+  def __init__(self):
+    self.root: dict = {}
+
+  def add(self, value: str, resolved_value: str) -> None:
+    """Adds a value, which resolves to resolved_value when matched"""
+    node = self.root
+    for token in _normalize_tokens(value):
+      node = node.setdefault(token, {})
+    if node is not self.root:
+      node.setdefault(None, resolved_value)
+
+  def resolve(self, text: str) -> Optional[str]:
+    """Returns the resolved value if all of text is a known value"""
+    node = self.root
+    for token in _normalize_tokens(text):
+      node = node.get(token)
+      if node is None:
+        return None
+    return node.get(None)
+
+  def find(self, text: str) -> list[tuple[int, int, str]]:
+    """Returns the (start, end, resolved value) of the longest non-overlapping matches in text"""
+    tokens = list(TOKEN_PATTERN.finditer(text))
+    matches = []
+    i = 0
+    while i < len(tokens):
+      node = self.root
+      longest = None
+      for j in range(i, len(tokens)):
+        node = node.get(tokens[j].group().lower())
+        if node is None:
+          break
+        if None in node:
+          longest = (j, node[None])
+      if longest is None:
+        i += 1
+        continue
+      j, resolved_value = longest
+      matches.append((tokens[i].start(), tokens[j].end(), resolved_value))
+      i = j + 1
+    return matches
+
+
+@dataclass
+class _Template:
+  """A regex built from a training utterance that captures its slots"""
+  intent_name: str
+  pattern: re.Pattern
+  slots: list[tuple[str, str]]  # (slot name, entity) for each capture group
+  literal_words: int
+  # Indices of slots that are directly followed by another slot, as in "[city] [time]"
+  adjacent_slots: frozenset[int]
+
+  @classmethod
+  def from_chunks(cls, intent_name: str, chunks: list[dict]) -> _Template:
+    """Builds a template from the chunks of an utterance in the dataset"""
+    regex = ''
+    slots = []
+    literal_words = 0
+    adjacent_slots = set()
+    follows_slot = False
+    for chunk in chunks:
+      if 'slot_name' in chunk:
+        if follows_slot:
+          adjacent_slots.add(len(slots) - 1)
+        regex += f'(?P<s{len(slots)}>.+?)'
+        slots.append((chunk['slot_name'], chunk['entity']))
+        follows_slot = True
+      else:
+        words = _normalize_tokens(chunk['text'])
+        literal_words += len(words)
+        literal = r'\W+'.join(re.escape(word) for word in words)
+        regex += rf'\W*\b{literal}\b\W*' if words else r'\W*'
+        follows_slot = follows_slot and not words
+    return cls(
+      intent_name, re.compile(rf'^\W*{regex}\W*$', re.IGNORECASE), slots, literal_words,
+      frozenset(adjacent_slots))
+
+
+class LinearNLUEngine:
+  """Lightweight alternative to SnipsNLUEngine.
+
+  Intents are classified by a multinomial logistic regression over hashed word unigrams and
+  bigrams. Slots are extracted by matching the input against the training utterances of the
+  predicted intent, falling back to gazetteers of the intent's entity values. Only a few
+  builtin entities are supported: snips/city values are kept as is, and snips/datetime values
+  are resolved for common relative dates ("tomorrow", "on Friday") and weeks ("next week").
+  Inputs classified as out-of-domain noise are parsed with a None intent, like snips."""
+
+  def __init__(
+      self,
+      random_seed: int = 0,
+      feature_bits: int = DEFAULT_FEATURE_BITS,
+      augmentation: int = DEFAULT_AUGMENTATION,
+      noise_factor: float = DEFAULT_NOISE_FACTOR,
+  ):
+    self.random_seed = random_seed
+    self.feature_bits = feature_bits
+    self.augmentation = augmentation
+    self.noise_factor = noise_factor
+    self.intent_names: list[str] = []
+    self.weights: Optional[np.ndarray] = None
+    self.bias: Optional[np.ndarray] = None
+    self.dataset: Optional[dict] = None
+    self.templates: list[_Template] = []
+    self.slot_intents: set[str] = set()
+    self.gazetteers: dict[str, Gazetteer] = {}
+
+  def fit(
+      self,
+      dataset: dict,
+      epochs: int = DEFAULT_EPOCHS,
+      learning_rate: float = DEFAULT_LEARNING_RATE,
+      l2: float = DEFAULT_L2,
+  ) -> LinearNLUEngine:
+    """Trains the engine on a dataset in the format of snips' Dataset.json"""
+    self.dataset = dataset
+    self.intent_names = sorted(dataset['intents'])
+    self.__build_matchers()
+
+    texts, labels = self.__augment(dataset)
+    rows = [_hash_features(text, self.feature_bits) for text in texts]
+    row_ids = np.concatenate([np.full(len(indices), i) for i, (indices, _) in enumerate(rows)])
+    indices = np.concatenate([indices for indices, _ in rows])
+    values = np.concatenate([values for _, values in rows])
+    # The last class is the None intent
+    n_classes = len(self.intent_names) + 1
+    targets = np.eye(n_classes, dtype=np.float32)[labels]
+
+    # Full-batch gradient descent on the softmax cross-entropy loss. Features are sparse,
+    # so products with the design matrix are computed from (row, index, value) triples.
+    n_features = 1 << self.feature_bits
+    self.weights = np.zeros((n_features, n_classes), dtype=np.float32)
+    self.bias = np.zeros(n_classes, dtype=np.float32)
+    for _ in range(epochs):
+      logits = np.zeros((len(texts), n_classes), dtype=np.float32)
+      np.add.at(logits, row_ids, values[:, None] * self.weights[indices])
+      errors = (_softmax(logits + self.bias) - targets) / len(texts)
+
+      weights_gradient = l2 * self.weights
+      np.add.at(weights_gradient, indices, values[:, None] * errors[row_ids])
+      self.weights -= learning_rate * weights_gradient
+      self.bias -= learning_rate * errors.sum(axis=0)
+
+    logger.info(
+      f'Trained linear intent classifier on {len(texts)} utterances '
+      f'({len(dataset["intents"])} intents, {n_features} features)')
+    return self
+
+  def __augment(self, dataset: dict) -> tuple[list[str], np.ndarray]:
+    """Generates training texts by filling each utterance's slots with random entity values.
+    Slot-free utterances are repeated instead so that every utterance has the same weight.
+    Noise for the None intent is added in proportion to the average number of texts per
+    intent."""
+    rng = np.random.default_rng(self.random_seed)
+    examples = {name: _entity_examples(dataset, name) for name in dataset['entities']}
+    texts = []
+    labels = []
+    for label, intent_name in enumerate(self.intent_names):
+      for utterance in dataset['intents'][intent_name]['utterances']:
+        for i in range(self.augmentation):
+          text = ''
+          for chunk in utterance['data']:
+            entity_examples = examples.get(chunk.get('entity'))
+            if i > 0 and entity_examples:
+              text += entity_examples[rng.integers(len(entity_examples))]
+            else:
+              text += chunk['text']
+          texts.append(text)
+          labels.append(label)
+
+    # Random sequences leave out the words of the utterances so that they stay out-of-domain
+    dataset_words = {
+      word
+      for intent in dataset['intents'].values()
+      for utterance in intent['utterances']
+      for chunk in utterance['data'] if 'slot_name' not in chunk
+      for word in _normalize_tokens(chunk['text'])
+    }
+    noise_words = sorted({
+      word for text in NOISE_UTTERANCES for word in _normalize_tokens(text)
+      if word not in dataset_words
+    })
+    for i in range(int(self.noise_factor * len(texts) / len(self.intent_names))):
+      if i % 2 == 0:
+        texts.append(NOISE_UTTERANCES[i // 2 % len(NOISE_UTTERANCES)])
+      else:
+        texts.append(' '.join(rng.choice(noise_words, rng.integers(1, 8))))
+      labels.append(len(self.intent_names))
+    return texts, np.array(labels)
+
+  def __build_matchers(self) -> None:
+    templates = [
+      _Template.from_chunks(intent_name, utterance['data'])
+      for intent_name, intent in self.dataset['intents'].items()
+      for utterance in intent['utterances']
+    ]
+    # Prefer templates with more literal words, then more slots, so that "play music by
+    # [artist]" is tried before "play [track] by [artist]"
+    templates.sort(key=lambda t: (-t.literal_words, -len(t.slots)))
+    self.templates = templates
+    # Intents whose every utterance has a slot, e.g. play_artist_radio
+    self.slot_intents = {
+      intent_name for intent_name, intent in self.dataset['intents'].items()
+      if all(template.slots for template in templates if template.intent_name == intent_name)
+    }
+
+    self.gazetteers = {}
+    for entity_name, entity in self.dataset['entities'].items():
+      gazetteer = Gazetteer()
+      for value in entity.get('data', []):
+        gazetteer.add(value['value'], value['value'])
+        for synonym in value['synonyms']:
+          gazetteer.add(synonym, value['value'])
+      self.gazetteers[entity_name] = gazetteer
+
+  def parse(self, text: str) -> dict:
+    """Parses text into a result in the same format as SnipsNLUEngine.parse.
+
+    Like SnipsNLUEngine's lookup parser, inputs that match a training utterance with known
+    entity values in every slot are parsed exactly. Other inputs are classified first and
+    then matched against the utterances of the predicted intent."""
+    for template in self.templates:
+      slots = self.__match_template(template, text, strict=True)
+      if slots is not None:
+        return _parse_result(text, template.intent_name, 1.0, slots)
+
+    indices, values = _hash_features(text, self.feature_bits)
+    probabilities = _softmax(values @ self.weights[indices] + self.bias)
+    best = int(np.argmax(probabilities))
+    if best == len(self.intent_names):
+      return _parse_result(text, None, float(probabilities[best]), [])
+    intent_name = self.intent_names[best]
+    slots = self.__extract_slots(intent_name, text)
+    if not slots and intent_name in self.slot_intents:
+      # Only the wording matched, as in "play some jazz" for play_artist_radio
+      return _parse_result(text, None, float(probabilities[-1]), [])
+    return _parse_result(text, intent_name, float(probabilities[best]), slots)
+
+  def __match_template(self, template: _Template, text: str, strict: bool) -> Optional[list]:
+    match = template.pattern.match(text)
+    if match is None:
+      return None
+
+    slots = []
+    i = 0
+    while i < len(template.slots):
+      if i in template.adjacent_slots:
+        # The regex splits adjacent slots after the first word, which is often wrong
+        pair = self.__build_adjacent_slots(
+          template, i, text, match.start(f's{i}'), match.end(f's{i + 1}'), strict)
+        if pair is None:
+          return None
+        slots += pair
+        i += 2
+        continue
+
+      start, end = match.span(f's{i}')
+      slot = self.__build_slot(text, start, end, *template.slots[i], strict)
+      if slot is None:
+        return None
+      slots.append(slot)
+      i += 1
+    return slots
+
+  def __build_adjacent_slots(
+      self,
+      template: _Template,
+      i: int,
+      text: str,
+      start: int,
+      end: int,
+      strict: bool,
+  ) -> Optional[list[dict]]:
+    """Returns slots i and i + 1 of template from text[start:end], trying each split between
+    words until both are valid, e.g. "San Francisco" and "next week" """
+    for separator in re.finditer(r'\W+', text[start:end]):
+      first = self.__build_slot(text, start, start + separator.start(), *template.slots[i], strict)
+      second = self.__build_slot(text, start + separator.end(), end, *template.slots[i + 1], strict)
+      if first is not None and second is not None:
+        return [first, second]
+    return None
+
+  def __extract_slots(self, intent_name: str, text: str) -> list[dict]:
+    for template in self.templates:
+      if template.intent_name != intent_name:
+        continue
+      slots = self.__match_template(template, text, strict=False)
+      if slots is not None:
+        return slots
+
+    # Fall back to finding known entity values anywhere in the text
+    slots = []
+    slot_entities = {
+      chunk['slot_name']: chunk['entity']
+      for utterance in self.dataset['intents'][intent_name]['utterances']
+      for chunk in utterance['data']
+      if 'slot_name' in chunk
+    }
+    for slot_name, entity in slot_entities.items():
+      for start, end in self.__find_entity(entity, text):
+        slot = self.__build_slot(text, start, end, slot_name, entity)
+        if slot is not None:
+          slots.append(slot)
+          break
+    return sorted(slots, key=lambda s: s['range']['start'])
+
+  def __find_entity(self, entity: str, text: str) -> list[tuple[int, int]]:
+    """Returns the (start, end) of possible mentions of entity in text"""
+    if entity == 'snips/datetime':
+      return find_datetimes(text)
+    if entity == 'snips/city':
+      # Capitalized words after "in", e.g. "in San Francisco"
+      return [m.span(1) for m in re.finditer(r"\bin ([A-Z][\w'.-]*(?: [A-Z][\w'.-]*)*)", text)]
+    gazetteer = self.gazetteers.get(entity)
+    if gazetteer is None:
+      return []
+    return [(start, end) for start, end, _ in gazetteer.find(text)]
+
+  def __build_slot(
+      self,
+      text: str,
+      start: int,
+      end: int,
+      slot_name: str,
+      entity: str,
+      strict: bool = False,
+  ) -> Optional[dict]:
+    """Returns a slot for text[start:end], or None if it isn't a valid value of entity.
+    When strict, values of custom entities must be known values."""
+    raw_value = text[start:end]
+    if entity == 'snips/datetime':
+      value = resolve_datetime_value(raw_value)
+      if value is None:
+        return None
+    else:
+      gazetteer = self.gazetteers.get(entity)
+      resolved = gazetteer.resolve(raw_value) if gazetteer is not None else None
+      extensible = self.dataset['entities'].get(entity, {}).get('automatically_extensible', True)
+      if resolved is None and (strict or not extensible) and entity != 'snips/city':
+        return None
+      value = {'kind': 'Custom', 'value': resolved or raw_value}
+
+    return {
+      'range': {'start': start, 'end': end},
+      'rawValue': raw_value,
+      'value': value,
+      'entity': entity,
+      'slotName': slot_name,
+    }
+
+  def persist(self, model_dir: str) -> None:
+    """Saves the engine to model_dir"""
+    os.makedirs(model_dir, exist_ok=True)
+    weights_path = os.path.join(model_dir, LINEAR_WEIGHTS_FILENAME)
+    np.savez_compressed(weights_path, weights=self.weights, bias=self.bias)
+    with open(os.path.join(model_dir, LINEAR_ENGINE_FILENAME), 'w', encoding='utf-8') as f:
+      json.dump({
+        'random_seed': self.random_seed,
+        'feature_bits': self.feature_bits,
+        'augmentation': self.augmentation,
+        'noise_factor': self.noise_factor,
+        'intent_names': self.intent_names,
+        'dataset': self.dataset,
+      }, f)
+
+  @classmethod
+  def from_path(cls, model_dir: str) -> LinearNLUEngine:
+    """Loads an engine saved by persist"""
+    with open(os.path.join(model_dir, LINEAR_ENGINE_FILENAME), 'r', encoding='utf-8') as f:
+      model = json.load(f)
+    engine = cls(
+      model['random_seed'], model['feature_bits'], model['augmentation'], model['noise_factor'])
+    engine.intent_names = model['intent_names']
+    engine.dataset = model['dataset']
+    engine.__build_matchers()
+
+    with np.load(os.path.join(model_dir, LINEAR_WEIGHTS_FILENAME)) as weights:
+      engine.weights = weights['weights']
+      engine.bias = weights['bias']
+    return engine
+
+
+def _parse_result(
+    text: str, intent_name: Optional[str], probability: float, slots: list[dict]) -> dict:
+  return {
+    'input': text,
+    'intent': {
+      'intentName': intent_name,
+      'probability': probability,
+    },
+    'slots': slots,
+  }
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+  exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+  return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def resolve_datetime_value(text: str, now: Optional[datetime] = None) -> Optional[dict]:
+  """Resolves a date expression to a slot value in the format of snips/datetime: a TimeInterval
+  with an exclusive end for weeks and weekends ("next week"), an InstantTime otherwise. Returns
+  None for unsupported expressions."""
+  now = now or datetime.now().astimezone()
+  interval = _resolve_time_interval(_datetime_phrase(text), now)
+  if interval is not None:
+    start, end = interval
+    return {'kind': 'TimeInterval', 'from': _format_datetime(start), 'to': _format_datetime(end)}
+  resolved = resolve_datetime(text, now)
+  if resolved is None:
+    return None
+  return {'kind': 'InstantTime', 'value': resolved, 'grain': 'Day', 'precision': 'Exact'}
+
+
+def _resolve_time_interval(phrase: str, now: datetime) -> Optional[tuple[datetime, datetime]]:
+  """Returns the [start, end) of a week or weekend phrase. Intervals that have already started
+  begin today."""
+  today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+  next_monday = today + timedelta(days=7 - today.weekday())
+  if phrase == 'this week':
+    return today, next_monday
+  if phrase == 'next week':
+    return next_monday, next_monday + timedelta(days=7)
+
+  saturday = next_monday - timedelta(days=2)
+  if phrase in ('this weekend', 'weekend'):
+    return max(today, saturday), next_monday
+  if phrase == 'next weekend':
+    return saturday + timedelta(days=7), next_monday + timedelta(days=7)
+  return None
+
+
+def _datetime_phrase(text: str) -> str:
+  tokens = [token for token in _normalize_tokens(text) if token not in ('on', 'the', 'of', 'at')]
+  return ' '.join(tokens)
+
+
+def resolve_datetime(text: str, now: Optional[datetime] = None) -> Optional[str]:
+  """Resolves common relative date expressions to a datetime in the local timezone, formatted
+  like snips' InstantTime values (ex: "2023-02-11 00:00:00 -08:00"). Weeks and weekends resolve
+  to their first day. Returns None for unsupported expressions."""
+  now = now or datetime.now().astimezone()
+  today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+  phrase = _datetime_phrase(text)
+
+  interval = _resolve_time_interval(phrase, now)
+  if interval is not None:
+    return _format_datetime(interval[0])
+  if phrase in ('now', 'right now', 'currently'):
+    return _format_datetime(now)
+  if phrase in ('today', 'tonight', 'this morning', 'this afternoon', 'this evening'):
+    return _format_datetime(today)
+  if phrase in ('tomorrow', 'tomorrow morning', 'tomorrow night'):
+    return _format_datetime(today + timedelta(days=1))
+  if phrase == 'yesterday':
+    return _format_datetime(today - timedelta(days=1))
+
+  match = re.fullmatch(r'(?:in )?(\w+) days?(?: from now)?', phrase)
+  if match:
+    days = NUMBER_WORDS.get(match.group(1))
+    if days is None and match.group(1).isdigit():
+      days = int(match.group(1))
+    if days is not None:
+      return _format_datetime(today + timedelta(days=days))
+
+  match = re.fullmatch(r'(this |next )?(\w+)', phrase)
+  if match and match.group(2) in WEEKDAYS:
+    days = (WEEKDAYS.index(match.group(2)) - today.weekday()) % 7
+    if match.group(1) == 'next ' and days == 0:
+      days = 7
+    return _format_datetime(today + timedelta(days=days))
+
+  match = re.fullmatch(r'(\w+) (\d{1,2})(?:st|nd|rd|th)?(?: (\d{4}))?', phrase)
+  if match and match.group(1) in MONTHS:
+    year = int(match.group(3)) if match.group(3) else today.year
+    try:
+      day = date(year, MONTHS.index(match.group(1)) + 1, int(match.group(2)))
+    except ValueError:
+      return None
+    return _format_datetime(today.replace(year=day.year, month=day.month, day=day.day))
+
+  return None
+
+
+def _format_datetime(dt: datetime) -> str:
+  offset = dt.strftime('%z')
+  return dt.strftime('%Y-%m-%d %H:%M:%S ') + f'{offset[:3]}:{offset[3:]}'
+
+
+def find_datetimes(text: str, max_tokens: int = 4) -> list[tuple[int, int]]:
+  """Returns the (start, end) of the longest non-overlapping spans of text that
+  resolve_datetime supports"""
+  tokens = list(TOKEN_PATTERN.finditer(text))
+  spans = []
+  i = 0
+  while i < len(tokens):
+    for j in range(min(len(tokens), i + max_tokens) - 1, i - 1, -1):
+      start, end = tokens[i].start(), tokens[j].end()
+      if resolve_datetime(text[start:end]) is not None:
+        spans.append((start, end))
+        i = j + 1
+        break
+    else:
+      i += 1
+  return spans
@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from bot.common.paths import directory_signature
+
+DEFAULT_WATCH_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class ModelWatcher:
+  """Reloads a model in a background thread whenever its directory changes.
+
+  `model_dir` is polled every `interval` seconds. Once a change has settled (the directory
+  looks the same on two consecutive polls, so training has finished writing it), the model is
+  loaded with `load(model_dir)` and passed to `on_load`. If `load` raises, the error is logged
+  and `on_load` isn't called, so a broken artifact never replaces a working model. The next
+  change to the directory is tried again."""
+
+  def __init__(
+      self,
+      model_dir: str,
+      load: Callable[[str], Any],
+      on_load: Callable[[Any], None],
+      interval: float = DEFAULT_WATCH_INTERVAL,
+  ):
+    self.model_dir = model_dir
+    self.load = load
+    self.on_load = on_load
+    self.interval = interval
+    # Signature of the directory contents that were last loaded (or failed to load)
+    self.signature = directory_signature(model_dir)
+    self.stop_event = threading.Event()
+    self.thread = threading.Thread(target=self.__run, name='assistant-model-watcher', daemon=True)
+
+  def start(self) -> None:
+    """Starts polling model_dir"""
+    self.thread.start()
+
+  def __run(self) -> None:
+    pending_signature = None
+    while not self.stop_event.wait(self.interval):
+      signature = directory_signature(self.model_dir)
+      if signature == self.signature:
+        pending_signature = None
+        continue
+      if signature != pending_signature:
+        # Still changing, wait for the next poll
+        pending_signature = signature
+        continue
+
+      self.signature = signature
+      pending_signature = None
+      if signature is not None:
+        self.reload()
+
+  def reload(self) -> bool:
+    """Loads the model from model_dir and passes it to on_load. Returns whether it succeeded."""
+    logger.info(f'Reloading model from {self.model_dir}')
+    start = time.perf_counter()
+    try:
+      model = self.load(self.model_dir)
+    except Exception: # pylint: disable=broad-exception-caught
+      logger.exception(
+        f'Failed to reload model from {self.model_dir} after '
+        f'{time.perf_counter() - start:.04f} seconds, keeping the current model')
+      return False
+
+    self.on_load(model)
+    logger.info(
+      f'Reloaded model from {self.model_dir} in {time.perf_counter() - start:.04f} seconds')
+    return True
+
+  def stop(self) -> None:
+    """Stops polling and waits for an in-progress reload to finish"""
+    self.stop_event.set()
+    if self.thread.is_alive():
+      self.thread.join()
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+from bot.common.main import init
+from bot.common.rate_limit import TokenBucket
+from bot.language.assistant import LINEAR_ENGINE, NLU_ENGINE_MODEL_DIRS
+from bot.language.assistant.executor import Executor
+from bot.language.assistant.intents.fake_spotify import FakeSpotifyServer
+from bot.language.assistant.intents.music import MusicHandler
+from bot.language.assistant.intents.spotify_client import RateLimitStats, SpotifyClient
+from bot.language.assistant.intents.spotify_library import SpotifyLibraryIndex
+
+DEFAULT_CONCURRENCY = [1, 4, 16, 64]
+DEFAULT_COMMANDS = 200
+DEFAULT_LATENCY = 0.05
+DEFAULT_JITTER = 0.02
+DEFAULT_RANDOM_SEED = 0
+LATENCY_PERCENTILES = [50, 90, 99]
+# Request budget rate and burst that never makes requests wait
+UNLIMITED = 1e9
+
+# Utterances and the intents they are expected to parse as
+COMMANDS = [
+  ('Pause the music', 'pause_music'),
+  ('Resume the music', 'resume_music'),
+  ('Turn up the volume', 'raise_music_volume'),
+  ('Lower the volume', 'lower_music_volume'),
+  ('Next song', 'play_next_track'),
+  ('Previous track', 'play_previous_track'),
+  ('Toggle shuffle', 'toggle_music_shuffle'),
+  ('Toggle repeat', 'toggle_music_repeat'),
+  ('Play the track Forget Me Nots', 'play_track'),
+  ('Queue Before I Let Go by Maze', 'queue_track'),
+  ('Play the playlist Workshop', 'play_playlist'),
+  ('Play some Childish Gambino', 'play_artist_radio'),
+  ('Switch the music to the kitchen speaker', 'switch_music_device'),
+]
+
+logger = logging.getLogger('bot.language.assistant.music_bench')
+logger.setLevel(logging.NOTSET) # Override default behavior for root logger
+
+
+def bench(
+    concurrency: list[int],
+    commands: int = DEFAULT_COMMANDS,
+    latency: float = DEFAULT_LATENCY,
+    jitter: float = DEFAULT_JITTER,
+    error_rate: float = 0.0,
+    rate_limit: Optional[float] = None,
+    budget: Optional[float] = None,
+    random_seed: int = DEFAULT_RANDOM_SEED,
+    nlu_engine: str = LINEAR_ENGINE,
+) -> list[dict]:
+  """Drives MusicHandler through an Executor against a FakeSpotifyServer, running `commands`
+  random music commands with each number of commands in flight in concurrency.
+
+  The server adds latency plus up to jitter seconds to each request, fails error_rate of them,
+  and throttles above rate_limit requests per second. The client's request budget is budget
+  requests per second (unlimited by default). Reports latency percentiles per intent, the
+  Spotify requests made per command, and the client's retries and rate limit delays."""
+  rng = random.Random(random_seed)
+  server = FakeSpotifyServer(latency, jitter, error_rate, rate_limit, random_seed=random_seed)
+  stats = RateLimitStats()
+  # Handler deadlines would cut off the slowest commands that the benchmark is measuring
+  executor = Executor(
+    intent_handlers=[], nlu_engine=nlu_engine, watch_model=False, handler_deadline=None)
+  tmp_dir = tempfile.TemporaryDirectory()
+  handler = None
+  try:
+    url = executor.event_loop.run(server.start())
+
+    async def create_client() -> SpotifyClient:
+      bucket = TokenBucket(budget, budget) if budget else TokenBucket(UNLIMITED, UNLIMITED)
+      return SpotifyClient(
+        'fake-id', 'fake-secret', token='fake-token', budget=bucket, stats=stats, api_url=url)
+    client = executor.event_loop.run(create_client())
+
+    library = SpotifyLibraryIndex(os.path.join(tmp_dir.name, 'library.json'))
+    handler = MusicHandler(loop=executor.event_loop.loop, client=client, library=library)
+    executor.handlers.register(handler)
+    executor.event_loop.run(_wait_for_library(handler))
+
+    results = []
+    for level in concurrency:
+      batch = [rng.choice(COMMANDS) for _ in range(commands)]
+      result = executor.event_loop.run(_run_level(executor, handler, server, stats, batch, level))
+      log_result(result)
+      results.append(result)
+    return results
+  finally:
+    if handler is not None:
+      executor.event_loop.run(handler.client.close())
+    executor.event_loop.run(server.stop())
+    executor.close()
+    tmp_dir.cleanup()
+
+
+async def _wait_for_library(handler: MusicHandler) -> None:
+  # The handler starts refreshing its library index once the loop gets to it
+  await asyncio.sleep(0)
+  if handler.library_refresh is not None:
+    await handler.library_refresh
+
+
+async def _run_level(
+    executor: Executor,
+    handler: MusicHandler,
+    server: FakeSpotifyServer,
+    stats: RateLimitStats,
+    batch: list[tuple[str, str]],
+    concurrency: int,
+) -> dict:
+  server.requests.clear()
+  server.injected_errors.clear()
+  handler.round_trips_by_intent.clear()
+  handler.commands_by_intent.clear()
+  stats_before = stats.to_dict()
+
+  semaphore = asyncio.Semaphore(concurrency)
+  latencies = defaultdict(list)
+  failures = 0
+
+  async def converse(text: str, intent_name: str) -> None:
+    nonlocal failures
+    async with semaphore:
+      start = time.perf_counter()
+      try:
+        response = await executor.converse_async(text)
+      except Exception: # pylint: disable=broad-exception-caught
+        logger.debug(f'Failed to handle "{text}"', exc_info=True)
+        response = None
+      latencies[intent_name].append(time.perf_counter() - start)
+      if response is None or response.startswith('Sorry'):
+        failures += 1
+
+  start = time.perf_counter()
+  await asyncio.gather(*(converse(text, intent_name) for text, intent_name in batch))
+  wall_seconds = time.perf_counter() - start
+
+  stats_after = stats.to_dict()
+  handled = sum(handler.commands_by_intent.values())
+  return {
+    'concurrency': concurrency,
+    'commands': len(batch),
+    'failures': failures,
+    'wall_seconds': wall_seconds,
+    'commands_per_second': len(batch) / wall_seconds,
+    'latency_ms': _percentiles(sum(latencies.values(), [])),
+    'intents': {
+      intent_name: {
+        'commands': len(latencies[intent_name]),
+        'latency_ms': _percentiles(latencies[intent_name]),
+        'requests_per_command': _requests_per_command(handler, intent_name),
+      }
+      for intent_name in sorted(latencies)
+    },
+    # Includes requests made by the handler's background tasks
+    'server_requests': server.request_count,
+    'requests_per_command': (
+      sum(rt.count for rt in handler.round_trips_by_intent.values()) / handled if handled else 0.0),
+    'injected_errors': {str(status): count for status, count in server.injected_errors.items()},
+    'client': {name: stats_after[name] - stats_before[name] for name in stats_after},
+  }
+
+
+def _percentiles(latencies: list[float]) -> dict:
+  latencies_ms = np.array(latencies) * 1000
+  return {f'p{p}': float(np.percentile(latencies_ms, p)) for p in LATENCY_PERCENTILES}
+
+
+def _requests_per_command(handler: MusicHandler, intent_name: str) -> Optional[float]:
+  handled = handler.commands_by_intent[intent_name]
+  if not handled:
+    # The utterance was parsed as another intent or not handled at all
+    return None
+  return handler.round_trips_by_intent[intent_name].count / handled
+
+
+def log_result(result: dict) -> None:
+  """Logs a human-readable summary of the benchmark for one concurrency level"""
+  latency = ', '.join(f'{name} {value:.01f}' for name, value in result['latency_ms'].items())
+  logger.info(
+    f"{result['concurrency']} concurrent: {result['commands']} commands in "
+    f"{result['wall_seconds']:.02f} seconds ({result['commands_per_second']:.01f}/s, "
+    f"{result['failures']} failed), latency (ms) {latency}, "
+    f"{result['requests_per_command']:.02f} Spotify requests per command")
+  for intent_name, intent in result['intents'].items():
+    latency = ', '.join(f'{name} {value:.01f}' for name, value in intent['latency_ms'].items())
+    requests = intent['requests_per_command']
+    logger.info(
+      f"  {intent_name}: latency (ms) {latency}, "
+      + (f'{requests:.02f} requests per command' if requests is not None else 'not handled'))
+  client = result['client']
+  logger.info(
+    f"  client: {client['requests']} requests, {client['retries']} retries, "
+    f"{client['throttled']} throttled, {client['queued']} queued for "
+    f"{client['queue_seconds']:.02f} seconds")
+
+
+def main():
+  logger.info('Benchmarking the music handler against a fake Spotify API...')
+
+  parser = argparse.ArgumentParser(
+    prog = 'drone bench_music'
+  )
+  parser.add_argument(
+    '-c', '--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY,
+    help='numbers of commands in flight to benchmark')
+  parser.add_argument('-n', '--commands', type=int, default=DEFAULT_COMMANDS)
+  parser.add_argument(
+    '-l', '--latency', type=float, default=DEFAULT_LATENCY,
+    help='seconds that the fake API takes to respond')
+  parser.add_argument(
+    '-j', '--jitter', type=float, default=DEFAULT_JITTER,
+    help='maximum random seconds added to each response')
+  parser.add_argument(
+    '-e', '--error-rate', type=float, default=0.0,
+    help='fraction of requests that the fake API fails with a 503')
+  parser.add_argument(
+    '-r', '--rate-limit', type=float, default=None,
+    help='requests per second above which the fake API responds with a 429')
+  parser.add_argument(
+    '-b', '--budget', type=float, default=None,
+    help="client's request budget in requests per second (default: unlimited)")
+  parser.add_argument('-s', '--random-seed', type=int, default=DEFAULT_RANDOM_SEED)
+  parser.add_argument(
+    '--engine', dest='nlu_engine', default=LINEAR_ENGINE, choices=NLU_ENGINE_MODEL_DIRS)
+  parser.add_argument('-o', '--output', default=None, help='path to write the JSON report to')
+  args = vars(parser.parse_args())
+
+  output_path = args.pop('output')
+  results = bench(**args)
+  if output_path is not None:
+    with open(output_path, 'w', encoding='utf-8') as f:
+      json.dump(results, f, indent=2)
+    logger.info(f'Wrote report to {output_path}')
+  else:
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  init(main)
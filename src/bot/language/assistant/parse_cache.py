@@ -0,0 +1,98 @@
+import copy
+import time
+from typing import Optional
+
+from snips_nlu import SnipsNLUEngine
+
+from bot.common.cache import CacheStats, LRUCache
+from bot.language.assistant.linear_engine import LinearNLUEngine, resolve_datetime_value
+
+DEFAULT_PARSE_CACHE_SIZE = 256
+
+# Builtin entities whose resolved values depend on the current time (ex: "tomorrow")
+TIME_RELATIVE_ENTITIES = {
+  'snips/datetime',
+  'snips/date',
+  'snips/time',
+  'snips/datePeriod',
+  'snips/timePeriod',
+}
+
+
+def normalize_utterance(input_text: str) -> str:
+  """Collapses whitespace. Applied to every input before it is parsed."""
+  return ' '.join(input_text.split())
+
+
+class ParseCache:
+  """Bounded LRU cache of snips-nlu parse results keyed by normalized utterance.
+
+  Only whitespace is normalized, since snips' slot features are case-sensitive and a parse
+  of "play hello" may not match that of "Play Hello". Time-relative builtin slots are
+  re-resolved against the current time on every hit so that values like "tomorrow" are
+  never served stale.
+
+  Entries are tagged with the fingerprint of the engine that produced them and are
+  dropped whenever a different engine is used."""
+
+  def __init__(self, maxsize: int = DEFAULT_PARSE_CACHE_SIZE):
+    self.entries = LRUCache(maxsize)
+    self.stats = CacheStats()
+    self.fingerprint: Optional[str] = None
+
+  def reset(self, fingerprint: str) -> None:
+    """Clears the cache if the engine fingerprint has changed"""
+    if fingerprint != self.fingerprint:
+      self.entries.clear()
+      self.fingerprint = fingerprint
+
+  def parse(self, engine: SnipsNLUEngine | LinearNLUEngine, input_text: str) -> dict:
+    """Returns the cached parse result for input_text, parsing it with engine on a miss"""
+    start = time.perf_counter()
+    input_text = normalize_utterance(input_text)
+
+    cached_result = self.entries.get(input_text)
+    if cached_result is not None:
+      result = copy.deepcopy(cached_result)
+      _resolve_time_slots(engine, result)
+      self.stats.record_hit(time.perf_counter() - start)
+      return result
+
+    result = engine.parse(input_text)
+    self.entries.put(input_text, copy.deepcopy(result))
+    self.stats.record_miss(time.perf_counter() - start)
+    return result
+
+
+def _resolve_time_slots(engine: SnipsNLUEngine | LinearNLUEngine, result: dict) -> None:
+  """Re-resolves time-relative slots in place, mirroring SnipsNLUEngine._resolve_slots"""
+  slots = [slot for slot in result['slots'] if slot['entity'] in TIME_RELATIVE_ENTITIES]
+  if not slots:
+    return
+
+  if isinstance(engine, LinearNLUEngine):
+    # Has no builtin entity parser, its snips/datetime values are resolved from the raw value
+    for slot in slots:
+      resolved_value = resolve_datetime_value(slot['rawValue'])
+      if resolved_value is not None:
+        slot['value'] = resolved_value
+    return
+
+  parser = engine.builtin_entity_parser
+  scope = list({slot['entity'] for slot in slots})
+  entities = parser.parse(result['input'], scope, use_cache=False)
+
+  for slot in slots:
+    resolved_value = None
+    for entity in entities:
+      if entity['entity_kind'] == slot['entity'] and entity['range'] == slot['range']:
+        resolved_value = entity['resolved_value']
+        break
+
+    if resolved_value is None:
+      matches = parser.parse(slot['rawValue'], scope=[slot['entity']], use_cache=False)
+      if matches:
+        resolved_value = matches[0]['resolved_value']
+
+    if resolved_value is not None:
+      slot['value'] = resolved_value
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from snips_nlu import SnipsNLUEngine
+
+from bot.language.assistant.snapshot import load_engine
+
+logger = logging.getLogger(__name__)
+
+# Each worker process holds its own engine, loaded once by _init_worker
+_worker_engine: Optional[SnipsNLUEngine] = None
+
+
+class ParsePool:
+  """Parses batches of utterances with a pool of worker processes.
+
+  snips-nlu parsing is CPU-bound Python, so a single process is limited to one core.
+  Each worker loads the NLU engine from `model_dir` (or its snapshot) once when it starts
+  and then calls `SnipsNLUEngine.parse` exactly as Executor._parse does."""
+
+  def __init__(self, model_dir: str, processes: Optional[int] = None):
+    self.model_dir = model_dir
+    self.processes = processes or os.cpu_count() or 1
+    # Use spawn rather than fork since the parent process may be running other threads
+    self.pool = ProcessPoolExecutor(
+      max_workers=self.processes,
+      mp_context=multiprocessing.get_context('spawn'),
+      initializer=_init_worker,
+      initargs=(model_dir,),
+    )
+
+  def __enter__(self) -> ParsePool:
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  def parse(self, input_texts: list[str]) -> list[dict]:
+    """Parses each text and returns the results in the same order as `input_texts`"""
+    if not input_texts:
+      return []
+
+    # Several chunks per worker keeps the pool balanced without paying IPC overhead per utterance
+    chunk_size = max(1, math.ceil(len(input_texts) / (self.processes * 4)))
+
+    start = time.perf_counter()
+    results = list(self.pool.map(_parse_in_worker, input_texts, chunksize=chunk_size))
+    elapsed = time.perf_counter() - start
+
+    logger.debug(
+      f'Parsed {len(input_texts)} utterances in {elapsed:.04f} seconds '
+      f'({len(input_texts) / elapsed:.01f} utterances/sec) with {self.processes} processes')
+    return results
+
+  def close(self) -> None:
+    """Shuts down the worker processes"""
+    self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def measure_parse_throughput(
+    model_dir: str,
+    input_texts: list[str],
+    max_processes: Optional[int] = None,
+) -> dict[int, float]:
+  """Parses `input_texts` with pools of 1 to `max_processes` workers and returns the throughput
+  (utterances/sec) for each pool size. Engine loading is excluded from the measurements."""
+  max_processes = max_processes or os.cpu_count() or 1
+  throughput = {}
+  for processes in range(1, max_processes + 1):
+    with ParsePool(model_dir, processes) as pool:
+      # Warm up so that every worker has loaded its engine before timing starts
+      pool.parse(input_texts[:processes * 4])
+
+      start = time.perf_counter()
+      pool.parse(input_texts)
+      throughput[processes] = len(input_texts) / (time.perf_counter() - start)
+
+    logger.info(f'{processes} processes: {throughput[processes]:.01f} utterances/sec')
+  return throughput
+
+
+def _init_worker(model_dir: str) -> None:
+  global _worker_engine # pylint: disable=global-statement
+  _worker_engine = load_engine(model_dir)
+
+
+def _parse_in_worker(input_text: str) -> dict:
+  return _worker_engine.parse(input_text)
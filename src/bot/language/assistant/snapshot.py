@@ -0,0 +1,132 @@
+import json
+import logging
+import mmap
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from snips_nlu import SnipsNLUEngine
+from snips_nlu.resources import load_resources_from_dir
+
+from bot.common.paths import directory_fingerprint
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot'
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_path_for(model_dir: str) -> str:
+  """Returns the default snapshot path for an engine persisted to model_dir"""
+  return os.path.normpath(model_dir) + SNAPSHOT_SUFFIX
+
+
+def write_snapshot(model_dir: str, snapshot_path: Optional[str] = None) -> str:
+  """Packs the engine persisted to model_dir into a single snapshot file and returns its path.
+
+  Most of the engine's load time is spent parsing its language resources (word clusters,
+  stems, gazetteers) from text files into lookup tables. The snapshot stores those tables
+  already built, along with the raw bytes of every other file in model_dir."""
+  snapshot_path = snapshot_path or snapshot_path_for(model_dir)
+  model_path = Path(model_dir)
+
+  with open(model_path / 'nlu_engine.json', 'r', encoding='utf-8') as f:
+    dataset_metadata = json.load(f)['dataset_metadata']
+  resources_dir = model_path / 'resources' / dataset_metadata['language_code']
+
+  files = {}
+  for root, _, file_names in os.walk(model_dir):
+    for file_name in file_names:
+      path = Path(root) / file_name
+      relpath = path.relative_to(model_path)
+      if resources_dir in path.parents:
+        continue
+      files[relpath.as_posix()] = path.read_bytes()
+
+  snapshot = {
+    'version': SNAPSHOT_VERSION,
+    'fingerprint': directory_fingerprint(model_dir),
+    'resources': load_resources_from_dir(resources_dir),
+    'files': files,
+  }
+
+  # Write to a temporary file first so that a running Executor never reads a partial snapshot
+  tmp_path = f'{snapshot_path}.tmp'
+  with open(tmp_path, 'wb') as f:
+    pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, snapshot_path)
+
+  snapshot_size = os.path.getsize(snapshot_path)
+  logger.info(f'Wrote engine snapshot to {snapshot_path} ({snapshot_size:,} bytes)')
+  return snapshot_path
+
+
+def load_snapshot(
+    snapshot_path: str, fingerprint: Optional[str] = None) -> Optional[SnipsNLUEngine]:
+  """Loads an engine from a snapshot written by write_snapshot.
+
+  Returns None if the snapshot doesn't exist, was written by a different version of this
+  module, or doesn't match `fingerprint` (the directory_fingerprint of the model directory)."""
+  if not os.path.isfile(snapshot_path):
+    return None
+
+  # Unpickle directly from the mapped file rather than reading it into an intermediate buffer
+  with open(snapshot_path, 'rb') as f:
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      snapshot = pickle.loads(data)
+
+  if snapshot.get('version') != SNAPSHOT_VERSION:
+    logger.info(f'Ignoring engine snapshot {snapshot_path} with an unsupported version')
+    return None
+  if fingerprint is not None and snapshot['fingerprint'] != fingerprint:
+    logger.info(f'Ignoring stale engine snapshot {snapshot_path}')
+    return None
+
+  # The entity parsers and CRF models can only be loaded from files. They are fully read into
+  # memory by from_path, so the temporary directory can be removed afterwards.
+  with tempfile.TemporaryDirectory(prefix='engine-snapshot-') as tmp_dir:
+    for relpath, contents in snapshot['files'].items():
+      path = Path(tmp_dir, relpath)
+      path.parent.mkdir(parents=True, exist_ok=True)
+      path.write_bytes(contents)
+    return SnipsNLUEngine.from_path(tmp_dir, resources=snapshot['resources'])
+
+
+def load_engine(
+    model_dir: str,
+    snapshot_path: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+) -> SnipsNLUEngine:
+  """Loads the engine persisted to model_dir, using its snapshot if it is up to date"""
+  snapshot_path = snapshot_path or snapshot_path_for(model_dir)
+  fingerprint = fingerprint or directory_fingerprint(model_dir)
+
+  engine = load_snapshot(snapshot_path, fingerprint)
+  if engine is not None:
+    logger.debug(f'Loaded engine from snapshot {snapshot_path}')
+    return engine
+
+  logger.debug(f'Loading engine from directory {model_dir}')
+  return SnipsNLUEngine.from_path(model_dir)
+
+
+def measure_load_times(model_dir: str, snapshot_path: Optional[str] = None) -> dict[str, float]:
+  """Returns the seconds taken to load the engine from model_dir and from its snapshot"""
+  snapshot_path = snapshot_path or snapshot_path_for(model_dir)
+
+  start = time.perf_counter()
+  SnipsNLUEngine.from_path(model_dir)
+  directory_seconds = time.perf_counter() - start
+
+  start = time.perf_counter()
+  load_snapshot(snapshot_path)
+  snapshot_seconds = time.perf_counter() - start
+
+  logger.info(
+    f'Engine load time: {directory_seconds:.04f} seconds from {model_dir}, '
+    f'{snapshot_seconds:.04f} seconds from {snapshot_path} '
+    f'({directory_seconds / snapshot_seconds:.01f}x)')
+  return {'directory': directory_seconds, 'snapshot': snapshot_seconds}
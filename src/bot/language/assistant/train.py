@@ -2,6 +2,7 @@ import argparse
 import logging
 import os
 import shutil
+from typing import Optional
 
 from snips_nlu import SnipsNLUEngine
 from snips_nlu.dataset import Dataset
@@ -12,7 +13,14 @@ from bot import logger as root_logger
 from bot.common.logging import numbered_file_handler
 from bot.common.main import init
 from bot.common.perf import log_resource_usage, timed_fn
-from bot.language.assistant import ASSISTANT_DATA_DIR, ASSISTANT_MODEL_DIR
+from bot.language.assistant import (ASSISTANT_DATA_DIR, ASSISTANT_TRAIN_CACHE_DIR,
+                                    LINEAR_ENGINE, NLU_ENGINE_MODEL_DIRS, SNIPS_ENGINE)
+from bot.language.assistant.fast_path import FastPathMatcher
+from bot.language.assistant.linear_engine import LinearNLUEngine, load_dataset_files
+from bot.language.assistant.snapshot import measure_load_times, write_snapshot
+from bot.language.assistant.train_cache import TrainingCache, fit_engine
+
+RANDOM_SEED = 20230206
 
 logger = logging.getLogger('bot.language.assistant.train')
 logger.setLevel(logging.NOTSET) # Override default behavior for root logger
@@ -21,28 +29,61 @@ logger.setLevel(logging.NOTSET) # Override default behavior for root logger
 @timed_fn
 def train(
     data_dir: str = ASSISTANT_DATA_DIR,
-    output_dir: str = ASSISTANT_MODEL_DIR,
+    output_dir: Optional[str] = None,
+    cache_dir: Optional[str] = ASSISTANT_TRAIN_CACHE_DIR,
+    nlu_engine: str = SNIPS_ENGINE,
 ) -> None:
-  """Trains the snips NLU engine used by assistant.Executor"""
+  """Trains the NLU engine used by assistant.Executor.
+
+  If cache_dir is set, parsed dataset files and fitted slot fillers are cached there so that
+  only the intents that changed since the last run are refit. The trained engine is the same
+  with or without the cache. The linear engine trains in seconds and doesn't use the cache."""
+  output_dir = output_dir or NLU_ENGINE_MODEL_DIRS[nlu_engine]
   dataset_paths = []
-  for entry in os.listdir(data_dir):
+  for entry in sorted(os.listdir(data_dir)):
     path = os.path.join(data_dir, entry)
     if not os.path.isfile(path):
       continue
     dataset_paths.append(path)
 
-  dataset = Dataset.from_yaml_files('en', dataset_paths)
+  if nlu_engine == LINEAR_ENGINE:
+    _train_linear(dataset_paths, output_dir)
+    return
+
+  cache = TrainingCache(cache_dir) if cache_dir else None
+  if cache is not None:
+    dataset = cache.load_dataset('en', dataset_paths)
+  else:
+    dataset = Dataset.from_yaml_files('en', dataset_paths)
   logger.info(
     f'Loaded {len(dataset.intents)} intents and {len(dataset.entities)} entities from {data_dir}')
 
-  engine = SnipsNLUEngine(config=CONFIG_EN, random_state=20230206)
-  engine.fit(dataset)
+  engine = SnipsNLUEngine(config=CONFIG_EN, random_state=RANDOM_SEED)
+  fit_engine(engine, dataset, RANDOM_SEED, cache)
+  if cache is not None:
+    cache.prune()
+
+  log_resource_usage()
+
+  os.makedirs(os.path.dirname(output_dir), exist_ok=True)
+  shutil.rmtree(output_dir, ignore_errors=True)
+  engine.persist(output_dir)
+  FastPathMatcher.from_dataset_files(dataset_paths).save(output_dir)
+
+  write_snapshot(output_dir)
+  measure_load_times(output_dir)
+
+
+def _train_linear(dataset_paths: list[str], output_dir: str) -> None:
+  dataset = load_dataset_files(dataset_paths)
+  engine = LinearNLUEngine(random_seed=RANDOM_SEED).fit(dataset)
 
   log_resource_usage()
 
   os.makedirs(os.path.dirname(output_dir), exist_ok=True)
   shutil.rmtree(output_dir, ignore_errors=True)
   engine.persist(output_dir)
+  FastPathMatcher.from_dataset_files(dataset_paths).save(output_dir)
 
 
 def main():
@@ -55,7 +96,14 @@ def main():
     prog = 'drone train_assist'
   )
   parser.add_argument('-d', '--data-dir', default=ASSISTANT_DATA_DIR)
-  parser.add_argument('-o', '--output-dir', default=ASSISTANT_MODEL_DIR)
+  parser.add_argument(
+    '-o', '--output-dir', default=None, help='defaults to the model directory of the engine')
+  parser.add_argument('-c', '--cache-dir', default=ASSISTANT_TRAIN_CACHE_DIR)
+  parser.add_argument(
+    '--no-cache', dest='cache_dir', action='store_const', const=None,
+    help='fit every intent from scratch without reading or writing the training cache')
+  parser.add_argument(
+    '-e', '--engine', dest='nlu_engine', choices=NLU_ENGINE_MODEL_DIRS, default=SNIPS_ENGINE)
   args = parser.parse_args()
 
   train(**vars(args))
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+import zlib
+from copy import deepcopy
+from pathlib import Path
+from typing import Optional
+
+import snips_nlu
+from snips_nlu import SnipsNLUEngine
+from snips_nlu.dataset import Dataset, Entity, Intent, validate_and_format_dataset
+from snips_nlu.dataset.yaml_wrapper import yaml
+from snips_nlu.exceptions import DatasetFormatError
+from snips_nlu.intent_parser import IntentParser, ProbabilisticIntentParser
+from snips_nlu.slot_filler import SlotFiller
+
+from bot.common.cache import CacheStats
+from bot.common.perf import log_cache_stats
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingCache:
+  """On-disk cache of intermediate assistant training results.
+
+  - Dataset files are cached as parsed intents and entities, keyed by the hash of the file.
+  - Slot fillers are cached after fitting, keyed by the hash of their intent, the entities
+    used by that intent, the slot filler config, and the random seed. See fit_engine.
+
+  Entries that weren't used by the latest training run are removed by `prune`."""
+
+  def __init__(self, cache_dir: str):
+    self.cache_dir = cache_dir
+    self.dataset_stats = CacheStats()
+    self.used_paths: set[str] = set()
+
+  def load_dataset(self, language: str, paths: list[str]) -> Dataset:
+    """Equivalent to Dataset.from_yaml_files, but skips parsing files that haven't changed"""
+    intents = []
+    entities = []
+    for path in paths:
+      intents_, entities_ = self.__load_dataset_parts(path)
+      intents += intents_
+      entities += entities_
+
+    log_cache_stats('Training dataset cache', self.dataset_stats)
+    return Dataset(language, intents, entities)
+
+  def __load_dataset_parts(self, path: str) -> tuple[list[Intent], list[Entity]]:
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+      contents = f.read()
+    cache_path = self.__entry_path('datasets', _hash_bytes(contents) + '.pickle')
+
+    if os.path.isfile(cache_path):
+      with open(cache_path, 'rb') as f:
+        parts = pickle.load(f)
+      self.dataset_stats.record_hit(time.perf_counter() - start)
+      return parts
+
+    intents = []
+    entities = []
+    for doc in yaml.safe_load_all(contents.decode('utf-8')):
+      doc_type = doc.get('type')
+      if doc_type == 'entity':
+        entities.append(Entity.from_yaml(doc))
+      elif doc_type == 'intent':
+        intents.append(Intent.from_yaml(doc))
+      else:
+        raise DatasetFormatError(f"Invalid 'type' value in YAML file '{path}': '{doc_type}'")
+
+    _write_atomically(cache_path, pickle.dumps((intents, entities)))
+    self.dataset_stats.record_miss(time.perf_counter() - start)
+    return intents, entities
+
+  def load_slot_filler(self, key: str, **shared) -> Optional[SlotFiller]:
+    """Returns the fitted slot filler cached under key, if any"""
+    path = self.__entry_path('slot_fillers', key)
+    if not os.path.isdir(path):
+      return None
+    return SlotFiller.load_from_path(path, **shared)
+
+  def save_slot_filler(self, key: str, slot_filler: SlotFiller) -> None:
+    """Caches a fitted slot filler under key"""
+    path = self.__entry_path('slot_fillers', key)
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+    slot_filler.persist(Path(tmp_path))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+  def prune(self) -> None:
+    """Removes entries that weren't used since this cache was created"""
+    for entry_type in ('datasets', 'slot_fillers'):
+      entry_type_dir = os.path.join(self.cache_dir, entry_type)
+      if not os.path.isdir(entry_type_dir):
+        continue
+      for entry in os.listdir(entry_type_dir):
+        path = os.path.join(entry_type_dir, entry)
+        if path in self.used_paths:
+          continue
+        if os.path.isdir(path):
+          shutil.rmtree(path)
+        else:
+          os.remove(path)
+
+  def __entry_path(self, entry_type: str, name: str) -> str:
+    path = os.path.join(self.cache_dir, entry_type, name)
+    self.used_paths.add(path)
+    return path
+
+
+def fit_engine(
+    engine: SnipsNLUEngine,
+    dataset: Dataset,
+    random_seed: int,
+    cache: Optional[TrainingCache] = None,
+) -> SnipsNLUEngine:
+  """Fits engine, reusing cached slot fillers for intents that haven't changed.
+
+  Each slot filler gets its own random seed derived from random_seed and its intent name,
+  so the result doesn't depend on which slot fillers were cached. The intent classifier
+  depends on every intent, so it is always refit."""
+  raw_dataset = dataset.json
+  formatted_dataset = validate_and_format_dataset(raw_dataset)
+
+  engine.load_resources_if_needed(formatted_dataset['language'])
+  engine.fit_builtin_entity_parser_if_needed(formatted_dataset)
+  engine.fit_custom_entity_parser_if_needed(formatted_dataset)
+  shared = {
+    'builtin_entity_parser': engine.builtin_entity_parser,
+    'custom_entity_parser': engine.custom_entity_parser,
+    'resources': engine.resources,
+  }
+
+  # Build the intent parsers up front with the slot fillers already in place. SnipsNLUEngine.fit
+  # reuses them when force_retrain is False and only fits the parts that aren't fitted yet.
+  unfitted_slot_fillers = {}
+  intent_parsers = []
+  for parser_config in engine.config.intent_parsers_configs:
+    intent_parser = IntentParser.from_config(
+      parser_config, random_state=engine.random_state, **shared)
+
+    if isinstance(intent_parser, ProbabilisticIntentParser):
+      intent_parser.slot_fillers = {}
+      for intent_name in formatted_dataset['intents']:
+        key = _slot_filler_key(
+          raw_dataset, intent_name, parser_config.slot_filler_config, random_seed)
+        slot_filler = cache.load_slot_filler(key, **shared) if cache is not None else None
+        if slot_filler is None:
+          slot_filler = SlotFiller.from_config(
+            deepcopy(parser_config.slot_filler_config),
+            random_state=_intent_seed(random_seed, intent_name),
+            **shared,
+          )
+          unfitted_slot_fillers[key] = slot_filler
+        intent_parser.slot_fillers[intent_name] = slot_filler
+
+    intent_parsers.append(intent_parser)
+
+  engine.intent_parsers = intent_parsers
+  logger.info(
+    f'Fitting {len(unfitted_slot_fillers)} of {len(formatted_dataset["intents"])} slot fillers')
+  engine.fit(formatted_dataset, force_retrain=False)
+
+  if cache is not None:
+    for key, slot_filler in unfitted_slot_fillers.items():
+      cache.save_slot_filler(key, slot_filler)
+  return engine
+
+
+def _slot_filler_key(raw_dataset: dict, intent_name: str, config, random_seed: int) -> str:
+  intent = raw_dataset['intents'][intent_name]
+  entity_names = sorted({
+    chunk['entity']
+    for utterance in intent['utterances']
+    for chunk in utterance['data']
+    if 'entity' in chunk
+  })
+  key_data = {
+    'snips_nlu_version': snips_nlu.__version__,
+    'language': raw_dataset['language'],
+    'config': config.to_dict(),
+    'random_seed': random_seed,
+    'intent_name': intent_name,
+    'intent': intent,
+    'entities': {name: raw_dataset['entities'].get(name) for name in entity_names},
+  }
+  return _hash_bytes(json.dumps(key_data, sort_keys=True).encode('utf-8'))
+
+
+def _intent_seed(random_seed: int, intent_name: str) -> int:
+  return (random_seed + zlib.crc32(intent_name.encode('utf-8'))) % 2**32
+
+
+def _hash_bytes(contents: bytes) -> str:
+  return hashlib.sha256(contents).hexdigest()
+
+
+def _write_atomically(path: str, contents: bytes) -> None:
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  tmp_path = f'{path}.tmp'
+  with open(tmp_path, 'wb') as f:
+    f.write(contents)
+  os.replace(tmp_path, path)
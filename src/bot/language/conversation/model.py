@@ -1,10 +1,12 @@
 import logging
+import threading
 from abc import ABC, abstractmethod
 from typing import Optional
 
 import torch
 from halo import Halo
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import (AutoModelForCausalLM, AutoTokenizer, StoppingCriteria,
+                          StoppingCriteriaList)
 
 from bot.common.halo import halo_stream
 from bot.common.logging import serialize_dict
@@ -80,25 +82,48 @@ class ConversationModel(ABC):
     """
     Submits the chat history and user input to the model and returns its latest response
     """
-    self.chat_history.append(Message(Speaker.USER, input_text))
-    recent_chat_history = self.chat_history[len(self.chat_history)-self.chat_history_limit:]
+    output_text = self.respond(input_text)
+    self.record_exchange(input_text, output_text)
+    return output_text
+
+  def respond(self, input_text: str, cancel_event: Optional[threading.Event] = None) -> str:
+    """
+    Generates a response to the user input without modifying the chat history, so that the
+    response can be discarded. Generation stops early if `cancel_event` is set.
+    """
+    chat_history = self.chat_history + [Message(Speaker.USER, input_text)]
+    recent_chat_history = chat_history[len(chat_history)-self.chat_history_limit:]
     input_tensor = self._encode_text(self._format_model_input(recent_chat_history))
 
-    output_tensor = self._extract_model_response(input_tensor, self._generate(input_tensor))
-    output_text = self._transform_output(self._decode_text(output_tensor))
-    self.chat_history.append(Message(Speaker.BOT, output_text))
+    output_tensor = self._extract_model_response(
+      input_tensor, self._generate(input_tensor, cancel_event))
+    return self._transform_output(self._decode_text(output_tensor))
 
-    return output_text
+  def record_exchange(self, input_text: str, output_text: str) -> None:
+    """Appends a user input and the response that was sent for it to the chat history"""
+    self.chat_history.append(Message(Speaker.USER, input_text))
+    self.chat_history.append(Message(Speaker.BOT, output_text))
 
   @timed_fn
-  def _generate(self, input_tensor: torch.Tensor) -> torch.Tensor:
+  def _generate(
+      self,
+      input_tensor: torch.Tensor,
+      cancel_event: Optional[threading.Event] = None,
+  ) -> torch.Tensor:
     """
     Copies the input tensor to the appropriate device, runs the model
     on the tokenized input, and returns the raw output
     """
+    generate_kwargs = self.generate_kwargs
+    if cancel_event is not None:
+      generate_kwargs = {
+        **generate_kwargs,
+        'stopping_criteria': StoppingCriteriaList([_CancelledCriteria(cancel_event)]),
+      }
+
     with Halo(text=f"{self.bot_name} is thinking...", spinner='dots', stream=halo_stream()):
       input_tensor = input_tensor.to(self.device)
-      return self.model.generate(input_tensor, **self.generate_kwargs)
+      return self.model.generate(input_tensor, **generate_kwargs)
 
   @abstractmethod
   def _format_model_input(self, chat_history: list[Message]) -> str:
@@ -135,3 +160,13 @@ class ConversationModel(ABC):
   def _decode_text(self, tensor: torch.Tensor) -> str:
     """Generate text from Pytorch tensor"""
     return self.tokenizer.decode(tensor, skip_special_tokens=True)
+
+
+class _CancelledCriteria(StoppingCriteria):
+  """Stops generation once the event is set"""
+
+  def __init__(self, cancel_event: threading.Event):
+    self.cancel_event = cancel_event
+
+  def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+    return self.cancel_event.is_set()
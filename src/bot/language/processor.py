@@ -2,12 +2,15 @@ import argparse
 import json
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from bot import DEFAULT_BOT_NAME, LOGS_DIR
 from bot import logger as root_logger
 from bot.common.logging import numbered_file_handler
 from bot.common.main import init
+from bot.common.perf import timed_fn
 from bot.language.assistant.executor import Executor
 from bot.language.conversation.utils import load_model
 from bot.language.io import ConsoleIOHandler, IOHandler
@@ -33,13 +36,16 @@ class LanguageProcessor:
       assistant_model_kwargs: Optional[dict] = None,
       conversation_model_name = DEFAULT_MODEL_NAME,
       conversation_model_kwargs: Optional[dict] = None,
+      speculative: bool = False,
   ):
     if io_handler is None:
       self.io_handler = ConsoleIOHandler(bot_name)
     else:
       self.io_handler = io_handler
 
-    self.assistant_model = Executor(bot_name=bot_name, **(assistant_model_kwargs or {}))
+    # Responses from intent handlers that missed their deadline are sent as follow-ups
+    assistant_model_kwargs = {'follow_up': self.io_handler.send, **(assistant_model_kwargs or {})}
+    self.assistant_model = Executor(bot_name=bot_name, **assistant_model_kwargs)
 
     self.conversation_model = load_model(
       conversation_model_name,
@@ -47,6 +53,11 @@ class LanguageProcessor:
       **(conversation_model_kwargs or {}),
     )
 
+    # In speculative mode, the conversation model generates a response while the assistant
+    # parses and handles the input. One worker keeps generations from overlapping each other.
+    self.speculative = speculative
+    self.conversation_pool = ThreadPoolExecutor(max_workers=1) if speculative else None
+
     logger.debug(f'Initialized LanguageProcessor with {self.io_handler.__class__.__name__}')
 
   def start(self) -> None:
@@ -59,9 +70,40 @@ class LanguageProcessor:
     Conducts a single round of conversation between the conversation model and the IO handler
     """
     input_text = self.io_handler.receive()
+    self.io_handler.send(self.respond(input_text))
+
+  @timed_fn
+  def respond(self, input_text: str) -> str:
+    """
+    Returns the assistant's response to the user input, or the conversation model's response if
+    the assistant didn't handle it
+    """
+    if self.speculative:
+      return self._converse_speculatively(input_text)
     output_text = self.assistant_model.converse(input_text)
-    output_text = output_text or self.conversation_model.converse(input_text)
-    self.io_handler.send(output_text)
+    return output_text or self.conversation_model.converse(input_text)
+
+  def _converse_speculatively(self, input_text: str) -> str:
+    """
+    Runs the assistant and the conversation model concurrently. The assistant's response is used
+    if it handled the input, in which case the conversation response is cancelled and discarded.
+    The chat history is only updated once the conversation response has been chosen.
+    """
+    cancel_event = threading.Event()
+    conversation_future = self.conversation_pool.submit(
+      self.conversation_model.respond, input_text, cancel_event)
+
+    # The conversation model shows its own spinner, and both writing to the stream at once
+    # garbles it
+    output_text = self.assistant_model.converse(input_text, spinner=False)
+    if output_text:
+      cancel_event.set()
+      conversation_future.cancel()
+      return output_text
+
+    output_text = conversation_future.result()
+    self.conversation_model.record_exchange(input_text, output_text)
+    return output_text
 
 
 def main():
@@ -80,6 +122,9 @@ def main():
   parser.add_argument('-c', '--conversation-model-name', default=DEFAULT_MODEL_NAME)
   parser.add_argument(
     '--conversation-model-args', dest='conversation_model_kwargs', type=json.loads, default={})
+  parser.add_argument(
+    '-s', '--speculative', action='store_true',
+    help='run the assistant and conversation model concurrently for each input')
   args = vars(parser.parse_args())
 
   io_handler = None
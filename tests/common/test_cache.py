@@ -0,0 +1,71 @@
+from bot.common.cache import CacheStats, LRUCache, TTLCache
+from tests import EchoTestCase
+
+
+class LRUCacheTestCase(EchoTestCase):
+  def test_evicts_least_recently_used(self) -> None:
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    self.assertEqual(cache.get('a'), 1)
+    cache.put('c', 3)
+    self.assertIsNone(cache.get('b'))
+    self.assertEqual(cache.get('a'), 1)
+    self.assertEqual(cache.get('c'), 3)
+    self.assertEqual(len(cache), 2)
+
+  def test_disabled(self) -> None:
+    cache = LRUCache(0)
+    cache.put('a', 1)
+    self.assertIsNone(cache.get('a'))
+
+  def test_clear(self) -> None:
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.clear()
+    self.assertEqual(cache.get('a', 'default'), 'default')
+
+
+class TTLCacheTestCase(EchoTestCase):
+  def setUp(self) -> None:
+    self.now = 0.0
+    self.cache = TTLCache(5.0, clock=lambda: self.now)
+
+  def test_expires(self) -> None:
+    self.cache.put('a', 1)
+    self.cache.put('b', 2, ttl=10.0)
+    self.now = 4.9
+    self.assertEqual(self.cache.get('a'), 1)
+    self.now = 5.0
+    self.assertIsNone(self.cache.get('a'))
+    self.assertEqual(self.cache.get('b'), 2)
+    self.assertEqual(len(self.cache), 1)
+
+  def test_falsy_values(self) -> None:
+    self.cache.put('a', None)
+    self.assertIsNone(self.cache.get('a', 'default'))
+    self.assertEqual(self.cache.get('b', 'default'), 'default')
+
+  def test_invalidate(self) -> None:
+    self.cache.put('a', 1)
+    self.cache.put('b', 2)
+    self.cache.put('c', 3)
+    self.cache.invalidate('a', 'b', 'missing')
+    self.assertIsNone(self.cache.get('a'))
+    self.assertEqual(self.cache.get('c'), 3)
+    self.cache.clear()
+    self.assertEqual(len(self.cache), 0)
+
+
+class CacheStatsTestCase(EchoTestCase):
+  def test_stats(self) -> None:
+    stats = CacheStats()
+    self.assertEqual(stats.hit_rate, 0.0)
+    self.assertEqual(stats.time_saved, 0.0)
+
+    stats.record_miss(0.5)
+    stats.record_miss(1.5)
+    stats.record_hit(0.25)
+    stats.record_hit(0.25)
+    self.assertEqual(stats.hit_rate, 0.5)
+    self.assertEqual(stats.time_saved, 1.5)
@@ -0,0 +1,34 @@
+import asyncio
+
+from bot.common.event_loop import EventLoopThread, run_sync
+from tests import EchoTestCase
+
+
+class EventLoopThreadTestCase(EchoTestCase):
+  def setUp(self):
+    self.event_loop = EventLoopThread()
+
+  def tearDown(self):
+    self.event_loop.stop()
+
+  def test_run(self) -> None:
+    async def add(a: int, b: int) -> int:
+      await asyncio.sleep(0)
+      return a + b
+
+    self.assertEqual(self.event_loop.run(add(1, 2)), 3)
+    self.assertEqual(run_sync(add(3, 4), self.event_loop.loop), 7)
+
+  def test_concurrent(self) -> None:
+    async def gather_sleeps() -> float:
+      start = self.event_loop.loop.time()
+      await asyncio.gather(*(asyncio.sleep(0.1) for _ in range(5)))
+      return self.event_loop.loop.time() - start
+
+    self.assertLess(self.event_loop.run(gather_sleeps()), 0.4)
+
+  def test_stop_cancels_tasks(self) -> None:
+    future = self.event_loop.submit(asyncio.sleep(60))
+    self.event_loop.stop()
+    self.assertTrue(future.cancelled())
+    self.assertTrue(self.event_loop.loop.is_closed())
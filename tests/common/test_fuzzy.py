@@ -0,0 +1,50 @@
+from difflib import SequenceMatcher
+
+from bot.common.fuzzy import FuzzyIndex, best_match, ngrams
+from bot.common.fuzzy_bench import bench
+from tests import EchoTestCase
+
+PLAYLISTS = ['Workshop', 'Discover Weekly', 'Release Radar', 'Workout Mix', 'Chill Vibes']
+
+
+class FuzzyIndexTestCase(EchoTestCase):
+  def test_ngrams(self) -> None:
+    self.assertEqual(ngrams('Hi!'), {'  h', ' hi', 'hi '})
+    self.assertEqual(ngrams('a  B'), ngrams('A, b'))
+
+  def test_scores(self) -> None:
+    index = FuzzyIndex(PLAYLISTS)
+    scores = index.scores('workshop')
+    self.assertEqual(scores[0], 1.0)
+    self.assertTrue(all(0.0 <= score < 1.0 for score in scores[1:]))
+    self.assertEqual(list(FuzzyIndex(PLAYLISTS).scores('xyz')), [0.0] * len(PLAYLISTS))
+
+  def test_top_k(self) -> None:
+    index = FuzzyIndex(PLAYLISTS)
+    top = index.top_k('work out mix', 2)
+    self.assertEqual([i for i, _ in top], [3, 0])
+    self.assertGreater(top[0][1], top[1][1])
+    self.assertEqual(len(index.top_k('work', 10)), len(PLAYLISTS))
+    self.assertEqual(FuzzyIndex([]).top_k('work'), [])
+
+    # Ties keep candidate order
+    self.assertEqual([i for i, _ in FuzzyIndex(['a', 'b', 'a']).top_k('a', 2)], [0, 2])
+
+  def test_top_k_ties(self) -> None:
+    index = FuzzyIndex(['xyz'] * 10 + ['abc'] * 40)
+    self.assertEqual(index.best('abc'), (10, 1.0))
+    self.assertEqual([i for i, _ in index.top_k('abc', 3)], [10, 11, 12])
+    self.assertEqual([i for i, _ in index.top_k('xyz', 12)], list(range(10)) + [10, 11])
+
+  def test_matches_sequence_matcher(self) -> None:
+    for query in ('discover weekly', 'release radar', 'chill', 'workout'):
+      ratios = [SequenceMatcher(None, query.lower(), p.lower()).ratio() for p in PLAYLISTS]
+      self.assertEqual(
+        best_match(query, PLAYLISTS)[0], max(range(len(PLAYLISTS)), key=ratios.__getitem__))
+    self.assertIsNone(best_match('anything', []))
+
+  def test_bench(self) -> None:
+    results = bench([10, 50], queries=3)
+    self.assertEqual([result['candidates'] for result in results], [10, 50])
+    self.assertEqual(results[0]['fuzzy_index']['top1_accuracy'], 1.0)
+    self.assertIn('p50', results[1]['sequence_matcher']['latency_ms'])
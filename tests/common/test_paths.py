@@ -2,7 +2,8 @@ import os
 import shutil
 import tempfile
 
-from bot.common.paths import find_latest_numbered_entry
+from bot.common.paths import (directory_fingerprint, directory_signature,
+                              find_latest_numbered_entry)
 from tests import EchoTestCase
 
 
@@ -28,3 +29,21 @@ class PathsTestCase(EchoTestCase):
   def test_find_latest_numbered_entry_gap(self) -> None:
     id = find_latest_numbered_entry(self.dir, r'^(\d+).log$')
     self.assertEqual(id, 3)
+
+  def test_directory_fingerprint(self) -> None:
+    fingerprint = directory_fingerprint(self.dir)
+    self.assertEqual(directory_fingerprint(self.dir), fingerprint)
+
+    with open(os.path.join(self.dir, 'README.txt'), 'w') as f:
+      f.write('changed')
+    self.assertNotEqual(directory_fingerprint(self.dir), fingerprint)
+
+  def test_directory_signature(self) -> None:
+    signature = directory_signature(self.dir)
+    self.assertEqual(len(signature), 5)
+    self.assertEqual(directory_signature(self.dir), signature)
+
+    with open(os.path.join(self.dir, 'README.txt'), 'w') as f:
+      f.write('changed')
+    self.assertNotEqual(directory_signature(self.dir), signature)
+    self.assertIsNone(directory_signature(os.path.join(self.dir, 'missing')))
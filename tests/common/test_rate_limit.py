@@ -0,0 +1,47 @@
+import asyncio
+
+from bot.common.rate_limit import TokenBucket, backoff_delay
+from tests import EchoTestCase
+
+
+class TokenBucketTestCase(EchoTestCase):
+  def setUp(self) -> None:
+    self.now = 0.0
+    self.bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: self.now)
+
+  def test_reserve(self) -> None:
+    self.assertEqual(self.bucket.reserve(), 0.0)
+    self.assertEqual(self.bucket.reserve(), 0.0)
+    # Later callers wait for tokens in order
+    self.assertEqual(self.bucket.reserve(), 0.5)
+    self.assertEqual(self.bucket.reserve(), 1.0)
+
+    self.now = 10.0
+    # Refills up to capacity
+    self.assertEqual(self.bucket.reserve(), 0.0)
+    self.assertEqual(self.bucket.reserve(), 0.0)
+    self.assertEqual(self.bucket.reserve(), 0.5)
+
+  def test_pause(self) -> None:
+    self.bucket.pause(3.0)
+    self.bucket.pause(1.0)
+    self.assertEqual(self.bucket.reserve(), 3.0)
+
+  def test_acquire(self) -> None:
+    bucket = TokenBucket(rate=100.0, capacity=1)
+
+    async def acquire_all() -> list[float]:
+      return await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+
+    waits = asyncio.run(acquire_all())
+    self.assertEqual(waits[0], 0.0)
+    self.assertGreater(waits[2], waits[1])
+    self.assertGreaterEqual(waits[2], 0.015)
+
+
+class BackoffDelayTestCase(EchoTestCase):
+  def test_backoff_delay(self) -> None:
+    for attempt in range(10):
+      delay = backoff_delay(attempt, base=0.5, cap=4.0)
+      self.assertGreaterEqual(delay, 0.0)
+      self.assertLessEqual(delay, min(4.0, 0.5 * 2 ** attempt))
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+
+from bot.common.rate_limit import TokenBucket
+from bot.language.assistant.intents.fake_spotify import FakeSpotifyServer
+from bot.language.assistant.intents.music import MusicHandler
+from bot.language.assistant.intents.spotify_client import RateLimitStats, SpotifyClient
+from bot.language.assistant.intents.spotify_library import SpotifyLibraryIndex
+from tests import EchoTestCase
+
+
+class FakeSpotifyServerTestCase(EchoTestCase):
+  def setUp(self):
+    self.loop = asyncio.new_event_loop()
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.stats = RateLimitStats()
+
+  def tearDown(self):
+    self.loop.run_until_complete(self.client.close())
+    self.loop.run_until_complete(self.server.stop())
+    self.loop.close()
+    self.tmp_dir.cleanup()
+
+  def create_handler(self, server: FakeSpotifyServer) -> MusicHandler:
+    self.server = server
+    url = self.loop.run_until_complete(server.start())
+
+    async def create_client() -> SpotifyClient:
+      return SpotifyClient(
+        'id', 'secret', token='token', budget=TokenBucket(1000.0, 1000), stats=self.stats,
+        api_url=url)
+    self.client = self.loop.run_until_complete(create_client())
+
+    library = SpotifyLibraryIndex(os.path.join(self.tmp_dir.name, 'library.json'))
+    return MusicHandler(loop=self.loop, client=self.client, library=library)
+
+  def test_commands(self):
+    handler = self.create_handler(FakeSpotifyServer())
+    self.assertEqual(handler.user['id'], 'fake-user')
+
+    response = handler.run(handler.raise_volume())
+    self.assertEqual(response, 'I set the volume to 70 percent')
+    self.assertEqual(self.server.player['device']['volume_percent'], 70)
+
+    response = handler.run(handler.switch_device('kitchen'))
+    self.assertEqual(self.server.player['device']['id'], 'kitchen')
+
+    handler.run(handler.library.refresh(self.client))
+    self.assertEqual(len(handler.library.playlists), 120)
+    response = handler.run(handler.play_playlist('Workshop'))
+    self.assertEqual(response, 'Playing the playlist "Workshop" on Spotify')
+    self.assertEqual(self.server.requests[('GET', '/v1/search')], 0)
+    self.assertTrue(self.server.player['is_playing'])
+
+  def test_injected_errors(self):
+    handler = self.create_handler(FakeSpotifyServer(error_rate=0.3))
+    for _ in range(10):
+      handler.run(handler.pause_music())
+    self.assertFalse(self.server.player['is_playing'])
+    self.assertGreater(self.server.injected_errors[503], 0)
+    self.assertEqual(self.stats.retries, self.server.injected_errors[503])
+
+  def test_rate_limit(self):
+    handler = self.create_handler(FakeSpotifyServer(rate_limit=3))
+
+    async def pause_all():
+      await asyncio.gather(*(handler.pause_music() for _ in range(5)))
+    self.loop.run_until_complete(pause_all())
+    self.assertGreater(self.server.injected_errors[429], 0)
+    self.assertEqual(self.stats.throttled, self.server.injected_errors[429])
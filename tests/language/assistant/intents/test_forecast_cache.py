@@ -0,0 +1,47 @@
+from datetime import date
+
+from bot.language.assistant.intents.forecast_cache import (ALMANAC_QUERY, ALMANAC_TTL,
+                                                           FORECAST_TTL, HISTORICAL_QUERY,
+                                                           ForecastCache)
+from tests import EchoTestCase
+
+GEOCODE = '37.779,-122.42'
+HISTORICAL = {
+  'validTimeLocal': ['2023-02-11T07:00:00-0800', '2023-02-10T07:00:00-0800'],
+  'temperatureMax': [54, 55],
+  'temperatureMin': [42, 41],
+  'rain24Hour': [0.03, 0.0],
+  'snow24Hour': [0.0, 0.0],
+}
+ALMANAC = {
+  'almanacRecordDate': ['0211', '0212'],
+  'temperatureAverageMax': [59, 60],
+  'temperatureAverageMin': [44, 45],
+}
+
+
+class ForecastCacheTestCase(EchoTestCase):
+  def setUp(self):
+    self.now = 0.0
+    self.cache = ForecastCache(clock=lambda: self.now)
+
+  def test_covered_dates(self):
+    series = self.cache.put(HISTORICAL_QUERY, GEOCODE, HISTORICAL)
+    self.assertIs(self.cache.get(HISTORICAL_QUERY, GEOCODE, [date(2023, 2, 11)]), series)
+    self.assertIs(
+      self.cache.get(HISTORICAL_QUERY, GEOCODE, [date(2023, 2, 10), date(2023, 2, 11)]), series)
+    self.assertIsNone(self.cache.get(HISTORICAL_QUERY, GEOCODE, [date(2023, 2, 12)]))
+    self.assertIsNone(self.cache.get(HISTORICAL_QUERY, '0,0', [date(2023, 2, 11)]))
+
+    series = self.cache.put(ALMANAC_QUERY, GEOCODE, ALMANAC)
+    # Almanac records are averages over past years, so they cover the date in any year
+    self.assertIs(self.cache.get(ALMANAC_QUERY, GEOCODE, [date(2024, 2, 12)]), series)
+
+  def test_expiry(self):
+    self.cache.put(HISTORICAL_QUERY, GEOCODE, HISTORICAL)
+    self.cache.put(ALMANAC_QUERY, GEOCODE, ALMANAC)
+    self.now = FORECAST_TTL * 2
+    self.assertIsNone(self.cache.get(HISTORICAL_QUERY, GEOCODE, [date(2023, 2, 11)]))
+    self.assertIsNotNone(self.cache.get(ALMANAC_QUERY, GEOCODE, [date(2023, 2, 11)]))
+    self.now = ALMANAC_TTL
+    self.assertIsNone(self.cache.get(ALMANAC_QUERY, GEOCODE, [date(2023, 2, 11)]))
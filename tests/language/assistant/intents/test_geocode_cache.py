@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+from bot.language.assistant.intents.geocode_cache import GeocodeCache, normalize_query
+from tests import EchoTestCase
+
+SAN_FRANCISCO = ('San Francisco', 37.779, -122.42)
+
+
+class GeocodeCacheTestCase(EchoTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.tmp_dir.name, 'weather', 'geocode.sqlite3')
+    self.cache = GeocodeCache(self.path)
+
+  def tearDown(self):
+    self.cache.close()
+    self.tmp_dir.cleanup()
+
+  def test_normalize_query(self):
+    self.assertEqual(normalize_query('  San   FRANCISCO '), 'san francisco')
+
+  def test_get_put(self):
+    self.assertIsNone(self.cache.get('San Francisco', 'en-US'))
+    self.cache.put('San Francisco', 'en-US', SAN_FRANCISCO)
+    self.assertEqual(self.cache.get('san francisco', 'en-US'), SAN_FRANCISCO)
+    self.assertIsNone(self.cache.get('San Francisco', 'fr-FR'))
+
+  def test_persistence(self):
+    self.cache.put('San Francisco', 'en-US', SAN_FRANCISCO)
+    reopened = GeocodeCache(self.path)
+    self.assertEqual(reopened.entries, {('san francisco', 'en-US'): SAN_FRANCISCO})
+    reopened.close()
+
+  def test_shared(self):
+    # Entries added by another process after the cache was opened are read on a miss
+    other = GeocodeCache(self.path)
+    other.put('Oakland', 'en-US', ('Oakland', 37.8, -122.27))
+    other.close()
+    self.assertEqual(self.cache.get('Oakland', 'en-US'), ('Oakland', 37.8, -122.27))
+
+  def test_unusable_database(self):
+    path = os.path.join(self.tmp_dir.name, 'directory')
+    os.makedirs(path)
+    cache = GeocodeCache(path)
+    self.assertIsNone(cache.connection)
+    cache.put('San Francisco', 'en-US', SAN_FRANCISCO)
+    self.assertEqual(cache.get('San Francisco', 'en-US'), SAN_FRANCISCO)
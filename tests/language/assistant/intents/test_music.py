@@ -1,9 +1,14 @@
+import asyncio
+import os
+import tempfile
 import time
 import unittest
+import unittest.mock
 
 import vcr
 
 from bot.language.assistant.intents.music import MusicHandler
+from bot.language.assistant.intents.spotify_library import SpotifyLibraryIndex
 from tests import EchoTestCase, VCR_RECORD_MODE
 
 
@@ -45,64 +50,226 @@ class MusicHandlerTestCase(EchoTestCase):
   @vcr.use_cassette('fixtures/music/play_playlist.yml', record_mode=VCR_RECORD_MODE)
   def test_play_playlist(self):
     handler = MusicHandler()
-    response = handler.play_playlist('Workshop')
+    response = handler.run(handler.play_playlist('Workshop'))
     self.assertEqual(response, 'Playing the playlist "Workshop" on Spotify')
 
   @vcr.use_cassette('fixtures/music/play_artist_radio.yml', record_mode=VCR_RECORD_MODE)
   def test_play_artist_radio(self):
     handler = MusicHandler()
-    response = handler.play_artist_radio('Childish Gambino')
+    response = handler.run(handler.play_artist_radio('Childish Gambino'))
     self.assertEqual(response, 'Playing the playlist "This Is Childish Gambino" on Spotify')
 
   @vcr.use_cassette('fixtures/music/controls.yml', record_mode=VCR_RECORD_MODE)
   def test_controls(self):
     handler = MusicHandler()
 
-    response = handler.play_track('Forget Me Nots', 'Patrice Rushen')
+    response = handler.run(handler.play_track('Forget Me Nots', 'Patrice Rushen'))
     self.assertEqual(response, 'Playing the track Forget Me Nots by Patrice Rushen on Spotify')
 
     time.sleep(0.5)
-    response = handler.pause_music()
+    response = handler.run(handler.pause_music())
     self.assertEqual(response, 'I paused the music')
 
     time.sleep(0.5)
-    response = handler.resume_music()
+    response = handler.run(handler.resume_music())
     self.assertEqual(response, "I've resumed the music")
 
     time.sleep(0.5)
-    response = handler.lower_volume()
+    response = handler.run(handler.lower_volume())
     self.assertRegex(response, r'I set the volume to \d+ percent')
 
     time.sleep(0.5)
-    response = handler.raise_volume()
+    response = handler.run(handler.raise_volume())
     self.assertRegex(response, r'I set the volume to \d+ percent')
 
     time.sleep(0.5)
-    response = handler.switch_device('any')
+    response = handler.run(handler.switch_device('any'))
     self.assertRegex(response, r'I transferred the music playback.*')
 
   @vcr.use_cassette('fixtures/music/multi_track_controls.yml', record_mode=VCR_RECORD_MODE)
   def test_multi_track_controls(self):
     handler = MusicHandler()
 
-    response = handler.play_artist_radio('Childish Gambino')
+    response = handler.run(handler.play_artist_radio('Childish Gambino'))
 
     time.sleep(0.5)
-    response = handler.play_next_track()
+    response = handler.run(handler.play_next_track())
     self.assertEqual(response, 'Started playing the next track')
 
     time.sleep(0.5)
-    response = handler.play_previous_track()
+    response = handler.run(handler.play_previous_track())
     self.assertEqual(response, 'Started playing the previous track')
 
     time.sleep(0.5)
-    response = handler.queue_track('Before I Let Go', 'Maze')
+    response = handler.run(handler.queue_track('Before I Let Go', 'Maze'))
     self.assertEqual(response, 'Queueing the track Before I Let Go by Maze on Spotify')
 
     time.sleep(0.5)
-    response = handler.toggle_shuffle()
+    response = handler.run(handler.toggle_shuffle())
     self.assertRegex(response, r'I (enabled|disabled) playback shuffle')
 
     time.sleep(0.5)
-    response = handler.toggle_repeat()
+    response = handler.run(handler.toggle_repeat())
     self.assertRegex(response, r'I (enabled|disabled) playback repeat')
+
+
+class FakeSpotifyClient:
+  """Records calls to the subset of spotify.HTTPClient used by MusicHandler. Every call goes
+  through request, which takes `latency` seconds."""
+
+  def __init__(self, latency: float = 0.0):
+    self.calls = []
+    self.volume = 50
+    self.latency = latency
+
+  async def request(self, name: str) -> None:
+    self.calls.append(name)
+    await asyncio.sleep(self.latency)
+
+  async def current_user(self) -> dict:
+    await self.request('current_user')
+    return {'id': 'user', 'display_name': 'User'}
+
+  async def current_player(self) -> dict:
+    await self.request('current_player')
+    return {
+      'device': {'id': '1', 'name': 'Laptop', 'volume_percent': self.volume},
+      'shuffle_state': False,
+      'repeat_state': 'off',
+      'is_playing': True,
+    }
+
+  async def available_devices(self) -> dict:
+    await self.request('available_devices')
+    return {'devices': [
+      {'id': '1', 'name': 'Laptop', 'volume_percent': self.volume},
+      {'id': '2', 'name': 'Kitchen Speaker', 'volume_percent': 30},
+    ]}
+
+  async def set_playback_volume(self, volume: int) -> None:
+    await self.request('set_playback_volume')
+    self.volume = volume
+
+  async def transfer_player(self, device_id: str, play: bool = False) -> None:
+    await self.request('transfer_player')
+
+  async def shuffle_playback(self, state: bool) -> None:
+    await self.request('shuffle_playback')
+
+  async def repeat_playback(self, state: str) -> None:
+    await self.request('repeat_playback')
+
+  async def play_playback(self, uris, device_id: str = None) -> None:
+    await self.request('play_playback')
+
+  async def search(self, query: str, query_type: str = 'track') -> dict:
+    await self.request('search')
+    return {
+      'playlists': {'items': [
+        {'name': 'Jazz Classics', 'uri': 'spotify:playlist:1'},
+        {'name': 'Workshop Jazz', 'uri': 'spotify:playlist:2'},
+      ]},
+      'tracks': {'items': [
+        {'name': 'Before I Let Go', 'uri': 'spotify:track:1', 'artists': [{'name': 'Maze'}]},
+      ]},
+    }
+
+
+class MusicHandlerStateCacheTestCase(EchoTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    library = SpotifyLibraryIndex(os.path.join(self.tmp_dir.name, 'library.json'))
+    library.playlists = [{'id': 'w', 'name': 'Workshop', 'uri': 'spotify:playlist:w'}]
+    library.tracks = [{'id': 't', 'name': 'Forget Me Nots', 'uri': 'spotify:track:t',
+                       'artists': ['Patrice Rushen']}]
+    library.refreshed_at = time.time() # Don't refresh in the background
+    library.save()
+    library.load()
+
+    self.handler = MusicHandler(
+      loop=asyncio.new_event_loop(), client=FakeSpotifyClient(), library=library)
+    self.handler.client.calls.clear()
+
+  def tearDown(self):
+    self.handler.loop.close()
+    self.tmp_dir.cleanup()
+
+  def test_switch_device(self):
+    response = self.handler.run(self.handler.switch_device('kitchen'))
+    self.assertEqual(response, 'I transferred the music playback to Kitchen Speaker')
+    self.assertEqual(self.handler.client.calls, ['available_devices', 'transfer_player'])
+    self.assertEqual(self.handler.state_cache_stats.hits, 1)
+
+  def test_player_state_mirror(self):
+    self.handler.run(self.handler.toggle_shuffle())
+    self.handler.run(self.handler.raise_volume())
+    response = self.handler.run(self.handler.toggle_repeat())
+    self.assertEqual(response, 'I enabled playback repeat')
+    # The player state is only fetched once, later commands only send their change
+    self.assertEqual(
+      self.handler.client.calls,
+      ['current_player', 'shuffle_playback', 'set_playback_volume', 'repeat_playback'])
+
+    response = self.handler.run(self.handler.lower_volume())
+    self.assertEqual(response, 'I set the volume to 50 percent')
+    self.assertEqual(
+      self.handler.player.pending,
+      {path: (value, unittest.mock.ANY) for path, value in [
+        ('shuffle_state', True), ('repeat_state', 'context'), ('device.volume_percent', 50)]})
+
+  def test_player_state_mirror_failure(self):
+    async def fail(*_):
+      raise RuntimeError('Request failed')
+
+    self.handler.run(self.handler.raise_volume())
+    self.handler.client.shuffle_playback = fail
+    with self.assertRaises(RuntimeError):
+      self.handler.run(self.handler.toggle_shuffle())
+    # The state is fetched again since the request may or may not have taken effect
+    self.assertFalse(self.handler.player.is_fresh())
+    self.handler.run(self.handler.raise_volume())
+    self.assertEqual(self.handler.client.calls.count('current_player'), 2)
+
+  def test_handle_async(self):
+    intent = {'intent': {'intentName': 'switch_music_device'}, 'slots': []}
+    self.handler.player.replace({'device': {}}, self.handler.player.clock())
+    self.handler.state_cache.put('devices', [{'id': '1', 'name': 'Laptop', 'volume_percent': 0}])
+    with self.assertLogs('bot.language.assistant.intents.music', 'DEBUG') as logs:
+      response = self.handler.run(self.handler.handle_async(intent))
+    self.assertEqual(response, 'I transferred the music playback')
+    self.assertIn('saved 2 round trips for switch_music_device', '\n'.join(logs.output))
+
+  def test_library_index(self):
+    response = self.handler.run(self.handler.play_playlist('workshop', 'Laptop'))
+    self.assertEqual(response, 'Playing the playlist "Workshop" on Spotify')
+    response = self.handler.run(self.handler.play_track('forget me nots', 'patrice rushen'))
+    self.assertEqual(response, 'Playing the track Forget Me Nots by Patrice Rushen on Spotify')
+    # Names were resolved without searching
+    self.assertEqual(
+      self.handler.client.calls,
+      ['available_devices', 'play_playback', 'current_player', 'play_playback'])
+
+    # Falls back to search for playlists that aren't in the user's library
+    response = self.handler.run(self.handler.play_playlist('Jazz Classics'))
+    self.assertEqual(response, 'Playing the playlist "Jazz Classics" on Spotify')
+    self.assertIn('search', self.handler.client.calls)
+
+  def test_concurrent_requests(self):
+    self.handler.client.latency = 0.1
+    intent = {
+      'intent': {'intentName': 'play_track'},
+      'slots': [
+        {'slotName': 'track', 'value': {'value': 'Before I Let Go'}},
+        {'slotName': 'device', 'value': {'value': 'kitchen'}},
+      ],
+    }
+    with self.assertLogs('bot.language.assistant.intents.music', 'DEBUG') as logs:
+      start = time.perf_counter()
+      response = self.handler.run(self.handler.handle_async(intent))
+      elapsed = time.perf_counter() - start
+    self.assertEqual(response, 'Playing the track Before I Let Go by Maze on Spotify')
+    # The search and device lookup run at the same time, then the track is played
+    self.assertEqual(
+      sorted(self.handler.client.calls), ['available_devices', 'play_playback', 'search'])
+    self.assertLess(elapsed, 0.25)
+    self.assertIn('with 3 Spotify round trips', '\n'.join(logs.output))
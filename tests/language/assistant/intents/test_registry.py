@@ -0,0 +1,88 @@
+import threading
+
+from bot.language.assistant.intents import HandlerRegistry, HandlerStartingError, IntentHandler
+from tests import EchoTestCase
+
+
+class HandlerRegistryTestCase(EchoTestCase):
+  def setUp(self):
+    SlowHandler.ready.clear()
+    SlowHandler.instances = 0
+    self.registry = HandlerRegistry(init_wait=0.05)
+
+  def tearDown(self):
+    SlowHandler.ready.set()
+    self.registry.close()
+
+  def test_find(self):
+    self.registry.register(FastHandler())
+    self.registry.register(UndeclaredHandler())
+    self.assertIsInstance(self.registry.find(_intent('fast')), FastHandler)
+    self.assertIsInstance(self.registry.find(_intent('undeclared')), UndeclaredHandler)
+    self.assertIsNone(self.registry.find(_intent('unknown')))
+
+  def test_lazy_init(self):
+    self.registry.register_type(SlowHandler)
+    self.assertEqual(SlowHandler.instances, 0)
+
+    with self.assertRaises(HandlerStartingError):
+      self.registry.find(_intent('slow'))
+
+    SlowHandler.ready.set()
+    self.registry.init_wait = 5
+    handler = self.registry.find(_intent('slow'))
+    self.assertIsInstance(handler, SlowHandler)
+    self.assertIs(self.registry.find(_intent('slow')), handler)
+    self.assertEqual(SlowHandler.instances, 1)
+
+  def test_failed_init(self):
+    self.registry.register_type(BrokenHandler)
+    self.registry.init_wait = 5
+    self.assertIsNone(self.registry.find(_intent('broken')))
+
+  def test_duplicate_intent(self):
+    self.registry.register(FastHandler())
+    with self.assertRaises(ValueError):
+      self.registry.register(FastHandler())
+
+
+def _intent(intent_name: str) -> dict:
+  return {'intent': {'intentName': intent_name, 'probability': 1.0}, 'slots': []}
+
+
+class FastHandler(IntentHandler):
+  supported_intents = frozenset({'fast'})
+
+  def handle(self, intent: dict) -> str:
+    return 'fast'
+
+
+class SlowHandler(IntentHandler):
+  supported_intents = frozenset({'slow'})
+  ready = threading.Event()
+  instances = 0
+
+  def __init__(self):
+    SlowHandler.ready.wait()
+    SlowHandler.instances += 1
+
+  def handle(self, intent: dict) -> str:
+    return 'slow'
+
+
+class BrokenHandler(IntentHandler):
+  supported_intents = frozenset({'broken'})
+
+  def __init__(self):
+    raise RuntimeError('Unable to authorize')
+
+  def handle(self, intent: dict) -> str:
+    return 'broken'
+
+
+class UndeclaredHandler(IntentHandler):
+  def can_handle(self, intent: dict) -> bool:
+    return self._find_intent_name(intent) == 'undeclared'
+
+  def handle(self, intent: dict) -> str:
+    return 'undeclared'
@@ -0,0 +1,133 @@
+import asyncio
+from typing import Awaitable, Callable
+from unittest import mock
+
+import spotify
+from aiohttp import web
+
+from bot.common.rate_limit import TokenBucket
+from bot.language.assistant.intents.spotify_client import RateLimitStats, SpotifyClient
+from tests import EchoTestCase
+
+
+class ScriptedSpotifyServer:
+  """Local stand-in for the Spotify API that replies to each request with the next
+  (status, headers) pair in `script`, then with 200s"""
+
+  def __init__(self, script: list[tuple[int, dict]]):
+    self.script = list(script)
+    self.requests = []
+    self.runner = None
+    self.url = None
+
+  async def start(self) -> None:
+    app = web.Application()
+    app.router.add_route('*', '/v1/{path:.*}', self.__handle)
+    self.runner = web.AppRunner(app)
+    await self.runner.setup()
+    site = web.TCPSite(self.runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1] # pylint: disable=protected-access
+    self.url = f'http://127.0.0.1:{port}/v1'
+
+  async def stop(self) -> None:
+    await self.runner.cleanup()
+
+  async def __handle(self, request: web.Request) -> web.Response:
+    self.requests.append((request.method, request.path, request.headers.get('Authorization')))
+    status, headers = self.script.pop(0) if self.script else (200, {})
+    body = {'id': 'user'} if status == 200 else {'error': {'status': status, 'message': 'Error'}}
+    return web.json_response(body, status=status, headers=headers)
+
+
+class SpotifyClientTestCase(EchoTestCase):
+  def setUp(self):
+    self.budget = TokenBucket(rate=1000.0, capacity=10)
+    self.stats = RateLimitStats()
+
+  def run_with_server(
+      self,
+      script: list[tuple[int, dict]],
+      max_retries: int = 4,
+      request: Callable[[SpotifyClient], Awaitable] = SpotifyClient.current_user,
+  ):
+    """Makes a request (the current user by default) to a ScriptedSpotifyServer and returns the
+    server, the result (or raised exception), and the seconds taken"""
+    async def run():
+      server = ScriptedSpotifyServer(script)
+      await server.start()
+      client = SpotifyClient(
+        'id', 'secret', token='token', budget=self.budget, stats=self.stats,
+        max_retries=max_retries, api_url=server.url)
+      loop = asyncio.get_running_loop()
+      start = loop.time()
+      try:
+        result = await request(client)
+      except spotify.HTTPException as ex:
+        result = ex
+      finally:
+        await client.close()
+        await server.stop()
+      return server, result, loop.time() - start
+
+    return asyncio.run(run())
+
+  def test_request(self):
+    server, result, _ = self.run_with_server([])
+    self.assertEqual(result, {'id': 'user'})
+    self.assertEqual(server.requests, [('GET', '/v1/me', 'Bearer token')])
+    self.assertEqual(self.stats.requests, 1)
+    self.assertEqual(self.stats.to_dict()['requests'], 1)
+    self.assertNotIn('lock', self.stats.to_dict())
+
+  def test_retry_after(self):
+    server, result, seconds = self.run_with_server([(429, {'Retry-After': '0.2'})])
+    self.assertEqual(result, {'id': 'user'})
+    self.assertEqual(len(server.requests), 2)
+    self.assertGreaterEqual(seconds, 0.2)
+    self.assertEqual(self.stats.throttled, 1)
+    self.assertEqual(self.stats.retry_after_seconds, 0.2)
+    # Waiting for the pause counts as queueing for the request budget
+    self.assertEqual(self.stats.queued, 1)
+    self.assertGreaterEqual(self.stats.queue_seconds, 0.2)
+
+  @mock.patch('bot.language.assistant.intents.spotify_client.backoff_delay', return_value=0.01)
+  def test_retry_transient_errors(self, backoff_delay):
+    server, result, _ = self.run_with_server([(503, {}), (502, {})])
+    self.assertEqual(result, {'id': 'user'})
+    self.assertEqual(len(server.requests), 3)
+    self.assertEqual(self.stats.retries, 2)
+    self.assertEqual([call.args[0] for call in backoff_delay.call_args_list], [0, 1])
+
+  @mock.patch('bot.language.assistant.intents.spotify_client.backoff_delay', return_value=0.01)
+  def test_max_retries(self, _):
+    server, result, _ = self.run_with_server([(500, {})] * 3, max_retries=2)
+    self.assertIsInstance(result, spotify.HTTPException)
+    self.assertEqual(result.status, 500)
+    self.assertEqual(len(server.requests), 3)
+
+    # Client errors aren't retried
+    server, result, _ = self.run_with_server([(404, {})])
+    self.assertIsInstance(result, spotify.NotFound)
+    self.assertEqual(len(server.requests), 1)
+
+  @mock.patch('bot.language.assistant.intents.spotify_client.backoff_delay', return_value=0.01)
+  def test_no_retry_non_idempotent(self, _):
+    # Skipping may have happened before the 503, so retrying could skip twice
+    server, result, _ = self.run_with_server([(503, {})], request=SpotifyClient.skip_next)
+    self.assertIsInstance(result, spotify.HTTPException)
+    self.assertEqual(result.status, 503)
+    self.assertEqual(server.requests, [('POST', '/v1/me/player/next', 'Bearer token')])
+    self.assertEqual(self.stats.retries, 0)
+
+    # Rate limited requests weren't handled, so they are retried
+    server, result, _ = self.run_with_server(
+      [(429, {'Retry-After': '0'})], request=SpotifyClient.skip_next)
+    self.assertEqual(len(server.requests), 2)
+
+  def test_budget(self):
+    self.budget = TokenBucket(rate=10.0, capacity=1)
+    self.run_with_server([])
+    _, _, seconds = self.run_with_server([])
+    self.assertGreaterEqual(seconds, 0.05)
+    self.assertEqual(self.stats.queued, 1)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+
+from bot.language.assistant.intents.spotify_library import SpotifyLibraryIndex, normalize_name
+from tests import EchoTestCase
+
+
+def _playlist(playlist_id: str, name: str) -> dict:
+  return {'id': playlist_id, 'name': name, 'uri': f'spotify:playlist:{playlist_id}',
+          'owner': {'id': 'user'}}
+
+
+def _saved_track(track_id: str, name: str, artist: str) -> dict:
+  return {
+    'added_at': '2023-02-08T15:30:00Z',
+    'track': {'id': track_id, 'name': name, 'uri': f'spotify:track:{track_id}',
+              'artists': [{'name': artist}]},
+  }
+
+
+class FakeLibraryClient:
+  """Serves paginated playlists and saved tracks like spotify.HTTPClient"""
+
+  def __init__(self, playlists: list[dict], saved_tracks: list[dict]):
+    self.playlists = playlists
+    self.saved = saved_tracks
+    self.requests = []
+
+  async def current_playlists(self, limit: int = 20, offset: int = 0) -> dict:
+    self.requests.append(('current_playlists', offset))
+    return self.__page(self.playlists, limit, offset)
+
+  async def saved_tracks(self, limit: int = 20, offset: int = 0) -> dict:
+    self.requests.append(('saved_tracks', offset))
+    return self.__page(self.saved, limit, offset)
+
+  def __page(self, items: list[dict], limit: int, offset: int) -> dict:
+    has_next = offset + limit < len(items)
+    return {'items': items[offset:offset + limit], 'next': 'next' if has_next else None}
+
+
+class SpotifyLibraryIndexTestCase(EchoTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.tmp_dir.name, 'library.json')
+    self.client = FakeLibraryClient(
+      [_playlist(str(i), f'Playlist {i}') for i in range(60)] + [_playlist('w', 'Workshop')],
+      [_saved_track(str(i), f'Track {i}', 'Artist') for i in range(120)])
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_refresh(self):
+    index = SpotifyLibraryIndex(self.path)
+    asyncio.run(index.refresh(self.client))
+    # Every page is fetched
+    self.assertEqual(len(index.playlists), 61)
+    self.assertEqual(len(index.tracks), 120)
+    self.assertEqual(
+      [offset for name, offset in self.client.requests if name == 'saved_tracks'], [0, 50, 100])
+
+    # Only tracks saved since the last refresh are fetched
+    self.client.saved.insert(0, _saved_track('new', 'New Track', 'Artist'))
+    self.client.requests.clear()
+    asyncio.run(index.refresh(self.client))
+    self.assertEqual(
+      [offset for name, offset in self.client.requests if name == 'saved_tracks'], [0])
+    self.assertEqual(len(index.tracks), 121)
+    self.assertEqual(index.tracks[0]['id'], 'new')
+
+    # Removed tracks are dropped by a full refresh
+    del self.client.saved[1:]
+    asyncio.run(index.refresh(self.client, full=True))
+    self.assertEqual([track['id'] for track in index.tracks], ['new'])
+
+  def test_persist(self):
+    index = SpotifyLibraryIndex(self.path)
+    asyncio.run(index.refresh(self.client))
+
+    loaded = SpotifyLibraryIndex(self.path)
+    self.assertTrue(loaded.load())
+    self.assertEqual(loaded.playlists, index.playlists)
+    self.assertEqual(loaded.tracks, index.tracks)
+    self.assertEqual(loaded.find_playlist('workshop')['id'], 'w')
+
+    self.assertFalse(SpotifyLibraryIndex(os.path.join(self.tmp_dir.name, 'missing.json')).load())
+
+  def test_find(self):
+    index = SpotifyLibraryIndex(self.path)
+    asyncio.run(index.refresh(self.client))
+
+    self.assertEqual(index.find_playlist('Workshop')['id'], 'w')
+    self.assertEqual(index.find_playlist('the workshop')['id'], 'w')
+    self.assertIsNone(index.find_playlist('Something else entirely'))
+
+    self.assertEqual(index.find_track('track 7')['id'], '7')
+    self.assertEqual(index.find_track('Track 7', 'artist')['id'], '7')
+    self.assertIsNone(index.find_track('Track 7', 'Someone Else'))
+    self.assertIsNone(index.find_track('Track 700'))
+
+  def test_normalize_name(self):
+    self.assertEqual(normalize_name("Don't Stop  Me Now!"), 'dont stop me now')
@@ -0,0 +1,60 @@
+from bot.language.assistant.intents.spotify_player import PlayerStateMirror
+from tests import EchoTestCase
+
+PLAYER = {'device': {'id': '1', 'volume_percent': 50}, 'shuffle_state': False}
+
+
+class PlayerStateMirrorTestCase(EchoTestCase):
+  def setUp(self):
+    self.now = 0.0
+    self.mirror = PlayerStateMirror(max_age=60.0, grace=3.0, clock=lambda: self.now)
+
+  def test_is_fresh(self):
+    self.assertFalse(self.mirror.is_fresh())
+    self.mirror.replace(PLAYER, 0.0)
+    self.assertTrue(self.mirror.is_fresh())
+    self.now = 60.0
+    self.assertFalse(self.mirror.is_fresh())
+
+  def test_update(self):
+    # Nothing to update until the state is known
+    self.mirror.update({'shuffle_state': True})
+    self.assertEqual(self.mirror.state, {})
+
+    self.mirror.replace(PLAYER, 0.0)
+    self.mirror.update({'device.volume_percent': 70})
+    self.assertEqual(self.mirror.state['device'], {'id': '1', 'volume_percent': 70})
+    self.assertEqual(PLAYER['device']['volume_percent'], 50)
+
+    # A state fetched before Spotify applied the change keeps it
+    self.now = 1.0
+    self.mirror.replace(PLAYER, 1.0)
+    self.assertEqual(self.mirror.state['device']['volume_percent'], 70)
+    self.assertIn('device.volume_percent', self.mirror.pending)
+
+    # A state with the change confirms it
+    self.mirror.replace({**PLAYER, 'device': {'id': '1', 'volume_percent': 70}}, 2.0)
+    self.assertEqual(self.mirror.pending, {})
+    self.assertEqual(self.mirror.conflicts, 0)
+
+  def test_conflict(self):
+    self.mirror.replace(PLAYER, 0.0)
+    self.mirror.update({'shuffle_state': True})
+    self.now = 10.0
+    # Changed back elsewhere after our update
+    self.mirror.replace(PLAYER, 10.0)
+    self.assertFalse(self.mirror.state['shuffle_state'])
+    self.assertEqual(self.mirror.conflicts, 1)
+    self.assertEqual(self.mirror.pending, {})
+
+  def test_outdated_state(self):
+    self.mirror.replace(PLAYER, 5.0)
+    self.mirror.replace({}, 4.0)
+    self.assertEqual(self.mirror.state, PLAYER)
+
+    self.now = 6.0
+    self.mirror.invalidate()
+    self.mirror.replace(PLAYER, 5.5)
+    self.assertFalse(self.mirror.is_fresh())
+    self.mirror.replace(PLAYER, 6.0)
+    self.assertTrue(self.mirror.is_fresh())
@@ -1,15 +1,21 @@
+import os
+import tempfile
 import unittest
+import unittest.mock
 from datetime import datetime, time, timedelta, timezone
 
 import vcr
 
-from bot.language.assistant.intents.weather import Direction, MoonPhase, PrecipitationType, Weather, WeatherHandler
+from bot.language.assistant.intents.geocode_cache import GeocodeCache
+from bot.language.assistant.intents.weather import Direction, MoonPhase, PrecipitationType, Weather, WeatherHandler, WeatherQuery
 from tests import EchoTestCase, VCR_RECORD_MODE
 
 
 class WeatherHandlerTestCase(EchoTestCase):
   def setUp(self):
-    self.handler = WeatherHandler()
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.geocode_cache = GeocodeCache(os.path.join(self.tmp_dir.name, 'geocode.sqlite3'))
+    self.handler = WeatherHandler(geocode_cache=self.geocode_cache)
     self.city = 'San Francisco'
     self.latitude = 37.779
     self.longitude = -122.42
@@ -41,6 +47,44 @@ class WeatherHandlerTestCase(EchoTestCase):
       ],
     }
 
+  def tearDown(self):
+    self.geocode_cache.close()
+    self.tmp_dir.cleanup()
+
+  def test_fetch_city_metadata_cached(self):
+    location = (self.city, self.latitude, self.longitude)
+    with unittest.mock.patch.object(
+        self.handler, '_request_cities_metadata', return_value={self.city: location}) as request:
+      self.assertEqual(self.handler.fetch_city_metadata('San Francisco'), location)
+      self.assertEqual(self.handler.fetch_city_metadata('san  francisco'), location)
+      request.assert_called_once_with(['San Francisco'])
+    self.assertEqual(self.handler.geocode_stats.hits, 1)
+
+  def test_fetch_cities_metadata_batched(self):
+    self.geocode_cache.put(self.city, 'en-US', (self.city, self.latitude, self.longitude))
+    # Responses are keyed by params rather than listed in the order they were queried
+    response_data = {
+      'getSunV3LocationSearchUrlConfig': {
+        f'language:en-US;locationType:locale;query:{city}': {
+          'status': 200,
+          'data': {'location': {'city': [city], 'latitude': [lat], 'longitude': [lon]}},
+        }
+        for city, lat, lon in [('Boston', 42.36, -71.06), ('Denver', 39.74, -104.98)]
+      },
+    }
+    with unittest.mock.patch.object(
+        self.handler, '_post_queries', return_value=response_data) as post:
+      locations = self.handler.fetch_cities_metadata(['Denver', self.city, 'Boston', 'Denver'])
+    post.assert_called_once()
+    self.assertEqual(
+      [query['params']['query'] for query in post.call_args.args[0]], ['Denver', 'Boston'])
+    self.assertEqual(locations, [
+      ('Denver', 39.74, -104.98),
+      (self.city, self.latitude, self.longitude),
+      ('Boston', 42.36, -71.06),
+      ('Denver', 39.74, -104.98),
+    ])
+
   def test_can_handle(self):
     self.assertTrue(self.handler.can_handle(self.intent))
     self.intent['intent']['intentName'] = 'not_weather'
@@ -70,6 +114,109 @@ class WeatherHandlerTestCase(EchoTestCase):
     )
     self.assertEqual(weather, expected_weather)
 
+  @vcr.use_cassette('fixtures/weather/fetch_weather_today.yml', record_mode=VCR_RECORD_MODE)
+  def test_fetch_daily_weather_forecast_cached(self):
+    # The cassette has a single response, so later dates must come from the cached forecast
+    current_date = self.current_dt.date()
+    for days in range(3):
+      dt = current_date + timedelta(days=days)
+      weather = self.handler.fetch_daily_weather(self.latitude, self.longitude, dt, current_date)
+      self.assertIsNotNone(weather.high)
+    self.assertEqual(self.handler.forecast_cache.stats.misses, 1)
+    self.assertEqual(self.handler.forecast_cache.stats.hits, 2)
+
+  @vcr.use_cassette('fixtures/weather/fetch_weather_today.yml', record_mode=VCR_RECORD_MODE)
+  def test_fetch_weather_range(self):
+    current_date = self.current_dt.date()
+    dates = [current_date + timedelta(days=days) for days in range(1, 8)]
+    weather = self.handler.fetch_weather_range(
+      self.latitude, self.longitude, dates[0], dates[-1], current_date)
+    daily_weather = [
+      self.handler.fetch_daily_weather(self.latitude, self.longitude, dt, current_date)
+      for dt in dates
+    ]
+    self.assertEqual(weather.high, max(w.high for w in daily_weather))
+    self.assertEqual(weather.low, min(w.low for w in daily_weather))
+    self.assertEqual(
+      weather.precipitation_chance, max(w.precipitation_chance for w in daily_weather))
+    self.assertAlmostEqual(
+      weather.precipitation_amount, sum(w.precipitation_amount for w in daily_weather))
+    self.assertEqual(weather.wind_speed, max(w.wind_speed for w in daily_weather))
+    self.assertIsNone(weather.sunrise)
+    self.assertEqual(self.handler.forecast_cache.stats.misses, 1)
+
+  @vcr.use_cassette('fixtures/weather/fetch_weather_today.yml', record_mode=VCR_RECORD_MODE)
+  def test_fetch_weather_batch(self):
+    # Serve the cassette's forecast for two other locations
+    forecast_query = 'getSunV3DailyForecastWithHeadersUrlConfig'
+    forecast = next(iter(self.handler._post_queries([])[forecast_query].values()))
+    locations = [('Denver', 39.74, -104.98), ('Boston', 42.36, -71.06)]
+    for city, lat, lon in locations:
+      self.geocode_cache.put(city, 'en-US', (city, lat, lon))
+    response_data = {
+      forecast_query: {
+        f'duration:15day;geocode:{lat},{lon};language:en-US;units:e': forecast
+        for _, lat, lon in locations
+      },
+    }
+    dt = (self.current_dt + timedelta(days=1)).date()
+    queries = [WeatherQuery(city, dt, dt) for city, _, _ in locations]
+    with unittest.mock.patch.object(
+        self.handler, '_post_queries', return_value=response_data) as post:
+      results = self.handler.fetch_weather_batch(queries, self.current_dt.date())
+    post.assert_called_once()
+    self.assertEqual(
+      [query['params']['geocode'] for query in post.call_args.args[0]],
+      ['39.74,-104.98', '42.36,-71.06'])
+    self.assertEqual([city for city, _ in results], ['Denver', 'Boston'])
+    self.assertEqual(results[0][1], results[1][1])
+    self.assertEqual((results[0][1].high, results[0][1].low), (60, 43))
+    self.assertEqual(self.handler.forecast_cache.stats.misses, 2)
+
+  def test_fetch_weather_batch_same_location(self):
+    # Almanac queries for different months of the same location have different params
+    self.geocode_cache.put(self.city, 'en-US', (self.city, self.latitude, self.longitude))
+    geocode = f'{self.latitude},{self.longitude}'
+    response_data = {'getSunV3DailyAlmanacUrlConfig': {}, 'getSunV2AstroUrlConfig': {}}
+    dates = [datetime(year=2023, month=month, day=10).date() for month in (5, 7)]
+    for dt in dates:
+      response_data['getSunV3DailyAlmanacUrlConfig'][
+        f'days:45;geocode:{geocode};language:en-US;startDay:1;startMonth:{dt.month};units:e'
+      ] = {
+        'status': 200,
+        'data': {
+          'almanacRecordDate': [dt.strftime('%m%d')],
+          'temperatureAverageMax': [60 + dt.month],
+          'temperatureAverageMin': [40 + dt.month],
+        },
+      }
+      response_data['getSunV2AstroUrlConfig'][
+        f"date:{dt.strftime('%Y%m%d')};days:30;geocode:{geocode};language:en-US"
+      ] = {'status': 200, 'data': {'astroData': []}}
+
+    queries = [WeatherQuery(self.city, dt, dt) for dt in dates]
+    with unittest.mock.patch.object(
+        self.handler, '_post_queries', return_value=response_data) as post:
+      results = self.handler.fetch_weather_batch(queries, self.current_dt.date())
+    post.assert_called_once()
+    self.assertEqual(len(post.call_args.args[0]), 4)
+    self.assertEqual([(weather.high, weather.low) for _, weather in results], [(65, 45), (67, 47)])
+
+  def test_handle_several_cities(self):
+    self.intent['slots'].insert(1, {'slotName': 'city', 'value': {'value': 'Boston'}})
+    # Responses are relative to the current date
+    self.intent['slots'][2]['value']['value'] = datetime.now(timezone.utc).isoformat()
+    weather = Weather(high = 62, low = 40)
+    results = [(self.city, weather), ('Boston', weather)]
+    with unittest.mock.patch.object(
+        self.handler, 'fetch_weather_batch', return_value=results) as fetch:
+      response = self.handler.handle(self.intent)
+    queries = fetch.call_args.args[0]
+    self.assertEqual([query.city_name_query for query in queries], [self.city, 'Boston'])
+    self.assertEqual(response, (
+      f'Today in {self.city}, the high is 62 and the low is 40. '
+      'Today in Boston, the high is 62 and the low is 40.'))
+
   @vcr.use_cassette('fixtures/weather/fetch_weather_yesterday.yml', record_mode=VCR_RECORD_MODE)
   def test_fetch_daily_weather_historic(self):
     dt = (self.current_dt - timedelta(days=1)).date()
@@ -110,6 +257,31 @@ class WeatherHandlerTestCase(EchoTestCase):
     response = self.handler.format_response(self.city, self.current_dt.date(), self.current_dt.date(), weather, '')
     self.assertEqual(response, f'Today in {self.city}, the high is 62 and the low is 40. there is a 40 percent chance of rain (0.02 inches).')
 
+  def test_format_response_range(self):
+    weather = Weather(
+      high = 64,
+      low = 41,
+      precipitation_chance = 60,
+      precipitation_amount = 0.5,
+      precipitation_type = PrecipitationType.RAIN,
+    )
+    dt = self.current_dt.date() + timedelta(days=1)
+    response = self.handler.format_response(
+      self.city, dt, self.current_dt.date(), weather, '', dt + timedelta(days=6))
+    self.assertEqual(response, (
+      f'From Monday, February 13 to Sunday, February 19 in {self.city}, the high will be 64 and '
+      'the low will be 41. there will be up to a 60 percent chance of rain (0.5 inches in total).'))
+
+  def test_find_time_interval_end(self):
+    self.intent['slots'][1]['value'] = {
+      'kind': 'TimeInterval',
+      'from': '2023-02-13 00:00:00 -08:00',
+      'to': '2023-02-20 00:00:00 -08:00',
+    }
+    start_date = datetime(year=2023, month=2, day=13).date()
+    end_date = self.handler._find_time_interval_end(self.intent, start_date)
+    self.assertEqual(end_date, datetime(year=2023, month=2, day=19).date())
+
   def test_format_response_tomorrow_wind(self):
     dt = (self.current_dt + timedelta(days=1)).date()
     weather = Weather(wind_speed = 12, wind_direction = Direction.NORTH_NORTHWEST)
@@ -0,0 +1,73 @@
+import math
+from datetime import date, time
+
+from bot.language.assistant.intents.weather_series import DailySeries
+from tests import EchoTestCase
+
+FORECAST = {
+  'validTimeLocal': ['2023-02-12T07:00:00-0800', '2023-02-13T07:00:00-0800'],
+  'temperatureMax': [None, 60],
+  'calendarDayTemperatureMax': [58, 61],
+  'temperatureMin': [45, 43],
+  'calendarDayTemperatureMin': [44, 42],
+  'qpf': [0.1, 0.0],
+  'qpfSnow': [0.0, 0.0],
+  'sunriseTimeLocal': ['2023-02-12T07:02:31-0800', '2023-02-13T07:01:12-0800'],
+  'sunsetTimeLocal': ['2023-02-12T17:45:10-0800', '2023-02-13T17:46:30-0800'],
+  'moonPhase': ['Waning Gibbous', 'Last Quarter'],
+  'daypart': [{
+    'precipChance': [None, 30, 10, 2],
+    'windSpeed': [None, 8, 20, 12],
+    'windDirectionCardinal': [None, 'NW', 'W', 'WSW'],
+  }],
+}
+
+
+class DailySeriesTestCase(EchoTestCase):
+  def test_from_forecast(self):
+    series = DailySeries.from_forecast(FORECAST)
+    self.assertEqual(series.dates, [date(2023, 2, 12), date(2023, 2, 13)])
+    columns = series.columns
+    # Missing day values fall back to the calendar day or the night
+    self.assertEqual(list(columns['high']), [58, 60])
+    self.assertEqual(list(columns['precipitation_chance']), [30, 6])
+    self.assertEqual(list(columns['wind_speed']), [8, 20])
+    self.assertEqual(list(columns['wind_direction']), ['NW', 'W'])
+    self.assertEqual(columns['sunrise'][1], time(hour=7, minute=1))
+
+  def test_rows(self):
+    series = DailySeries.from_forecast(FORECAST)
+    self.assertEqual(list(series.rows([date(2023, 2, 13), date(2023, 2, 14)])), [1, -1])
+    self.assertTrue(series.covers([date(2023, 2, 12), date(2023, 2, 13)]))
+    self.assertFalse(series.covers([date(2023, 2, 14)]))
+
+    almanac = DailySeries.from_almanac({
+      'almanacRecordDate': ['0228', '0229'],
+      'temperatureAverageMax': [61, 62],
+      'temperatureAverageMin': [44, 45],
+    })
+    # Annual series have the same values every year
+    self.assertTrue(almanac.covers([date(2023, 2, 28), date(2024, 2, 29)]))
+
+  def test_combine(self):
+    almanac = DailySeries.from_almanac({
+      'almanacRecordDate': ['0211', '0212', '0213'],
+      'temperatureAverageMax': [59, 60, 61],
+      'temperatureAverageMin': [44, 45, 46],
+    })
+    historical = DailySeries.from_historical({
+      'validTimeLocal': ['2023-02-11T07:00:00-0800'],
+      'temperatureMax': [54],
+      'temperatureMin': [42],
+      'rain24Hour': [0.03],
+      'snow24Hour': [None],
+    })
+    forecast = DailySeries.from_forecast(FORECAST)
+
+    dates = [date(2023, 2, 10), date(2023, 2, 11), date(2023, 2, 12)]
+    combined = DailySeries.combine([almanac, historical, forecast], dates)
+    self.assertEqual(combined.dates, dates)
+    self.assertTrue(math.isnan(combined.columns['high'][0]))
+    self.assertEqual(list(combined.columns['high'][1:]), [54, 58])
+    self.assertEqual(list(combined.columns['precipitation_chance'][1:]), [100, 30])
+    self.assertEqual(list(combined.columns['wind_direction']), [None, None, 'NW'])
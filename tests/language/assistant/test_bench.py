@@ -0,0 +1,54 @@
+from bot.language.assistant.bench import (Counts, FoldResult, LabeledUtterance, _build_report,
+                                          _label_utterance, _split_folds)
+from tests import EchoTestCase
+
+
+class BenchTestCase(EchoTestCase):
+  def test_label_utterance(self):
+    utterance = {
+      'data': [
+        {'text': 'play '},
+        {'text': 'Forget Me Nots', 'entity': 'track', 'slot_name': 'track'},
+        {'text': ' by '},
+        {'text': 'Patrice Rushen', 'entity': 'artist', 'slot_name': 'artist'},
+      ],
+    }
+    labeled = _label_utterance('play_track', utterance)
+    self.assertEqual(labeled.text, 'play Forget Me Nots by Patrice Rushen')
+    self.assertEqual(labeled.slots, [('track', 5, 19), ('artist', 23, 37)])
+
+  def test_split_folds(self):
+    dataset = {
+      'intents': {
+        'a': {'utterances': [{'data': [{'text': f'a {i}'}]} for i in range(6)]},
+        'b': {'utterances': [{'data': [{'text': f'b {i}'}]} for i in range(2)]},
+      },
+    }
+    folds = _split_folds(dataset, 3, 0)
+    self.assertEqual([len(fold) for fold in folds], [2, 2, 2])
+    self.assertTrue(all(u.intent_name == 'a' for fold in folds for u in fold))
+
+  def test_build_report(self):
+    fold_result = FoldResult(
+      [
+        LabeledUtterance('pause', 'pause_music', []),
+        LabeledUtterance('play x', 'play_track', [('track', 5, 6)]),
+      ],
+      [
+        {'intent': {'intentName': 'pause_music'}, 'slots': []},
+        {'intent': {'intentName': 'pause_music'}, 'slots': []},
+      ],
+      [0.001, 0.003],
+    )
+    report = _build_report([fold_result], 1, 0, 'linear')
+    self.assertEqual(report['engine'], 'linear')
+    self.assertEqual(report['intents']['pause_music']['precision'], 0.5)
+    self.assertEqual(report['intents']['play_track']['recall'], 0.0)
+    self.assertEqual(report['slots']['fn'], 1)
+    self.assertAlmostEqual(report['latency_ms']['max'], 3.0)
+
+  def test_counts(self):
+    counts = Counts(tp=3, fp=1, fn=2)
+    self.assertEqual(counts.precision, 0.75)
+    self.assertEqual(counts.recall, 0.6)
+    self.assertAlmostEqual(counts.f1, 2 * 0.75 * 0.6 / 1.35)
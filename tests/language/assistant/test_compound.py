@@ -0,0 +1,36 @@
+from bot.language.assistant.compound import split_compound_utterance
+from tests import EchoTestCase
+
+
+class CompoundTestCase(EchoTestCase):
+  def test_split(self):
+    self.assertEqual(
+      split_compound_utterance("Pause the music and tell me if it'll rain tomorrow"),
+      ['Pause the music', "tell me if it'll rain tomorrow"])
+    self.assertEqual(
+      split_compound_utterance('Skip this song, then turn it up; what is the weather'),
+      ['Skip this song', 'turn it up', 'what is the weather'])
+
+  def test_no_split(self):
+    self.assertEqual(split_compound_utterance('Pause the music'), ['Pause the music'])
+    self.assertEqual(split_compound_utterance('Pause the music and'), ['Pause the music and'])
+    self.assertEqual(split_compound_utterance('Android music'), ['Android music'])
+
+  def test_slots(self):
+    slots = [{'range': {'start': 5, 'end': 24}}]
+    self.assertEqual(
+      split_compound_utterance('Play Simon and Garfunkel', slots), ['Play Simon and Garfunkel'])
+    self.assertEqual(
+      split_compound_utterance('Play Simon and Garfunkel and pause', slots),
+      ['Play Simon and Garfunkel', 'pause'])
+
+  def test_slot_values(self):
+    text = 'Compare the weather in Denver and Boston tomorrow and pause'
+    slots = [
+      {'slotName': 'city', 'range': {'start': 23, 'end': 29}},
+      {'slotName': 'city', 'range': {'start': 34, 'end': 40}},
+      {'slotName': 'time', 'range': {'start': 41, 'end': 49}},
+    ]
+    self.assertEqual(
+      split_compound_utterance(text, slots),
+      ['Compare the weather in Denver and Boston tomorrow', 'pause'])
@@ -1,16 +1,246 @@
-from bot.language.assistant.executor import Executor
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bot.language.assistant import ASSISTANT_LINEAR_MODEL_DIR, LINEAR_ENGINE
+from bot.language.assistant.executor import Executor, intent_key
 from bot.language.assistant.intents import IntentHandler
+from bot.language.assistant.linear_engine import LINEAR_ENGINE_FILENAME
 from tests import EchoTestCase
 
 
 class ExecutorTestCase(EchoTestCase):
   def setUp(self):
-    self.executor = Executor(intent_handlers=[ExampleHandler()])
+    self.executor = Executor(intent_handlers=[ExampleHandler()], parse_processes=2)
+
+  def tearDown(self):
+    self.executor.close()
 
   def test_converse(self):
     result = self.executor.converse("Will it rain in San Francisco on February 11, 2023?")
     self.assertEqual(result, 'query_weather;San Francisco;2023-02-11 00:00:00 -08:00;precipitation')
 
+  def test_parse_cache(self):
+    result = self.executor._parse('Will it rain in San Francisco tomorrow?')
+    cached_result = self.executor._parse('Will it rain in  San Francisco tomorrow? ')
+    self.assertEqual(self.executor.parse_cache.stats.hits, 1)
+    self.assertEqual(cached_result, result)
+
+    # Case changes how snips fills slots, so it is part of the key
+    self.executor._parse('will it rain in san francisco tomorrow?')
+    self.assertEqual(self.executor.parse_cache.stats.misses, 2)
+
+  def test_parse_batch(self):
+    input_texts = [
+      'Will it rain in San Francisco on February 11, 2023?',
+      'Pause the music',
+      'Play Forget Me Nots by Patrice Rushen',
+    ]
+    results = self.executor.parse_batch(input_texts)
+    self.assertEqual(results, [self.executor._parse(text) for text in input_texts])
+
+
+class LinearExecutorTestCase(EchoTestCase):
+  def setUp(self):
+    self.executor = Executor(intent_handlers=[ExampleHandler()], nlu_engine=LINEAR_ENGINE)
+
+  def tearDown(self):
+    self.executor.close()
+
+  def test_converse(self):
+    result = self.executor.converse("Will it rain in San Francisco on February 11, 2023?")
+    self.assertRegex(result, r'^query_weather;San Francisco;2023-02-11 00:00:00.*;precipitation$')
+
+  def test_converse_chit_chat(self):
+    # Isn't mistaken for a weather query
+    for text in ('How are you?', 'what is the meaning of life my friend'):
+      self.assertIsNone(self.executor.converse(text), text)
+
+  def test_converse_several_cities(self):
+    executor = Executor(intent_handlers=[CitiesHandler()], nlu_engine=LINEAR_ENGINE)
+    try:
+      result = executor.converse('compare the weather in Denver and Boston tomorrow')
+    finally:
+      executor.close()
+    # Handled as one query instead of being split at "and"
+    self.assertRegex(result, r'^Denver,Boston;\d{4}-\d{2}-\d{2} 00:00:00')
+    tomorrow = datetime.now().astimezone().date() + timedelta(days=1)
+    self.assertEqual(datetime.fromisoformat(result.split(';')[1]).date(), tomorrow)
+
+  def test_parse_cache(self):
+    result = self.executor._parse("What's the weather in Boston tomorrow")
+    cached_result = self.executor._parse("What's the weather in Boston tomorrow")
+    self.assertEqual(self.executor.parse_cache.stats.hits, 1)
+    self.assertEqual(cached_result, result)
+    self.assertIn('snips/datetime', [slot['entity'] for slot in cached_result['slots']])
+
+  def test_parse_batch(self):
+    input_texts = ['Pause the music', 'Play Forget Me Too by Ed Sheeran']
+    results = self.executor.parse_batch(input_texts)
+    self.assertEqual(results, [self.executor._parse(text) for text in input_texts])
+
+  def test_reload_model(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      model_dir = os.path.join(tmp_dir, 'assistant_linear')
+      shutil.copytree(ASSISTANT_LINEAR_MODEL_DIR, model_dir)
+      executor = Executor(
+        model_dir=model_dir, intent_handlers=[], nlu_engine=LINEAR_ENGINE, watch_model=True)
+      try:
+        engine = executor.engine
+
+        # An invalid model never replaces the current engine
+        with open(os.path.join(model_dir, LINEAR_ENGINE_FILENAME), 'w', encoding='utf-8') as f:
+          f.write('{')
+        self.assertFalse(executor.model_watcher.reload())
+        executor._parse('Pause the music')
+        self.assertIs(executor.engine, engine)
+
+        shutil.rmtree(model_dir)
+        shutil.copytree(ASSISTANT_LINEAR_MODEL_DIR, model_dir)
+        self.assertTrue(executor.model_watcher.reload())
+        # The new engine is swapped in by the next parse
+        self.assertIs(executor.engine, engine)
+        executor._parse('Pause the music')
+        self.assertIsNot(executor.engine, engine)
+      finally:
+        executor.close()
+
+  def test_converse_compound(self):
+    executor = Executor(
+      intent_handlers=[SlowMusicHandler(), SlowWeatherHandler()], nlu_engine=LINEAR_ENGINE)
+    try:
+      start = time.perf_counter()
+      result = executor.converse('Pause the music and tell me if it will rain in Chicago tomorrow')
+      elapsed = time.perf_counter() - start
+    finally:
+      executor.close()
+
+    self.assertRegex(result, r'^pause_music query_weather;Chicago;.*;precipitation$')
+    # Both handlers sleep, but they run concurrently
+    self.assertLess(elapsed, 2 * SlowMusicHandler.DELAY)
+
+  def test_handler_deadline(self):
+    follow_ups = []
+    followed_up = threading.Event()
+
+    def follow_up(text: str) -> None:
+      follow_ups.append(text)
+      followed_up.set()
+
+    executor = Executor(
+      intent_handlers=[SlowMusicHandler()], nlu_engine=LINEAR_ENGINE, handler_deadline=0.1,
+      follow_up=follow_up)
+    try:
+      start = time.perf_counter()
+      result = executor.converse('Pause the music')
+      self.assertLess(time.perf_counter() - start, SlowMusicHandler.DELAY)
+      self.assertIn('taking longer than expected', result)
+
+      # The late response is delivered as a follow-up
+      self.assertTrue(followed_up.wait(5))
+      self.assertEqual(follow_ups, ['pause_music'])
+    finally:
+      executor.close()
+
+  def test_late_response_timeout(self):
+    follow_ups = []
+    executor = Executor(
+      intent_handlers=[SlowMusicHandler()], nlu_engine=LINEAR_ENGINE, handler_deadline=0.05,
+      late_response_timeout=0.05, follow_up=follow_ups.append)
+    try:
+      result = executor.converse('Pause the music')
+      self.assertIn('taking longer than expected', result)
+      time.sleep(SlowMusicHandler.DELAY * 2)
+      self.assertEqual(follow_ups, [])
+    finally:
+      executor.close()
+
+  def test_late_response_timeout_shared(self):
+    follow_ups = []
+    handler = SlowMusicHandler()
+    executor = Executor(
+      intent_handlers=[handler], nlu_engine=LINEAR_ENGINE, handler_deadline=0.05,
+      late_response_timeout=0.3, follow_up=follow_ups.append)
+
+    async def converse_after(delay: float) -> str:
+      await asyncio.sleep(delay)
+      return await executor.converse_async('Pause the music')
+
+    async def converse_twice() -> list[str]:
+      return await asyncio.gather(converse_after(0), converse_after(0.25))
+
+    try:
+      results = executor.event_loop.run(converse_twice())
+      self.assertTrue(all('taking longer than expected' in result for result in results))
+      time.sleep(SlowMusicHandler.DELAY * 2)
+      # The first request stops waiting before the handler finishes, but the second one shares
+      # the same execution and still gets its response
+      self.assertEqual(handler.calls, 1)
+      self.assertEqual(follow_ups, ['pause_music'])
+      self.assertEqual(executor.task_waiters, {})
+    finally:
+      executor.close()
+
+  def test_coalesce(self):
+    handler = SlowMusicHandler()
+    executor = Executor(intent_handlers=[handler], nlu_engine=LINEAR_ENGINE)
+
+    async def converse_concurrently(input_texts: list[str]) -> list[str]:
+      return await asyncio.gather(*(executor.converse_async(text) for text in input_texts))
+
+    try:
+      results = executor.event_loop.run(
+        converse_concurrently(['Pause the music', 'pause the music!', 'Stop playing music']))
+      self.assertEqual(results, ['pause_music'] * 3)
+      self.assertEqual(handler.calls, 1)
+      self.assertEqual(executor.in_flight, {})
+
+      # Intents that aren't idempotent are always handled separately
+      handler.idempotent_intents = frozenset()
+      executor.event_loop.run(converse_concurrently(['Pause the music', 'Pause the music']))
+      self.assertEqual(handler.calls, 3)
+    finally:
+      executor.close()
+
+  def test_intent_key(self):
+    def intent(name: str, *slots: tuple[str, str]) -> dict:
+      return {
+        'intent': {'intentName': name, 'probability': 1.0},
+        'slots': [
+          {'slotName': slot_name, 'rawValue': value, 'value': {'kind': 'Custom', 'value': value}}
+          for slot_name, value in slots
+        ],
+      }
+
+    self.assertEqual(
+      intent_key(intent('query_weather', ('city', 'Paris'), ('attribute', 'rain'))),
+      intent_key(intent('query_weather', ('attribute', 'rain'), ('city', 'Paris'))))
+    self.assertNotEqual(
+      intent_key(intent('query_weather', ('city', 'Paris'))),
+      intent_key(intent('query_weather', ('city', 'London'))))
+
+
+class SlowMusicHandler(IntentHandler):
+  DELAY = 0.5
+  supported_intents = frozenset({'pause_music'})
+  idempotent_intents = supported_intents
+
+  def __init__(self):
+    super().__init__()
+    self.calls = 0
+
+  def handle(self, intent: dict) -> str:
+    return self._find_intent_name(intent)
+
+  async def handle_async(self, intent: dict) -> str:
+    self.calls += 1
+    await asyncio.sleep(self.DELAY)
+    return self.handle(intent)
+
 
 class ExampleHandler(IntentHandler):
   def can_handle(self, intent: dict) -> bool:
@@ -18,3 +248,15 @@ class ExampleHandler(IntentHandler):
 
   def handle(self, intent: dict) -> str:
     return f"{self._find_intent_name(intent)};{self._find_named_slot_value(intent, 'city', '')};{self._find_named_slot_value(intent, 'time', '')};{self._find_named_slot_value(intent, 'attribute', '')}"
+
+
+class CitiesHandler(ExampleHandler):
+  def handle(self, intent: dict) -> str:
+    cities = [slot['value']['value'] for slot in intent['slots'] if slot['slotName'] == 'city']
+    return f"{','.join(cities)};{self._find_named_slot_value(intent, 'time', '')}"
+
+
+class SlowWeatherHandler(ExampleHandler):
+  async def handle_async(self, intent: dict) -> str:
+    await asyncio.sleep(SlowMusicHandler.DELAY)
+    return self.handle(intent)
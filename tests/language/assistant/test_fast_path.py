@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+from bot.language.assistant import ASSISTANT_DATA_DIR
+from bot.language.assistant.fast_path import FastPathMatcher, normalize_phrase
+from tests import EchoTestCase
+
+DATASET = '''
+type: intent
+name: pause_music
+utterances:
+- Pause the music
+- Stop
+---
+type: intent
+name: play_track
+slots:
+- name: track
+  entity: track
+utterances:
+- Play [track](Forget Me Nots)
+---
+type: intent
+name: stop_alarm
+utterances:
+- Stop
+'''
+
+
+class FastPathMatcherTestCase(EchoTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    dataset_path = os.path.join(self.tmp_dir.name, 'dataset.yml')
+    with open(dataset_path, 'w', encoding='utf-8') as f:
+      f.write(DATASET)
+    self.matcher = FastPathMatcher.from_dataset_files([dataset_path])
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_normalize_phrase(self):
+    self.assertEqual(normalize_phrase("  What's the   WEATHER? "), 'whats the weather')
+
+  def test_match(self):
+    result = self.matcher.match('pause the music!')
+    self.assertEqual(result['intent'], {'intentName': 'pause_music', 'probability': 1.0})
+    self.assertEqual(result['slots'], [])
+    self.assertEqual(result['input'], 'pause the music!')
+    self.assertEqual(self.matcher.stats.hits, 1)
+
+  def test_miss(self):
+    self.assertIsNone(self.matcher.match('pause the music in the kitchen'))
+    self.assertIsNone(self.matcher.match('Play Forget Me Nots'))
+    # Ambiguous phrases are left to the NLU engine
+    self.assertIsNone(self.matcher.match('stop'))
+    self.assertEqual(self.matcher.stats.misses, 3)
+
+  def test_save_load(self):
+    self.matcher.save(self.tmp_dir.name)
+    loaded = FastPathMatcher.load(self.tmp_dir.name)
+    self.assertEqual(loaded.phrases, self.matcher.phrases)
+    self.assertIsNone(FastPathMatcher.load(os.path.join(self.tmp_dir.name, 'missing')))
+
+  def test_assistant_dataset(self):
+    dataset_paths = [
+      os.path.join(ASSISTANT_DATA_DIR, entry) for entry in sorted(os.listdir(ASSISTANT_DATA_DIR))]
+    matcher = FastPathMatcher.from_dataset_files(dataset_paths)
+    self.assertEqual(matcher.match('Pause the music')['intent']['intentName'], 'pause_music')
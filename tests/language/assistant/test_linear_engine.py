@@ -0,0 +1,224 @@
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from bot.language.assistant import ASSISTANT_LINEAR_MODEL_DIR
+from bot.language.assistant.linear_engine import (Gazetteer, LinearNLUEngine, find_datetimes,
+                                                  load_dataset_files, resolve_datetime,
+                                                  resolve_datetime_value)
+from tests import EchoTestCase
+
+DATASET = '''
+type: intent
+name: pause_music
+utterances:
+- Pause the music
+- Stop the music
+- Stop playing music
+---
+type: intent
+name: play_track
+slots:
+- name: track
+  entity: track_name
+- name: device
+  entity: device_name
+utterances:
+- Play [track](Forget Me Nots)
+- Play [track] on [device]
+- Play the song [track](Hello)
+---
+type: intent
+name: query_weather
+slots:
+- name: city
+  entity: snips/city
+- name: time
+  entity: snips/datetime
+utterances:
+- What's the weather in [city](Boston) [time](tomorrow)
+- What's the weather like [time](today)
+---
+type: entity
+name: track_name
+values:
+- Forget Me Nots
+- Hello
+- Bohemian Rhapsody
+---
+type: entity
+name: device_name
+automatically_extensible: false
+values:
+- [Kitchen Speaker, kitchen]
+- Laptop
+'''
+
+NOW = datetime(2023, 2, 8, 15, 30, tzinfo=timezone.utc) # A Wednesday
+
+
+class LinearNLUEngineTestCase(EchoTestCase):
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      dataset_path = os.path.join(tmp_dir, 'dataset.yml')
+      with open(dataset_path, 'w', encoding='utf-8') as f:
+        f.write(DATASET)
+      cls.dataset = load_dataset_files([dataset_path])
+    cls.engine = LinearNLUEngine(random_seed=0).fit(cls.dataset)
+
+  def test_load_dataset_files(self):
+    utterance = self.dataset['intents']['play_track']['utterances'][1]
+    self.assertEqual(utterance['data'][0], {'text': 'Play '})
+    self.assertEqual(utterance['data'][1]['slot_name'], 'track')
+    self.assertEqual(utterance['data'][1]['entity'], 'track_name')
+    # Slots without example values are filled with values of their entity
+    self.assertIsNotNone(utterance['data'][1]['text'])
+    self.assertEqual(
+      self.dataset['entities']['device_name']['data'][0],
+      {'value': 'Kitchen Speaker', 'synonyms': ['kitchen']})
+    self.assertFalse(self.dataset['entities']['device_name']['automatically_extensible'])
+    self.assertIn('snips/city', self.dataset['entities'])
+
+  def test_parse_intent(self):
+    result = self.engine.parse('stop the music please')
+    self.assertEqual(result['input'], 'stop the music please')
+    self.assertEqual(result['intent']['intentName'], 'pause_music')
+    self.assertEqual(result['slots'], [])
+
+  def test_parse_slots(self):
+    # Matches a training utterance with known values
+    result = self.engine.parse('Play Bohemian Rhapsody on kitchen')
+    self.assertEqual(result['intent']['intentName'], 'play_track')
+    self.assertEqual(result['intent']['probability'], 1.0)
+    track, device = result['slots']
+    self.assertEqual(track['slotName'], 'track')
+    self.assertEqual(track['range'], {'start': 5, 'end': 22})
+    self.assertEqual(track['value'], {'kind': 'Custom', 'value': 'Bohemian Rhapsody'})
+    self.assertEqual(device['rawValue'], 'kitchen')
+    self.assertEqual(device['value']['value'], 'Kitchen Speaker')
+
+    # Falls back to finding known values anywhere in the input
+    result = self.engine.parse('In the kitchen, play Hello')
+    self.assertEqual(result['intent']['intentName'], 'play_track')
+    self.assertEqual(
+      [(slot['slotName'], slot['rawValue']) for slot in result['slots']],
+      [('device', 'kitchen'), ('track', 'Hello')])
+
+  def test_parse_unknown_values(self):
+    # Extensible entities accept new values, but non-extensible entities don't
+    result = self.engine.parse('Play Yesterday')
+    self.assertEqual(result['intent']['intentName'], 'play_track')
+    self.assertEqual([slot['rawValue'] for slot in result['slots']], ['Yesterday'])
+
+    result = self.engine.parse('Play Hello on the toaster')
+    self.assertNotIn('device', [slot['slotName'] for slot in result['slots']])
+
+  def test_parse_builtin_entities(self):
+    result = self.engine.parse("How's the weather in New York on Friday?")
+    self.assertEqual(result['intent']['intentName'], 'query_weather')
+    slots = {slot['slotName']: slot for slot in result['slots']}
+    self.assertEqual(slots['city']['value']['value'], 'New York')
+    self.assertEqual(slots['time']['rawValue'], 'on Friday')
+    self.assertEqual(slots['time']['value']['kind'], 'InstantTime')
+    datetime.fromisoformat(slots['time']['value']['value'])
+
+  def test_parse_adjacent_slots(self):
+    result = self.engine.parse("What's the weather in San Francisco next Tuesday")
+    self.assertEqual(result['intent']['probability'], 1.0)
+    self.assertEqual(
+      [(slot['slotName'], slot['rawValue']) for slot in result['slots']],
+      [('city', 'San Francisco'), ('time', 'next Tuesday')])
+
+  def test_parse_time_interval(self):
+    result = self.engine.parse("What's the weather in Boston next week")
+    self.assertEqual(result['intent']['intentName'], 'query_weather')
+    slots = {slot['slotName']: slot for slot in result['slots']}
+    self.assertEqual(slots['time']['rawValue'], 'next week')
+    value = slots['time']['value']
+    self.assertEqual(value['kind'], 'TimeInterval')
+    start = datetime.fromisoformat(value['from'])
+    end = datetime.fromisoformat(value['to'])
+    self.assertEqual(start.weekday(), 0)
+    self.assertEqual(end - start, timedelta(days=7))
+
+  def test_persist(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      self.engine.persist(tmp_dir)
+      loaded = LinearNLUEngine.from_path(tmp_dir)
+    texts = ('Stop playing music', 'Play Hello on Laptop', "What's the weather today", 'Hi there')
+    for text in texts:
+      self.assertEqual(loaded.parse(text), self.engine.parse(text))
+
+  def test_assistant_model(self):
+    engine = LinearNLUEngine.from_path(ASSISTANT_LINEAR_MODEL_DIR)
+    result = engine.parse('Play Forget Me Too by Ed Sheeran')
+    self.assertEqual(result['intent']['intentName'], 'play_track')
+
+  def test_assistant_model_noise(self):
+    engine = LinearNLUEngine.from_path(ASSISTANT_LINEAR_MODEL_DIR)
+    # Chit-chat is parsed as the None intent instead of the closest intent
+    for text in (
+        'How are you?',
+        'what is the meaning of life my friend',
+        'hello there how are you doing today'):
+      result = engine.parse(text)
+      self.assertIsNone(result['intent']['intentName'], text)
+      self.assertEqual(result['slots'], [])
+    # So are inputs that only match the wording of an intent whose utterances all have slots
+    self.assertIsNone(engine.parse('play some jazz')['intent']['intentName'])
+    result = engine.parse('play music by Drake')
+    self.assertEqual(result['intent']['intentName'], 'play_artist_radio')
+
+  def test_gazetteer(self):
+    gazetteer = Gazetteer()
+    gazetteer.add('New York', 'New York')
+    gazetteer.add('New York City', 'New York')
+    gazetteer.add('NYC', 'New York')
+    self.assertEqual(gazetteer.resolve('nyc'), 'New York')
+    self.assertIsNone(gazetteer.resolve('New'))
+    self.assertEqual(
+      gazetteer.find('From New York City to NYC'), [(5, 18, 'New York'), (22, 25, 'New York')])
+
+  def test_resolve_datetime(self):
+    self.assertEqual(resolve_datetime('tomorrow', NOW), '2023-02-09 00:00:00 +00:00')
+    self.assertEqual(resolve_datetime('on Friday', NOW), '2023-02-10 00:00:00 +00:00')
+    self.assertEqual(resolve_datetime('next Wednesday', NOW), '2023-02-15 00:00:00 +00:00')
+    self.assertEqual(resolve_datetime('in three days', NOW), '2023-02-11 00:00:00 +00:00')
+    self.assertEqual(resolve_datetime('March 3rd', NOW), '2023-03-03 00:00:00 +00:00')
+    self.assertEqual(resolve_datetime('right now', NOW), '2023-02-08 15:30:00 +00:00')
+    self.assertIsNone(resolve_datetime('whenever', NOW))
+    self.assertIsNone(resolve_datetime('February 30', NOW))
+
+  def test_resolve_datetime_value(self):
+    self.assertEqual(
+      resolve_datetime_value('tomorrow', NOW),
+      {
+        'kind': 'InstantTime', 'value': '2023-02-09 00:00:00 +00:00', 'grain': 'Day',
+        'precision': 'Exact',
+      })
+    intervals = {
+      'this week': ('2023-02-08', '2023-02-13'),
+      'next week': ('2023-02-13', '2023-02-20'),
+      'this weekend': ('2023-02-11', '2023-02-13'),
+      'the weekend': ('2023-02-11', '2023-02-13'),
+      'next weekend': ('2023-02-18', '2023-02-20'),
+    }
+    for text, (start, end) in intervals.items():
+      value = resolve_datetime_value(text, NOW)
+      self.assertEqual(value['kind'], 'TimeInterval')
+      self.assertEqual(value['from'], f'{start} 00:00:00 +00:00')
+      self.assertEqual(value['to'], f'{end} 00:00:00 +00:00')
+    # Weekends that already started begin today
+    sunday = NOW + timedelta(days=4)
+    self.assertEqual(
+      resolve_datetime_value('this weekend', sunday)['from'], '2023-02-12 00:00:00 +00:00')
+    self.assertEqual(resolve_datetime('next week', NOW), '2023-02-13 00:00:00 +00:00')
+    self.assertIsNone(resolve_datetime_value('whenever', NOW))
+
+  def test_find_datetimes(self):
+    text = 'Will it rain on February 11, 2023 or tomorrow?'
+    self.assertEqual(
+      [text[start:end] for start, end in find_datetimes(text)],
+      ['on February 11, 2023', 'tomorrow'])
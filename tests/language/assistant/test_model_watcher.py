@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from bot.language.assistant.model_watcher import ModelWatcher
+from tests import EchoTestCase
+
+
+def load_model(model_dir: str) -> str:
+  with open(os.path.join(model_dir, 'model.txt'), 'r', encoding='utf-8') as f:
+    contents = f.read()
+  if contents == 'invalid':
+    raise ValueError('Invalid model')
+  return contents
+
+
+class ModelWatcherTestCase(EchoTestCase):
+  def setUp(self):
+    self.model_dir = tempfile.mkdtemp('drone-test-model-watcher-')
+    self.write_model('v1')
+    self.loaded = []
+    self.loaded_event = threading.Event()
+    self.watcher = ModelWatcher(self.model_dir, load_model, self.on_load, interval=0.01)
+
+  def tearDown(self):
+    self.watcher.stop()
+    shutil.rmtree(self.model_dir)
+
+  def write_model(self, contents: str) -> None:
+    with open(os.path.join(self.model_dir, 'model.txt'), 'w', encoding='utf-8') as f:
+      f.write(contents)
+
+  def on_load(self, model: str) -> None:
+    self.loaded.append(model)
+    self.loaded_event.set()
+
+  def test_reload(self):
+    self.write_model('v2')
+    self.assertTrue(self.watcher.reload())
+    self.assertEqual(self.loaded, ['v2'])
+
+  def test_reload_invalid(self):
+    self.write_model('invalid')
+    self.assertFalse(self.watcher.reload())
+    self.assertEqual(self.loaded, [])
+
+  def test_watch(self):
+    self.watcher.start()
+    self.write_model('v2 with a different size')
+    self.assertTrue(self.loaded_event.wait(5))
+    self.assertEqual(self.loaded, ['v2 with a different size'])
+
+  def test_stop(self):
+    self.watcher.start()
+    self.watcher.stop()
+    self.assertFalse(self.watcher.thread.is_alive())
@@ -0,0 +1,16 @@
+from bot.language.assistant.music_bench import COMMANDS, bench
+from tests import EchoTestCase
+
+
+class MusicBenchTestCase(EchoTestCase):
+  def test_bench(self):
+    results = bench([1, 4], commands=20, latency=0.0, jitter=0.0)
+    self.assertEqual([result['concurrency'] for result in results], [1, 4])
+    for result in results:
+      self.assertEqual(result['commands'], 20)
+      self.assertEqual(result['failures'], 0)
+      self.assertEqual(result['client']['retries'], 0)
+      self.assertLessEqual(set(result['intents']), {intent_name for _, intent_name in COMMANDS})
+      for intent in result['intents'].values():
+        self.assertGreaterEqual(intent['requests_per_command'], 1.0)
+        self.assertIn('p99', intent['latency_ms'])
@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+
+from snips_nlu import SnipsNLUEngine
+
+from bot.common.paths import directory_fingerprint
+from bot.language.assistant import ASSISTANT_MODEL_DIR
+from bot.language.assistant.snapshot import load_engine, load_snapshot, write_snapshot
+from tests import EchoTestCase
+
+
+class SnapshotTestCase(EchoTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.model_dir = os.path.join(self.tmp_dir.name, 'assistant')
+    shutil.copytree(ASSISTANT_MODEL_DIR, self.model_dir)
+    self.snapshot_path = write_snapshot(self.model_dir)
+
+  def tearDown(self):
+    self.tmp_dir.cleanup()
+
+  def test_identical_output(self):
+    engine = SnipsNLUEngine.from_path(self.model_dir)
+    snapshot_engine = load_snapshot(self.snapshot_path, directory_fingerprint(self.model_dir))
+    for input_text in [
+      'Will it rain in San Francisco on February 11, 2023?',
+      'Pause the music',
+      'Play Forget Me Nots by Patrice Rushen',
+      'Turn up the volume',
+    ]:
+      self.assertEqual(snapshot_engine.parse(input_text), engine.parse(input_text))
+
+  def test_stale_snapshot(self):
+    with open(os.path.join(self.model_dir, 'nlu_engine.json'), 'a', encoding='utf-8') as f:
+      f.write('\n')
+    self.assertIsNone(load_snapshot(self.snapshot_path, directory_fingerprint(self.model_dir)))
+    self.assertIsNotNone(load_engine(self.model_dir))
@@ -1,14 +1,50 @@
+import os
 import tempfile
 
 from snips_nlu import SnipsNLUEngine
 
+from bot.language.assistant import LINEAR_ENGINE
+from bot.language.assistant.fast_path import FAST_PATH_FILENAME
+from bot.language.assistant.linear_engine import LinearNLUEngine
+from bot.language.assistant.snapshot import snapshot_path_for
 from bot.language.assistant.train import train
 from tests import EchoTestCase
 
+INPUT_TEXTS = [
+  'Will it rain in San Francisco on February 11, 2023?',
+  'Play Forget Me Nots by Patrice Rushen',
+]
+
 
 class TrainTestCase(EchoTestCase):
   def test_train(self):
-    with tempfile.TemporaryDirectory() as output_dir:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      output_dir = os.path.join(tmp_dir, 'assistant')
       print(output_dir)
-      train(output_dir=output_dir)
+      train(output_dir=output_dir, cache_dir=None)
       SnipsNLUEngine.from_path(output_dir)
+      self.assertTrue(os.path.isfile(snapshot_path_for(output_dir)))
+
+  def test_train_cached(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      cache_dir = os.path.join(tmp_dir, 'cache')
+      uncached_dir = os.path.join(tmp_dir, 'uncached')
+      cached_dir = os.path.join(tmp_dir, 'cached')
+
+      train(output_dir=uncached_dir, cache_dir=cache_dir)
+      self.assertTrue(os.listdir(os.path.join(cache_dir, 'slot_fillers')))
+      train(output_dir=cached_dir, cache_dir=cache_dir)
+
+      uncached_engine = SnipsNLUEngine.from_path(uncached_dir)
+      cached_engine = SnipsNLUEngine.from_path(cached_dir)
+      for input_text in INPUT_TEXTS:
+        self.assertEqual(cached_engine.parse(input_text), uncached_engine.parse(input_text))
+
+  def test_train_linear(self):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      output_dir = os.path.join(tmp_dir, 'assistant_linear')
+      train(output_dir=output_dir, nlu_engine=LINEAR_ENGINE)
+      engine = LinearNLUEngine.from_path(output_dir)
+      self.assertTrue(os.path.isfile(os.path.join(output_dir, FAST_PATH_FILENAME)))
+      self.assertFalse(os.path.exists(snapshot_path_for(output_dir)))
+      self.assertEqual(engine.parse(INPUT_TEXTS[0])['intent']['intentName'], 'query_weather')
@@ -0,0 +1,119 @@
+import threading
+import time
+import unittest.mock
+
+import torch
+
+from bot.language.conversation.data import Message, Speaker
+from bot.language.conversation.model import ConversationModel
+from bot.language.processor import LanguageProcessor
+from tests import EchoTestCase
+
+
+class LanguageProcessorTestCase(EchoTestCase):
+  def setUp(self):
+    self.conversation_model = FakeConversationModel()
+    self.conversation_model.chat_history = [
+      Message(Speaker.USER, 'Hello!'),
+      Message(Speaker.BOT, 'Hi there'),
+    ]
+    self.chat_history = list(self.conversation_model.chat_history)
+
+  def create_processor(self, speculative: bool) -> LanguageProcessor:
+    with unittest.mock.patch('bot.language.processor.Executor'), \
+        unittest.mock.patch(
+          'bot.language.processor.load_model', return_value=self.conversation_model):
+      processor = LanguageProcessor(io_handler=unittest.mock.Mock(), speculative=speculative)
+    if processor.conversation_pool is not None:
+      self.addCleanup(processor.conversation_pool.shutdown)
+    return processor
+
+  def test_speculative_assistant_response(self):
+    processor = self.create_processor(speculative=True)
+    processor.assistant_model.converse.return_value = 'Paused the music'
+    self.assertEqual(processor.respond('Pause the music'), 'Paused the music')
+    processor.assistant_model.converse.assert_called_once_with('Pause the music', spinner=False)
+    # The discarded conversation response is never recorded
+    processor.conversation_pool.shutdown()
+    self.assertEqual(self.conversation_model.chat_history, self.chat_history)
+
+  def test_speculative_conversation_response(self):
+    processor = self.create_processor(speculative=True)
+    processor.assistant_model.converse.return_value = None
+    output_text = processor.respond('How are you?')
+    self.assertEqual(output_text, 'token token token token token')
+    self.assertEqual(self.conversation_model.chat_history, self.chat_history + [
+      Message(Speaker.USER, 'How are you?'),
+      Message(Speaker.BOT, output_text),
+    ])
+
+  def test_cancel_event(self):
+    self.assertEqual(
+      self.conversation_model.respond('How are you?'), 'token token token token token')
+    self.assertEqual(self.conversation_model.generated_tokens, 5)
+
+    cancel_event = threading.Event()
+    cancel_event.set()
+    self.assertEqual(self.conversation_model.respond('How are you?', cancel_event), 'token')
+    self.assertEqual(self.conversation_model.generated_tokens, 6)
+    self.assertEqual(self.conversation_model.chat_history, self.chat_history)
+
+  def test_speculative_latency(self):
+    # Conversational turns should take about as long as the slower of the assistant and the
+    # conversation model instead of both
+    self.conversation_model.token_seconds = 0.04
+
+    def converse(input_text: str, spinner: bool = True) -> None:
+      time.sleep(0.2)
+
+    latencies = {}
+    for speculative in (False, True):
+      processor = self.create_processor(speculative)
+      processor.assistant_model.converse.side_effect = converse
+      start = time.perf_counter()
+      processor.respond('How are you?')
+      latencies[speculative] = time.perf_counter() - start
+    self.assertGreaterEqual(latencies[False], 0.4)
+    self.assertLess(latencies[True], latencies[False] - 0.1)
+
+
+class FakeConversationModel(ConversationModel):
+  """ConversationModel with a mocked tokenizer and model that generates 'token' one token at
+  a time, checking its stopping criteria after each one"""
+
+  def __init__(self, token_seconds: float = 0.0):
+    # Skips loading a pretrained model
+    self.device = torch.device('cpu')
+    self.bot_name = 'Bot'
+    self.chat_history_limit = 8
+    self.generate_kwargs = {'max_new_tokens': 5}
+    self.chat_history = []
+    self.token_seconds = token_seconds
+    self.generated_tokens = 0
+
+    self.tokenizer = unittest.mock.Mock()
+    self.tokenizer.encode.return_value = torch.tensor([[0, 0]])
+    self.tokenizer.decode.side_effect = lambda tensor, **kwargs: ' '.join(['token'] * len(tensor))
+    self.model = unittest.mock.Mock()
+    self.model.generate.side_effect = self.__generate
+
+  def __generate(
+      self,
+      input_tensor: torch.Tensor,
+      max_new_tokens: int,
+      stopping_criteria: list = (),
+  ) -> torch.Tensor:
+    output_tensor = input_tensor
+    for _ in range(max_new_tokens):
+      time.sleep(self.token_seconds)
+      output_tensor = torch.cat([output_tensor, torch.tensor([[1]])], dim=-1)
+      self.generated_tokens += 1
+      if any(criteria(output_tensor, None) for criteria in stopping_criteria):
+        break
+    return output_tensor
+
+  def _format_model_input(self, chat_history: list[Message]) -> str:
+    return '\n'.join(message.body for message in chat_history)
+
+  def _format_model_output(self, chat_history: list[Message], response: Message) -> str:
+    return response.body